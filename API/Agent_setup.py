@@ -1,6 +1,8 @@
 # agents/team_b.py
 import sys
 import os
+import asyncio
+import contextvars
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from AgentTeam import DataScraper_agent, Summarizer_agent, MarketResearch_agent
 from SocialMedia_Trend_Agent.SocialAgent import SocialTrends_agent
@@ -8,49 +10,123 @@ from TrendChart2 import CompetitorTrend_agent, MarketTrendAnalyzer_agent, EventP
 from utills.ta_helpers import _salvage_json_text
 from utills.cleaning import remove_think_tags
 from utills.extractUtills import extract_competitor_data,clean_text,extract_statistics_from_trends
+from utills.stage_graph import Stage, StageGraph
+from agent_protocol import run_scope
 
 import pandas as pd
 
-def run_team_b(query: str):
-    """Run all unstructured/research-based agents sequentially and return structured JSON output."""
-    
-    # 1️⃣ Data Scraper
-    scraper_out = DataScraper_agent(query)
-    scraped_docs = scraper_out.get("docs", [])
-    
-    # 2️⃣ Summarizer
-    summary_out = Summarizer_agent()
-    summary_text = remove_think_tags(summary_out.get("summary", ""))
-    
-    # 3️⃣ Market Research
-    research_out = MarketResearch_agent()
-    insights = remove_think_tags(clean_text(research_out.get("insights", "")))
-    
-    # 4️⃣ Social Media Trends
-    trends = SocialTrends_agent(query)
-    df_trends = pd.DataFrame(trends)
-    
-    # 5️⃣ Competitor Trends
-    comp_trend_text = CompetitorTrend_agent(query)
-    comp_trend = _salvage_json_text(comp_trend_text)
-    
-    # 6️⃣ Market Trend Analyzer
-    market_trend_text = MarketTrendAnalyzer_agent(query)
-    market_trend = _salvage_json_text(market_trend_text)
-    
-    # 7️⃣ Event-driven Price Spikes
-    event_spike_text = EventPriceSpike_agent(query)
-    event_spikes = _salvage_json_text(event_spike_text)
-    
-    return {
-        "data_scraper_docs": scraped_docs[:5],
-        "summary": summary_text,
-        "market_insights": insights,
-        "social_trends": df_trends.to_dict(orient="records"),
-        "competitor_trend": comp_trend,
-        "market_trend": market_trend,
-        "event_spikes": event_spikes,
-    }
+STREAM_HEARTBEAT = float(os.getenv("TEAM_B_STREAM_HEARTBEAT", "15"))  # seconds between keep-alives
+TEAM_B_CONCURRENCY = int(os.getenv("TEAM_B_CONCURRENCY", "4"))        # stages running at once
+SCRAPER_STAGE_TIMEOUT = float(os.getenv("TEAM_B_SCRAPER_TIMEOUT", "120"))  # seconds
+LLM_STAGE_TIMEOUT = float(os.getenv("TEAM_B_LLM_TIMEOUT", "180"))          # seconds per LLM-bound stage
+
+
+def team_b_graph() -> StageGraph:
+    """Stage graph for team B. Only scraper -> summary -> research is a chain;
+    the four trend agents need nothing but the query and run alongside it."""
+    return StageGraph([
+        Stage("scraper", DataScraper_agent, inputs=["query"], timeout=SCRAPER_STAGE_TIMEOUT, default={"docs": []}),
+        # summarizer/research read their input from the agent protocol, so they only wait on the previous stage
+        Stage("summary", lambda: Summarizer_agent(), after=["scraper"], timeout=LLM_STAGE_TIMEOUT,
+              default={"summary": ""}),
+        Stage("research", lambda: MarketResearch_agent(), after=["summary"], timeout=LLM_STAGE_TIMEOUT,
+              default={"insights": ""}),
+        Stage("social_trends", SocialTrends_agent, inputs=["query"], timeout=LLM_STAGE_TIMEOUT, default=[]),
+        Stage("competitor_trend", CompetitorTrend_agent, inputs=["query"], timeout=LLM_STAGE_TIMEOUT, default=""),
+        Stage("market_trend", MarketTrendAnalyzer_agent, inputs=["query"], timeout=LLM_STAGE_TIMEOUT, default=""),
+        Stage("event_spikes", EventPriceSpike_agent, inputs=["query"], timeout=LLM_STAGE_TIMEOUT, default=""),
+    ], max_concurrency=TEAM_B_CONCURRENCY)
+
+
+def format_stage(name: str, value):
+    """Stage value -> the shape it has in run_team_b's response."""
+    if name == "scraper":
+        return (value or {}).get("docs", [])[:5]
+    if name == "summary":
+        return remove_think_tags((value or {}).get("summary", ""))
+    if name == "research":
+        return remove_think_tags(clean_text((value or {}).get("insights", "")))
+    if name == "social_trends":
+        return pd.DataFrame(value or []).to_dict(orient="records")
+    return _salvage_json_text(value)
+
+
+TEAM_B_KEYS = {
+    "scraper": "data_scraper_docs",
+    "summary": "summary",
+    "research": "market_insights",
+    "social_trends": "social_trends",
+    "competitor_trend": "competitor_trend",
+    "market_trend": "market_trend",
+    "event_spikes": "event_spikes",
+}
+
+
+def run_team_b(query: str, on_event=None):
+    """Run all unstructured/research-based agents as a stage graph and return structured JSON output.
+
+    Independent stages run concurrently; a failed or timed-out stage contributes its
+    empty default. `on_event` (optional) gets a dict per stage start/finish.
+    Agent messages stay inside this run's scope, so requests can run side by side.
+    """
+    with run_scope():
+        results = team_b_graph().run({"query": query}, on_event=on_event)
+    return {TEAM_B_KEYS[name]: format_stage(name, results[name].value) for name in TEAM_B_KEYS}
+
+
+async def arun_team_b(query: str, on_event=None):
+    """run_team_b for async callers (FastAPI `async def` handlers): awaits the stage
+    graph on the caller's event loop instead of starting a loop of its own."""
+    with run_scope():
+        results = await team_b_graph().arun({"query": query}, on_event=on_event)
+    return {TEAM_B_KEYS[name]: format_stage(name, results[name].value) for name in TEAM_B_KEYS}
+
+
+async def stream_team_b(query: str, heartbeat: float = STREAM_HEARTBEAT):
+    """Async generator form of run_team_b for streaming clients.
+
+    Yields ("progress", {...}) when a stage starts, ("stage", {...}) with the stage's
+    formatted output as soon as it finishes, ("heartbeat", {}) after `heartbeat`
+    seconds of silence, and finally ("complete", <run_team_b response>).
+    Closing the generator cancels the run: stages not yet started never start,
+    running agent threads finish in the background and are discarded.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    outputs = {}
+
+    def on_event(ev):
+        name = ev["stage"]
+        if ev["status"] == "started":
+            events.put_nowait(("progress", {"stage": name, "key": TEAM_B_KEYS[name], "at": ev["at"]}))
+            return
+        outputs[name] = format_stage(name, ev.get("value"))
+        data = {"stage": name, "key": TEAM_B_KEYS[name], "status": ev["status"],
+                "elapsed": ev["elapsed"], "value": outputs[name]}
+        if ev.get("error"):
+            data["error"] = ev["error"]
+        events.put_nowait(("stage", data))
+
+    async def run():
+        with run_scope():
+            return await team_b_graph().arun({"query": query}, on_event=on_event)
+
+    # own context: the run scope is set and reset inside the task, not across our yields
+    task = asyncio.get_running_loop().create_task(run(), context=contextvars.copy_context())
+    try:
+        while not (task.done() and events.empty()):
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({getter, task}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield getter.result()
+                continue
+            getter.cancel()
+            if not done:
+                yield ("heartbeat", {})
+        task.result()  # surface graph errors (e.g. bad stage wiring)
+        yield ("complete", {TEAM_B_KEYS[name]: outputs.get(name, format_stage(name, None)) for name in TEAM_B_KEYS})
+    finally:
+        if not task.done():
+            task.cancel()
 
 
 #run_team_b("What are the latest trends in online grocery delivery services?")
@@ -1,6 +1,6 @@
 # agents/pipeline.py
 
-from Agent_setup import run_team_b
+from Agent_setup import arun_team_b, run_team_b, stream_team_b
 
 def run_pipeline(query: str):
     """Orchestrate both Agent Teams."""
@@ -11,3 +11,17 @@ def run_pipeline(query: str):
         #"team_a": team_a_output,
         "team_b": team_b_output,
     }
+
+
+async def arun_pipeline(query: str):
+    """run_pipeline for async callers; awaits the agent teams on the running loop."""
+    return {"team_b": await arun_team_b(query)}
+
+
+async def stream_pipeline(query: str):
+    """Yield (event, data) pairs while the agent teams run; the last one is
+    ("complete", <same dict as run_pipeline>)."""
+    async for event, data in stream_team_b(query):
+        if event == "complete":
+            data = {"team_b": data}
+        yield event, data
@@ -1,7 +1,11 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from pipeline import run_pipeline
+from pipeline import arun_pipeline, stream_pipeline
+import json
+import logging
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from Middleware.auth import hash_password, verify_password, create_access_token
@@ -9,6 +13,8 @@ from models.models import UserRegister, UserLogin, QueryRequest,ChatHistory
 from jose import jwt, JWTError
 from bson import ObjectId
 
+log = logging.getLogger("api")
+
 # Custom encoder for ObjectId → string
 def serialize_doc(doc):
     """Converts MongoDB document ObjectIds to strings recursively."""
@@ -96,12 +102,14 @@ def login(user: UserLogin):
 # =========================================
 # Analyze Route (Protected)
 # =========================================
+# async handlers await the stage graph on the server's loop (agents run on its worker
+# threads); blocking Mongo calls go to the threadpool
 @app.post("/analyzed")
 async def analyze(query: Query, user_id: str = Depends(get_current_user)):
-    result = run_pipeline(query.query)
+    result = await arun_pipeline(query.query)
 
     # store query + result in MongoDB for history
-    db.queries.insert_one({
+    await run_in_threadpool(db.queries.insert_one, {
         "user_id": user_id,
         "query": query.query,
         "response": result
@@ -137,10 +145,54 @@ def delete_chat(chat_id: str):
 
 @app.post("/analyze")
 async def analyze(query: Query):
-    result = run_pipeline(query.query)
+    result = await arun_pipeline(query.query)
     return result
 
 
+# =========================================
+# Streaming analyze (Server-Sent Events)
+# =========================================
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def analyze_events(request: Request, query: str, user_id: str):
+    """SSE frames for one pipeline run; stops (and cancels the run) when the client goes away.
+    The `complete` response is stored in history like /analyzed does, before it is sent."""
+    stream = stream_pipeline(query)
+    try:
+        async for event, data in stream:
+            if await request.is_disconnected():
+                log.info(f"analyze/stream: client disconnected, cancelling run for {query!r}")
+                break
+            if event == "complete":
+                await run_in_threadpool(db.queries.insert_one, {
+                    "user_id": user_id,
+                    "query": query,
+                    "response": data
+                })
+            # heartbeats are SSE comments: they keep proxies from closing the connection
+            yield ": ping\n\n" if event == "heartbeat" else sse(event, data)
+    except Exception as e:
+        log.exception(f"analyze/stream failed for {query!r}")
+        yield sse("error", {"detail": str(e)})
+    finally:
+        await stream.aclose()
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(request: Request, query: Query, user_id: str = Depends(get_current_user)):
+    """Same request, auth and stored history as /analyzed, pushed stage by stage:
+    `progress` and `stage` events while agents finish, then one `complete` event with
+    the full response. POST with the bearer header, so read it with fetch() and
+    response.body.getReader() (EventSource can only GET without headers)."""
+    return StreamingResponse(
+        analyze_events(request, query.query, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 ##############################################################################
 #RAG Agent
 
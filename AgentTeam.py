@@ -1,17 +1,26 @@
-from agent_protocol import AgentProtocol
+from agent_protocol import AgentProtocol, run_scope
 from phi.agent import Agent
 from phi.model.groq import Groq
 from dotenv import load_dotenv
-from Data_Scraper_IR_Agent.DataScraperIR import collect_and_index, ir_search
+from Data_Scraper_IR_Agent.DataScraperIR import iter_collect, ir_search
 from phi.tools.yfinance import YFinanceTools
 from utills.cleaning import extract_clean_text,clean_output
+from utills.map_reduce import call_limited, groq_limiter, reduce_tree
+from utills.llm_cache import cached
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from phi.tools.duckduckgo import DuckDuckGo
 
 load_dotenv()
 
 protocol = AgentProtocol()
 
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARIZER_CONCURRENCY", "4"))  # chunk calls in flight
+SUMMARY_FAN_IN = int(os.getenv("SUMMARIZER_FAN_IN", "6"))            # partials merged per reduce call
+SUMMARY_CHUNK_WORDS = int(os.getenv("SUMMARIZER_CHUNK_WORDS", "400"))
+
 # ---------------------------
 # Helper function
 # ---------------------------
@@ -31,11 +40,7 @@ def chunk_text(text: str, max_words: int = 500) -> list[str]:
 # ---------------------------
 # Agents
 # ---------------------------
-summarizer_agent = Agent(
-    name="SummarizerAgent",
-    model=Groq(id="llama-3.3-70b-versatile"),
-    tools=[DuckDuckGo()],
-    instructions="""
+SUMMARIZER_INSTRUCTIONS = """
 You are a **Market Insight Summarizer Agent**.
 
 Your task:
@@ -63,49 +68,129 @@ Rules:
 - If no data is available for a section, write: "Not mentioned".
 - Avoid generic filler text.
 """
-)
-
-market_research_agent = Agent(
-    name="MarketResearchAgent",
-    model=Groq(id="llama-3.3-70b-versatile"),
-    instructions="Analyze competitors, risks, and opportunities in the market.",
-
-
-
-)
-
-
 
+# Agents are built per call: a phi Agent keeps per-run state (memory, run id, tool
+# calls), so one module-level instance must not serve concurrent requests.
+def summarizer_agent():
+    return cached(Agent(
+        name="SummarizerAgent",
+        model=Groq(id=SUMMARY_MODEL),
+        tools=[DuckDuckGo()],
+        instructions=SUMMARIZER_INSTRUCTIONS,
+    ), limiter=groq_limiter())
+
+def chunk_summarizer():
+    """Tool-less agent for the map/reduce calls."""
+    return cached(Agent(
+        name="SummarizerAgent",
+        model=Groq(id=SUMMARY_MODEL),
+        instructions="Summarize market-research material. Keep figures, company names, "
+                     "growth numbers, opportunities and risks; drop filler.",
+    ), limiter=groq_limiter())
+
+def market_research_agent():
+    return cached(Agent(
+        name="MarketResearchAgent",
+        model=Groq(id="llama-3.3-70b-versatile"),
+        instructions="Analyze competitors, risks, and opportunities in the market.",
+    ), limiter=groq_limiter())
 
 
 # ---------------------------
 # Agent Functions
 # ---------------------------
-def DataScraper_agent(query: str, k_search: int = 15, k_index: int = 5):
-    """Scrape and index data, then send to SummarizerAgent"""
+def DataScraper_agent(query: str, k_search: int = 15, k_index: int = 5, on_doc=None, premap: bool = True):
+    """Scrape and index data, then send to SummarizerAgent.
+
+    Documents stream in as each one is scraped. With `premap` the summarizer's map
+    phase starts on every document right away (overlapping the slower downloads)
+    and the per-doc summaries travel to SummarizerAgent with the docs;
+    `on_doc(rank, text)` (optional) sees each document as it arrives too.
+    The docs list is in Serper rank order.
+    """
     print(f"[DataScraperAgent] Running for query: {query}")
+    ranked = []
+    mapper = ChunkMapper() if premap else None
     try:
-        result = collect_and_index(query, k_search=k_search, k_index=k_index)
+        for rank, doc in iter_collect(query, k_search=k_search, k_index=k_index, with_rank=True):
+            # Keep only title + first 1000 chars to avoid oversize
+            text = f"{doc.title or 'No Title'} ({doc.url})\n{doc.content[:1000]}"
+            ranked.append((rank, text))
+            if mapper:
+                mapper.submit(rank, text)
+            if on_doc:
+                on_doc(rank, text)
     except Exception as e:
         print(f"[DataScraperAgent] Error during collection: {e}")
-        result = {"docs": []}
-
-    docs = []
-    for doc in result.get("docs", []):
-        # Keep only title + first 1000 chars to avoid oversize
-        text_preview = (doc.get("content") or "")[:1000]
-        docs.append(f"{doc.get('title','No Title')} ({doc.get('url','No URL')})\n{text_preview}")
 
-    if not docs:
+    if not ranked:
         print("[DataScraperAgent] Warning: No documents found.")
 
-    payload = {"query": query, "docs": docs}
+    payload = {"query": query, "docs": [text for _, text in sorted(ranked, key=lambda rt: rt[0])]}
+    if mapper:
+        payload["doc_summaries"] = mapper.doc_summaries()
     protocol.send("DataScraperAgent", "SummarizerAgent", payload)
     return payload
 
 
+def _summarize_chunk(chunk: str) -> str:
+    return extract_clean_text(get_text(chunk_summarizer().run(
+        f"Summarize this into <=150 words:\n\n{chunk}"
+    )))
+
+
+class ChunkMapper:
+    """Map phase of Summarizer_agent, fed one document at a time.
+
+    Each submitted doc is split into chunks that are summarized on a bounded pool
+    (SUMMARIZER_CONCURRENCY) straight away; `doc_summaries()` waits for them and
+    returns one capped summary per doc, ordered by the key given to `submit`.
+    """
+
+    def __init__(self, max_workers: int = SUMMARY_CONCURRENCY):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="summary-map")
+        self.futures = {}
+
+    def submit(self, key, text: str) -> None:
+        self.futures[key] = [self.pool.submit(self._map_one, chunk)
+                             for chunk in chunk_text(text, max_words=SUMMARY_CHUNK_WORDS)]
+
+    @staticmethod
+    def _map_one(chunk: str):
+        try:
+            return call_limited(_summarize_chunk, chunk, groq_limiter(), pace=False)
+        except Exception as e:
+            print(f"[SummarizerAgent] Error while summarizing chunk: {e}")
+            return None
+
+    def doc_summaries(self) -> list[str]:
+        try:
+            out = []
+            for key in sorted(self.futures):
+                parts = [p for p in (f.result() for f in self.futures[key]) if p]
+                if parts:
+                    out.append(" ".join(parts)[:1000])  # hard cap length
+            return out
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _merge_summaries(parts: list[str]) -> str:
+    return extract_clean_text(get_text(chunk_summarizer().run(
+        f"Merge these partial summaries into one summary (<=250 words):\n\n{parts}"
+    )))
+
+
 def Summarizer_agent():
-    """Receive docs, summarize them safely in chunks, then send to MarketResearchAgent"""
+    """Receive docs, summarize them safely in chunks, then send to MarketResearchAgent.
+
+    Map: every chunk of every doc is summarized concurrently (SUMMARIZER_CONCURRENCY
+    calls in flight; live calls are paced by groq_limiter(), cache hits are free);
+    results keep doc order. Skipped when DataScraper_agent already mapped the docs
+    while scraping them.
+    Reduce: doc summaries are merged SUMMARIZER_FAN_IN at a time until one final call
+    can combine them.
+    """
     data = protocol.receive("SummarizerAgent") or {"query": "", "docs": []}
     docs = data.get("docs", [])
 
@@ -113,26 +198,25 @@ def Summarizer_agent():
         print("[SummarizerAgent] No docs received.")
         summary = "No documents to summarize."
     else:
-        doc_summaries = []
-        for doc in docs:
-            chunks = chunk_text(doc, max_words=400)  # smaller chunks
-            partials = []
-            for chunk in chunks:
-                try:
-                    s = extract_clean_text(get_text(summarizer_agent.run(
-                        f"Summarize this into <=150 words:\n\n{chunk}"
-                    )))
-                    partials.append(s)
-                except Exception as e:
-                    print(f"[SummarizerAgent] Error while summarizing chunk: {e}")
-            # Merge chunks of a single doc
-            doc_summary = " ".join(partials)[:1000]  # hard cap length
-            doc_summaries.append(doc_summary)
+        doc_summaries = data.get("doc_summaries")
+        if doc_summaries is None:
+            mapper = ChunkMapper()
+            for i, doc in enumerate(docs):
+                mapper.submit(i, doc)
+            doc_summaries = mapper.doc_summaries()
+
+        doc_summaries = reduce_tree(
+            doc_summaries, _merge_summaries, fan_in=SUMMARY_FAN_IN,
+            max_workers=SUMMARY_CONCURRENCY, limiter=groq_limiter(), pace=False,
+            on_error=lambda _, e: print(f"[SummarizerAgent] Error while merging summaries: {e}"),
+        )
 
         # Final: combine all doc summaries into one manageable text
         try:
-            summary = extract_clean_text(get_text(summarizer_agent.run(
-                f"Combine these summaries into a single concise market overview (<=300 words):\n\n{doc_summaries}"
+            summary = extract_clean_text(get_text(call_limited(
+                summarizer_agent().run,
+                f"Combine these summaries into a single concise market overview (<=300 words):\n\n{doc_summaries}",
+                groq_limiter(), pace=False,
             )))
         except Exception as e:
             summary = f"[Error] {e}"
@@ -142,15 +226,14 @@ def Summarizer_agent():
 
 
 def MarketResearch_agent():
-    """Receive summary, generate market insights, send to TrendAnalyzerAgent"""
+    """Receive summary and generate market insights; the caller takes them from the return value"""
     data = protocol.receive("MarketResearchAgent") or {"summary": ""}
     try:
-        insights = extract_clean_text(get_text(market_research_agent.run(data.get("summary", ""))))
+        insights = extract_clean_text(get_text(market_research_agent().run(data.get("summary", ""))))
     except Exception as e:
         insights = f"[Error] {e}"
         print(f"[MarketResearchAgent] Error: {e}")
 
-    protocol.send("MarketResearchAgent", "TrendAnalyzerAgent", {"insights": insights})
     return {"insights": insights}
 
 
@@ -167,9 +250,10 @@ def MarketResearch_agent():
 # Optional: Full pipeline runner
 # ---------------------------
 def run_full_pipeline(query: str):
-    DataScraper_agent(query)
-    Summarizer_agent()
-    MarketResearch_agent()
+    with run_scope():  # private channels, so concurrent runs don't read each other's messages
+        DataScraper_agent(query)
+        Summarizer_agent()
+        MarketResearch_agent()
     return 
 
 # Example usage:
@@ -32,6 +32,12 @@ DATA_OUT.mkdir(parents=True, exist_ok=True)
 import requests
 import json
 
+try:
+    # shared keep-alive pool (repo root on sys.path)
+    from Data_Scraper_IR_Agent.http_client import post as http_post
+except ImportError:
+    http_post = requests.post
+
 def call_ollama_llm(prompt: str) -> str:
     """Direct call to Ollama API using configuration"""
     try:
@@ -48,7 +54,7 @@ def call_ollama_llm(prompt: str) -> str:
         }
         
         # Use configured timeout
-        response = requests.post(url, json=data, timeout=ollama_config.timeout)
+        response = http_post(url, json=data, timeout=ollama_config.timeout)
         if response.status_code == 200:
             result = response.json()
             return result.get('response', '').strip()
@@ -1,25 +1,61 @@
 from __future__ import annotations
-import os, time, json, hashlib, urllib.parse, logging, re, requests
-from typing import List, Dict, Optional, Iterable
-from datetime import datetime
+import os, sys, time, json, urllib.parse, logging, re, asyncio, shutil, threading
+from functools import lru_cache
+from typing import List, Dict, NamedTuple, Optional, Iterable, Iterator, AsyncIterator, Tuple
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import TimeoutError as FutureTimeout
 from pydantic import BaseModel, HttpUrl, ValidationError
 from dotenv import load_dotenv
-import trafilatura
-from tenacity import retry, stop_after_attempt, wait_exponential
-from whoosh.index import create_in, open_dir
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 from whoosh.fields import Schema, TEXT, ID, DATETIME
 from whoosh.analysis import StemmingAnalyzer
 from whoosh.qparser import MultifieldParser
-import urllib.robotparser as robotparser
 from pathlib import Path
 
+try:
+    from .fetch_engine import HostScheduler, HostHealth, parse_retry_after, run_concurrent, set_max_concurrency
+    from . import http_client
+    from .robots_cache import RobotsCache
+    from .doc_cache import DocCache
+    from .search_cache import SearchCache, normalize_query
+    from .extract_pool import ExtractPool, ExtractTimeout, pdf_supported
+    from .sharded_index import ShardedIndex, to_utc_naive, utcnow
+    from .dedup import MAX_DISTANCE as MAX_DEDUP_DISTANCE, FingerprintIndex, RunDeduper
+    from .hybrid import NewsVectorStore, date_where, rrf
+    from .neg_cache import NegativeCache
+    from .canonical import canonicalize, link_canonical
+    from .stage_metrics import StageStats
+    from .index_rebuild import build_shards
+except ImportError:
+    # imported as a top-level module (scripts run from inside Data_Scraper_IR_Agent/)
+    sys.path.insert(0, str(Path(__file__).parent))
+    from fetch_engine import HostScheduler, HostHealth, parse_retry_after, run_concurrent, set_max_concurrency
+    import http_client
+    from robots_cache import RobotsCache
+    from doc_cache import DocCache
+    from search_cache import SearchCache, normalize_query
+    from extract_pool import ExtractPool, ExtractTimeout, pdf_supported
+    from sharded_index import ShardedIndex, to_utc_naive, utcnow
+    from dedup import MAX_DISTANCE as MAX_DEDUP_DISTANCE, FingerprintIndex, RunDeduper
+    from hybrid import NewsVectorStore, date_where, rrf
+    from neg_cache import NegativeCache
+    from canonical import canonicalize, link_canonical
+    from stage_metrics import StageStats
+    from index_rebuild import build_shards
+
 load_dotenv()
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/news")  # override for the offline benchmark
 BASE = Path(os.getcwd())
 
 # Use the / operator to join path components
 INDEX_DIR = BASE / "storage" / "index"
 CACHE_DIR = BASE / "storage" / "cache"
+ROBOTS_PATH = BASE / "storage" / "robots.sqlite3"
+CACHE_DB = CACHE_DIR / "docs.sqlite3"
+FAILURE_DB = CACHE_DIR / "failures.sqlite3"
+FINGERPRINT_DB = BASE / "storage" / "fingerprints.sqlite3"
+VECTOR_DIR = BASE / "storage" / "vectors"
 os.makedirs(INDEX_DIR, exist_ok=True)
 os.makedirs(CACHE_DIR, exist_ok=True)
 
@@ -30,6 +66,54 @@ UA = "Mozilla/5.0 DataScraperIR/1.0"
 TIMEOUT = 12
 ALLOWED_SCHEMES = {"http", "https"}
 ALLOWED_DOMAINS: Optional[set[str]] = None   # e.g. {"reuters.com", "bloomberg.com"}
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "8"))   # global cap on in-flight fetches
+HOST_DELAY = float(os.getenv("SCRAPER_HOST_DELAY", "1.0"))         # politeness gap per host (seconds)
+HOST_FAIL_THRESHOLD = int(os.getenv("SCRAPER_HOST_FAIL_THRESHOLD", "2"))  # consecutive failures that open a host's circuit
+HOST_COOLDOWN = float(os.getenv("SCRAPER_HOST_COOLDOWN", "60"))         # first open period; doubles on each re-trip
+COLLECT_BUDGET = float(os.getenv("SCRAPER_COLLECT_BUDGET", "60"))       # seconds per collect_and_index; 0 = unbounded
+RESPECT_ROBOTS = os.getenv("SCRAPER_RESPECT_ROBOTS", "1") == "1"
+ROBOTS_TTL = float(os.getenv("SCRAPER_ROBOTS_TTL", "86400"))       # keep robots.txt rules for a day
+ROBOTS_FAIL_TTL = float(os.getenv("SCRAPER_ROBOTS_FAIL_TTL", "900")) # re-ask unreachable hosts after 15 min
+CACHE_MAX_MB = int(os.getenv("SCRAPER_CACHE_MAX_MB", "256"))        # on-disk document cache budget
+CACHE_TTL_DAYS = float(os.getenv("SCRAPER_CACHE_TTL_DAYS", "30"))  # documents older than this are evicted
+CACHE_MEM_ITEMS = int(os.getenv("SCRAPER_CACHE_MEM_ITEMS", "256"))  # hot documents kept decoded in memory
+FRESH_TTL = float(os.getenv("SCRAPER_FRESH_TTL", "21600"))         # serve cached pages without revalidating for 6h
+SEARCH_TTL = float(os.getenv("SCRAPER_SEARCH_TTL", "900"))         # reuse Serper results for 15 min
+EXTRACT_WORKERS = int(os.getenv("SCRAPER_EXTRACT_WORKERS", str(os.cpu_count() or 2)))  # 0 = extract inline
+EXTRACT_CPU_TIMEOUT = float(os.getenv("SCRAPER_EXTRACT_CPU_TIMEOUT", "10"))  # CPU seconds per document
+EXTRACT_START_METHOD = os.getenv("SCRAPER_EXTRACT_START_METHOD") or None  # default forkserver (spawn off-POSIX); fork risks deadlocks once threads run
+INDEX_BATCH = int(os.getenv("SCRAPER_INDEX_BATCH", "64"))           # commit after this many queued docs...
+INDEX_COMMIT_INTERVAL = float(os.getenv("SCRAPER_INDEX_COMMIT_INTERVAL", "2.0"))  # ...or this many seconds
+INDEX_OPTIMIZE_HOURS = float(os.getenv("SCRAPER_INDEX_OPTIMIZE_HOURS", "24"))  # merge changed shards this often; 0 = never
+INDEX_REBUILD_PROCS = int(os.getenv("SCRAPER_INDEX_REBUILD_PROCS", str(min(4, os.cpu_count() or 1))))  # rebuild writer processes
+INDEX_RETENTION_MONTHS = int(os.getenv("SCRAPER_INDEX_RETENTION_MONTHS", "0"))  # drop monthly shards past this; 0 = keep all
+DEDUP = os.getenv("SCRAPER_DEDUP", "1") == "1"
+DEDUP_DISTANCE = int(os.getenv("SCRAPER_DEDUP_DISTANCE", "3"))     # SimHash bits apart to count as the same story (0..3)
+RETRIEVAL = os.getenv("SCRAPER_RETRIEVAL", "bm25")                 # bm25 | hybrid (BM25 + vectors, needs chromadb)
+HYBRID_BUDGET_MS = float(os.getenv("SCRAPER_HYBRID_BUDGET_MS", "300"))  # max wait for the vector side
+EMBED_ON_INDEX = RETRIEVAL == "hybrid" or os.getenv("SCRAPER_EMBED_ON_INDEX", "0") == "1"
+MAX_HTML_BYTES = int(os.getenv("SCRAPER_MAX_HTML_BYTES", str(2 * 1024 * 1024)))  # HTML beyond this is cut off
+MAX_PDF_BYTES = int(os.getenv("SCRAPER_MAX_PDF_BYTES", str(10 * 1024 * 1024)))   # larger PDFs are skipped
+PDF_TEXT = os.getenv("SCRAPER_PDF", "1") == "1" and pdf_supported()            # extract PDFs (needs pypdf/PyPDF2)
+HONOR_REL_CANONICAL = os.getenv("SCRAPER_REL_CANONICAL", "1") == "1"  # key docs on the page's same-site <link rel=canonical>
+NEG_CACHE = os.getenv("SCRAPER_NEG_CACHE", "1") == "1"               # skip URLs that recently failed
+NEG_TTLS = {                                                         # seconds a failed URL is skipped, per reason
+    "http_4xx": float(os.getenv("SCRAPER_NEG_TTL_4XX", str(7 * 86400))),
+    "http_5xx": float(os.getenv("SCRAPER_NEG_TTL_5XX", "3600")),
+    "timeout": float(os.getenv("SCRAPER_NEG_TTL_TIMEOUT", str(6 * 3600))),
+    "too_short": float(os.getenv("SCRAPER_NEG_TTL_TOO_SHORT", str(3 * 86400))),
+    "non_html": float(os.getenv("SCRAPER_NEG_TTL_NON_HTML", str(30 * 86400))),
+    "too_large": float(os.getenv("SCRAPER_NEG_TTL_TOO_LARGE", str(30 * 86400))),
+    "error": float(os.getenv("SCRAPER_NEG_TTL_ERROR", "3600")),
+}
+
+set_max_concurrency(MAX_CONCURRENCY)  # one fetch pool for every collect in the process
+_hosts = HostScheduler(HOST_DELAY)
+_metrics = StageStats()  # per-stage latency: search, fetch, extract, index, ir_search
+_health = HostHealth(fail_threshold=HOST_FAIL_THRESHOLD, cooldown=HOST_COOLDOWN)
+
+def host_stats() -> Dict:
+    return _health.stats()
 
 class SearchResult(BaseModel):
     title: str
@@ -55,44 +139,63 @@ def _valid_url(u: str) -> bool:
         return True
     except: return False
 
+def _fetch_robots(robots_url: str) -> tuple[int, str]:
+    r = http_client.get(robots_url, headers={"User-Agent": UA}, timeout=TIMEOUT)
+    return r.status_code, (r.text if r.status_code == 200 else "")
+
+_robots = RobotsCache(ROBOTS_PATH, _fetch_robots, ttl=ROBOTS_TTL, fail_ttl=ROBOTS_FAIL_TTL)
+
 def _robots_ok(u: str) -> bool:
-    try:
-        p = urllib.parse.urlparse(u)
-        rp = robotparser.RobotFileParser()
-        rp.set_url(f"{p.scheme}://{p.netloc}/robots.txt")
-        rp.read()
-        return rp.can_fetch(UA, u)
+    try: return _robots.allowed(u, UA)
     except: return False
 
-def _cache_path(u: str) -> str:
-    h = hashlib.sha256(u.encode()).hexdigest()[:24]
-    return os.path.join(CACHE_DIR, f"{h}.json")
+_doc_cache = DocCache(CACHE_DB, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                      ttl=CACHE_TTL_DAYS * 86400, mem_items=CACHE_MEM_ITEMS)
+_doc_cache.import_legacy(CACHE_DIR)
 
-""" def _load_cache(u: str) -> Optional[dict]:
-    p = _cache_path(u)
-    return json.load(open(p, "r", encoding="utf-8")) if os.path.exists(p) else None """
+def _save_cache(u: str, d: dict, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+    _doc_cache.put(u, d, etag=etag, last_modified=last_modified)
 
-def _load_cache(u: str) -> Optional[dict]:
-    p = _cache_path(u)
-    if os.path.exists(p):
-        log.info(f"Cache hit for {u}")
-        return json.load(open(p, "r", encoding="utf-8"))
-    log.info(f"Cache miss for {u}")
-    return None
 
+def get_doc(url: str) -> Optional[dict]:
+    """Cached document for `url` (title, url, content, source, published_at) or None."""
+    return _doc_cache.get(canonicalize(url))
+
+
+def get_docs(urls: Iterable[str], max_chars: Optional[int] = None) -> Dict[str, dict]:
+    """Bulk lookup of cached documents: {url: doc} for the urls we have, in one cache query.
+
+    `max_chars` trims each doc's content (the stored copy is untouched).
+    """
+    keys = {u: canonicalize(u) for u in urls}
+    found = _doc_cache.get_many(list(set(keys.values())))
+    docs = {u: found[k] for u, k in keys.items() if k in found}
+    if max_chars is not None:
+        docs = {u: {**d, "content": (d.get("content") or "")[:max_chars]} for u, d in docs.items()}
+    return docs
 
-def _save_cache(u: str, d: dict) -> None:
-    json.dump(d, open(_cache_path(u), "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+
+def cache_stats() -> Dict:
+    return _doc_cache.stats()
 
 # ---- Search with Serper (Google Search API)
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(1, 2, 8), reraise=True)
+_search_cache = SearchCache(ttl=SEARCH_TTL)
+
 def serper_news(query: str, num: int = 10) -> List[SearchResult]:
+    """Serper news search, cached per normalized query; identical concurrent queries share one call."""
+    num = min(num, 20)
+    q = normalize_query(query)
+    with _metrics.timed("search"):
+        return list(_search_cache.get_or_fetch((q, num), lambda: _serper_news_upstream(q, num)))
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(1, 2, 8), reraise=True)
+def _serper_news_upstream(query: str, num: int) -> List[SearchResult]:
     if not SERPER_API_KEY:
         raise RuntimeError("SERPER_API_KEY missing")
-    r = requests.post(
-        "https://google.serper.dev/news",
+    r = http_client.post(
+        SERPER_URL,
         headers={"X-API-KEY": SERPER_API_KEY, "Content-Type": "application/json"},
-        json={"q": query, "num": min(num, 20)},
+        json={"q": query, "num": num},
         timeout=TIMEOUT,
     )
     r.raise_for_status()
@@ -112,109 +215,569 @@ def serper_news(query: str, num: int = 10) -> List[SearchResult]:
     return out
 
 # ---- Fetch & extract
-class ScrapeError(Exception): pass
+class ScrapeError(Exception):
+    """Permanent failure for this URL (not retried); `reason` is a negative-cache code."""
+    def __init__(self, msg: str, reason: str = "error", status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(msg)
+        self.reason = reason
+        self.status = status            # HTTP status, when the host answered
+        self.retry_after = retry_after  # seconds, from a Retry-After header
+
+class Page(NamedTuple):
+    status: int                    # 200, or 304 when the cached copy is still valid
+    html: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    kind: str = "html"             # "html" or "pdf"
+    data: bytes = b""              # raw body for pdf pages
+
+_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+def _content_kind(ctype: str, url: str) -> Optional[str]:
+    if not ctype or "html" in ctype or ctype.startswith("text/"):
+        return "html"
+    if ctype == "application/pdf" or (ctype == "application/octet-stream"
+                                      and urllib.parse.urlparse(url).path.lower().endswith(".pdf")):
+        return "pdf" if PDF_TEXT else None
+    return None
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(1, 2, 6), reraise=True)
-def fetch_html(url: str) -> str:
+def _decode_html(body: bytes, content_type: Optional[str]) -> str:
+    # charset from the header, else from <meta charset>, else utf-8
+    m = re.search(r"charset=[\"']?([\w-]+)", content_type or "", re.I)
+    if m:
+        enc = m.group(1)
+    else:
+        m = _CHARSET.search(body[:4096])
+        enc = m.group(1).decode("ascii") if m else "utf-8"
+    try:
+        return body.decode(enc, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+# a host answering these is refusing us (not just missing one page), so they count against its health
+HOST_BLOCK_STATUSES = {401, 403, 429}
+
+def _host_ok(e: Optional[BaseException]) -> bool:
+    """Does the outcome of one fetch (after its retries) say the host is healthy?"""
+    if e is None:
+        return True
+    if isinstance(e, ScrapeError):  # missing page, wrong type, too large: the host itself is fine
+        return e.reason != "throttled" and e.status not in HOST_BLOCK_STATUSES
+    return False  # connection errors, timeouts, 5xx/408/429 still failing after retries
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(1, 2, 6),
+       retry=retry_if_not_exception_type(ScrapeError), reraise=True)
+def _get_page(url: str, headers: Dict[str, str], etag: Optional[str], last_modified: Optional[str],
+              latencies: List[float]) -> Page:
+    """One GET attempt (retried by tenacity); appends its latency to `latencies`."""
+    _hosts.wait(url)  # be polite per host; other hosts keep going in parallel
+    t0 = time.monotonic()
+    try:
+        r = http_client.get(url, headers=headers, timeout=(TIMEOUT, _health.timeout_for(url, TIMEOUT)), stream=True)
+    finally:
+        latencies.append(time.monotonic() - t0)
+    try:
+        if r.status_code == 304:
+            return Page(304, "", r.headers.get("ETag") or etag, r.headers.get("Last-Modified") or last_modified)
+        if r.status_code == 429 or r.status_code >= 500:
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            if retry_after is not None:
+                raise ScrapeError(f"HTTP {r.status_code}, retry after {retry_after:.0f}s", reason="throttled",
+                                  status=r.status_code, retry_after=retry_after)
+        if 400 <= r.status_code < 500 and r.status_code not in (408, 429):
+            raise ScrapeError(f"HTTP {r.status_code}", reason="http_4xx", status=r.status_code)  # retrying won't help
+        r.raise_for_status()
+        ctype = (r.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        kind = _content_kind(ctype, url)
+        if kind is None:
+            raise ScrapeError(f"Not HTML ({ctype})", reason="non_html")
+        cap = MAX_PDF_BYTES if kind == "pdf" else MAX_HTML_BYTES
+        length = r.headers.get("Content-Length")
+        if kind == "pdf" and length and length.isdigit() and int(length) > cap:
+            raise ScrapeError(f"PDF too large ({length} bytes)", reason="too_large")
+        body, truncated = http_client.read_limited(r, cap)
+        validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        if kind == "pdf":
+            if truncated:  # a cut-off PDF can't be parsed
+                raise ScrapeError(f"PDF over {cap} bytes", reason="too_large")
+            return Page(r.status_code, "", *validators, kind="pdf", data=body)
+        if truncated:
+            log.info(f"Truncated {url} at {cap} bytes")
+        return Page(r.status_code, _decode_html(body, r.headers.get("Content-Type")), *validators)
+    finally:
+        r.close()
+
+def fetch_page(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Page:
+    """GET a page; with validators this is a conditional GET that may return status 304.
+
+    The body is streamed: status and Content-Type are checked before anything is
+    read, unsupported types are rejected without downloading, HTML is capped at
+    MAX_HTML_BYTES and PDFs over MAX_PDF_BYTES are skipped. Transient errors are
+    retried; the host's health sees one outcome per call, after the retries."""
     if not _valid_url(url):
-        raise ScrapeError("Invalid/disallowed URL")
-    # disable robots.txt strictness if you want:
-    # if not _robots_ok(url): log.warning(f"robots.txt disallows {url}, skipping")
-    r = requests.get(url, headers={"User-Agent": UA}, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.text
+        raise ScrapeError("Invalid/disallowed URL", reason="invalid_url")
+    # robots.txt rules are cached per host (SCRAPER_RESPECT_ROBOTS=0 to disable)
+    if RESPECT_ROBOTS and not _robots_ok(url):
+        raise ScrapeError("Disallowed by robots.txt", reason="robots")
+    headers = {"User-Agent": UA}
+    if etag: headers["If-None-Match"] = etag
+    if last_modified: headers["If-Modified-Since"] = last_modified
+    # unhealthy hosts fail fast (no retries) until their circuit half-opens for a probe
+    allowed, state = _health.allow(url)
+    if not allowed:
+        raise ScrapeError(f"Host circuit {state}", reason="circuit_open")
+    latencies: List[float] = []
+    try:
+        page = _get_page(url, headers, etag, last_modified, latencies)
+    except Exception as e:
+        _health.record(url, _host_ok(e), latencies[-1] if latencies else None,
+                       retry_after=getattr(e, "retry_after", None))
+        raise
+    except BaseException:  # interrupt or shutdown: says nothing about the host
+        _health.release(url)
+        raise
+    _health.record(url, True, latencies[-1] if latencies else None)
+    return page
+
+def fetch_html(url: str) -> str:
+    return fetch_page(url).html
 
 
+_extractor = ExtractPool(EXTRACT_WORKERS, cpu_timeout=EXTRACT_CPU_TIMEOUT, start_method=EXTRACT_START_METHOD)
+
 def extract_text(html: str, url: str) -> Optional[str]:
-    txt = trafilatura.extract(html, url=url, include_comments=False, include_tables=False)
+    # runs in a worker process; fetch threads keep downloading meanwhile
+    txt = _extractor.extract(html, url)
+    return txt if txt and len(txt.split()) >= 60 else None
+
+def extract_pdf_text(data: bytes, url: str) -> Optional[str]:
+    txt = _extractor.extract_pdf(data, url)
     return txt if txt and len(txt.split()) >= 60 else None
 
+_AGO = re.compile(r"(\d+)\s*(minute|min|hour|day|week|month|year)s?\s+ago", re.I)
+_AGO_UNIT = {"minute": 60, "min": 60, "hour": 3600, "day": 86400, "week": 7 * 86400,
+             "month": 30 * 86400, "year": 365 * 86400}
+
+def parse_date(date_str: Optional[str]) -> Optional[datetime]:
+    """Naive-UTC datetime from ISO strings or Serper's "3 days ago" / "Jan 5, 2025" dates."""
+    if not date_str:
+        return None
+    s = date_str.strip()
+    try:
+        return to_utc_naive(datetime.fromisoformat(re.sub("Z$", "+00:00", s)))
+    except ValueError:
+        pass
+    m = _AGO.search(s)
+    if m:
+        return utcnow() - timedelta(seconds=int(m.group(1)) * _AGO_UNIT[m.group(2).lower()])
+    for fmt in ("%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y"):
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            pass
+    return None
+
+# ---- Negative cache: recently failed URLs are skipped until their reason's TTL expires
+_failures = NegativeCache(FAILURE_DB, ttls=NEG_TTLS) if NEG_CACHE else None
+if _failures:
+    _failures.purge_expired()
+
+def _failure_reason(e: BaseException) -> Optional[str]:
+    """Negative-cache reason for a fetch error, or None if it shouldn't be remembered."""
+    if isinstance(e, ScrapeError):
+        # robots, invalid_url, circuit_open and throttled are cheap to re-check, so not remembered
+        return e.reason if e.reason in NEG_TTLS else None
+    if isinstance(e, TimeoutError) or "Timeout" in type(e).__name__:
+        return "timeout"
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status and status >= 500:
+        return "http_5xx"
+    return "error"
+
+def _record_failure(url: str, reason: Optional[str], detail: str = "") -> None:
+    if _failures and reason:
+        _failures.record(url, reason, detail)
+
+def failure_stats() -> Dict:
+    return _failures.stats() if _failures else {}
+
 def make_doc(url: str, title_hint=None, source=None, date_str=None) -> Optional[Document]:
-    cached = _load_cache(url)
-    if cached:
-        try: return Document(**cached)
-        except ValidationError: pass
-    html = fetch_html(url)
-    content = extract_text(html, url)
-    if not content: return None
+    # fresh cache entry -> serve; stale -> conditional GET; 304 -> serve; 200 -> re-extract
+    # the link as given is fetched; cache, negative cache and index use its canonical form
+    fetch_url, url = url, canonicalize(url)
+    entry = _doc_cache.lookup(url)
+    cached = None
+    if entry:
+        try: cached = Document(**entry.doc)
+        except ValidationError: entry = None
+    if cached and time.time() - entry.fetched_at < FRESH_TTL:
+        log.info(f"Cache hit for {url}")
+        return cached
+    try:
+        with _metrics.timed("fetch"):
+            page = (fetch_page(fetch_url, etag=entry.etag, last_modified=entry.last_modified) if entry
+                    else fetch_page(fetch_url))
+    except Exception as e:
+        if cached:  # stale copy beats nothing
+            log.warning(f"Revalidation failed for {url}, serving cached copy: {e}")
+            return cached
+        _record_failure(url, _failure_reason(e), str(e))
+        raise
+    if page.status == 304 and cached:
+        log.info(f"Not modified: {url}")
+        _doc_cache.touch(url, etag=page.etag, last_modified=page.last_modified)
+        return cached
+    try:
+        with _metrics.timed("extract"):
+            content = (extract_pdf_text(page.data, fetch_url) if page.kind == "pdf"
+                       else extract_text(page.html, fetch_url))
+    except ExtractTimeout as e:
+        _record_failure(url, "timeout", f"extraction: {e}")  # may pass on a quieter run
+        return None
+    if not content:
+        _record_failure(url, "too_short")  # < 60 words: paywall, consent wall, video page...
+        return None
     title = title_hint or content.splitlines()[0][:120]
-    published_at = None
-    if date_str:
-        try: published_at = datetime.fromisoformat(re.sub("Z$", "+00:00", date_str))
-        except: pass
-    doc = Document(title=title, url=url, content=content, source=source, published_at=published_at)
-    _save_cache(url, json.loads(doc.json()))
+    rel = link_canonical(page.html, fetch_url) if HONOR_REL_CANONICAL and page.kind == "html" else None
+    doc = Document(title=title, url=rel or url, content=content, source=source, published_at=parse_date(date_str))
+    data = json.loads(doc.json())
+    _save_cache(url, data, etag=page.etag, last_modified=page.last_modified)
+    if rel and rel != url:  # next lookup may come from either link (or from an index hit)
+        _save_cache(rel, data, etag=page.etag, last_modified=page.last_modified)
     return doc
 
 # ---- Whoosh index
-def _ensure_index():
-    schema = Schema(
+def _schema() -> Schema:
+    return Schema(
         url=ID(stored=True, unique=True),
         title=TEXT(stored=True, analyzer=StemmingAnalyzer()),
         content=TEXT(stored=False, analyzer=StemmingAnalyzer()),
         source=TEXT(stored=True),
         published_at=DATETIME(stored=True),
     )
-    try:
-        if not os.listdir(INDEX_DIR):
-            return create_in(INDEX_DIR, schema)
-        return open_dir(INDEX_DIR)
-    except Exception as e:
-        log.warning(f"Recreating index due to error: {e}")
-        for f in os.listdir(INDEX_DIR):
-            os.remove(INDEX_DIR / f)
-        return create_in(INDEX_DIR, schema)
-
-
-def index_docs(docs: Iterable[Document]) -> int:
-    ix = _ensure_index()
-    w = ix.writer(limitmb=128)
-    n = 0
-    for d in docs:
-        w.update_document(
-            url=str(d.url),
-            title=d.title,
-            content=d.content,
-            source=d.source or "",
-            published_at=d.published_at
-        ); n += 1
-    w.commit()
-    return n
 
-def ir_search(query: str, limit: int = 10) -> List[Dict]:
-    ix = _ensure_index()
-    with ix.searcher() as s:
-        q = MultifieldParser(["title", "content"], ix.schema).parse(query)
-        rs = s.search(q, limit=limit)
-        return [{
-            "title": r.get("title"),
-            "url": r.get("url"),
-            "source": r.get("source"),
-            "published_at": r.get("published_at").isoformat() if r.get("published_at") else None,
-            "score": float(r.score),
-        } for r in rs]
-
-# ---- Orchestrate: search -> scrape -> index
-def collect_and_index(query: str, k_search: int = 10, k_index: int = 8) -> Dict:
-    results = serper_news(query, num=k_search)
-    docs = []
-    for it in results[:k_index]:
+# monthly shards under storage/index/shards, one open index + background writer each
+_index = ShardedIndex(INDEX_DIR, _schema, batch_size=INDEX_BATCH, commit_interval=INDEX_COMMIT_INTERVAL,
+                      on_commit=lambda n, secs: _metrics.record("index", secs))
+def drop_expired_shards(keep_months: int = INDEX_RETENTION_MONTHS) -> List[str]:
+    """Delete monthly index shards older than `keep_months`; returns the dropped shard names.
+
+    Near-duplicate fingerprints first seen before the oldest kept month go with them.
+    """
+    dropped = _index.drop_expired(keep_months)
+    if keep_months > 0 and _fingerprints is not None:
+        now = utcnow()
+        k = now.year * 12 + now.month - keep_months   # months since year 0 of the oldest kept month
+        cutoff = datetime(k // 12, k % 12 + 1, 1, tzinfo=timezone.utc).timestamp()
+        n = _fingerprints.prune(cutoff)
+        if n:
+            log.info(f"Pruned {n} near-duplicate fingerprints older than {keep_months} months")
+    return dropped
+
+def index_stats() -> Dict:
+    return _index.stats()
+
+def optimize_index(force: bool = False) -> List[str]:
+    """Merge segments of shards that changed since their last merge."""
+    return _index.optimize(force=force)
+
+def _optimize_loop() -> None:
+    while True:
+        time.sleep(INDEX_OPTIMIZE_HOURS * 3600)
         try:
-            d = make_doc(str(it.url), title_hint=it.title, source=it.source, date_str=it.date)
-            if d:
-                docs.append(d)
-                time.sleep(1.0)  # be polite
+            merged = optimize_index()
+            if merged:
+                log.info(f"Scheduled optimize merged shards: {merged}")
         except Exception as e:
-            log.warning(f"Skip {it.url}: {e}")
-    n = index_docs(docs)
+            log.warning(f"Scheduled optimize failed: {e}")
+
+if INDEX_OPTIMIZE_HOURS > 0:
+    threading.Thread(target=_optimize_loop, name="index-optimize", daemon=True).start()
+
+def _index_fields(d: Document) -> Dict:
+    return {
+        "url": canonicalize(str(d.url)),
+        "title": d.title,
+        "content": d.content,
+        "source": d.source or "",
+        "published_at": d.published_at,
+    }
+
+def _cached_index_fields() -> Iterator[Dict]:
+    for raw in _doc_cache.iter_docs():
+        try:
+            yield _index_fields(Document(**raw))
+        except ValidationError:
+            continue
+
+def rebuild_index(procs: int = INDEX_REBUILD_PROCS, optimize: bool = True,
+                  drop_legacy: bool = False, force: bool = False) -> Dict[str, int]:
+    """Rebuild every shard from the document cache and swap the new shards in.
+
+    Used after a schema change or a corrupted index. Documents are written by
+    `procs` processes into a scratch directory next to the live shards; each
+    rebuilt shard then replaces its live copy with a rename. Docs indexed while
+    the rebuild runs are replayed into the new shards. Shards with no cached
+    documents are left alone, and so is any shard whose rebuild would lose docs
+    whose text has left the cache, unless `force`; `drop_legacy` also removes
+    the pre-sharding index. Returns docs indexed per swapped-in shard.
+    """
+    _index.begin_capture()  # from here on, writes are replayed after the swap
+    _index.flush()
+    build_root = _index.shard_dir / f".rebuild-{int(time.time())}"
+    try:
+        counts = build_shards(_cached_index_fields(), _schema, build_root, procs=procs, optimize=optimize)
+        swapped = _index.swap_in(build_root, drop_legacy=drop_legacy, force=force)
+    finally:
+        _index.end_capture()  # a failed build must not keep recording writes
+        shutil.rmtree(build_root, ignore_errors=True)
+    _parse_query.cache_clear()  # parsers hold the old schema
+    return {name: counts[name] for name in swapped}
+
+
+_vectors = NewsVectorStore(VECTOR_DIR)
+if EMBED_ON_INDEX:
+    _vectors.warm_up()  # load the embedding model now, not inside the first query's budget
+
+def index_docs(docs: Iterable[Document], wait: bool = False) -> int:
+    """Queue docs for indexing; `wait=True` blocks until they are committed."""
+    docs = list(docs)
+    if EMBED_ON_INDEX:
+        _vectors.add_async(json.loads(d.json()) for d in docs)  # chunks embedded in the background
+    n = _index.add_many(_index_fields(d) for d in docs)
+    if wait:
+        flush_index()
+    return n
+
+def flush_index(timeout: Optional[float] = None) -> bool:
+    """Block until every doc queued so far is committed (and searchable); False on timeout."""
+    return _index.flush(timeout)
+
+@lru_cache(maxsize=512)
+def _parse_query(query: str):
+    return MultifieldParser(["title", "content"], _index.schema).parse(query)
+
+def _hit(r: Dict, score: float) -> Dict:
+    pub = r.get("published_at")
     return {
-        "indexed": n,
+        "title": r.get("title"),
+        "url": r.get("url"),
+        "source": r.get("source"),
+        "published_at": pub.isoformat() if isinstance(pub, datetime) else (pub or None),
+        "score": score,
+    }
+
+def _hybrid_search(query: str, limit: int, budget_ms: float,
+                   date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> List[Dict]:
+    """BM25 and vector hits merged with reciprocal rank fusion; vectors get `budget_ms` at most.
+    Both sides apply the date window inside their own top-k."""
+    deadline = time.monotonic() + budget_ms / 1000.0
+    depth = limit * 3
+    fut = _vectors.submit_query(query, k=depth, where=date_where(date_from, date_to))
+    bm25 = _index.search(_parse_query(query), limit=depth, date_from=date_from, date_to=date_to)
+    try:
+        vec = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        log.info(f"Vector search over {budget_ms:.0f}ms budget, using BM25 only")
+        vec = []
+    except Exception as e:
+        log.warning(f"Vector search failed, using BM25 only: {e}")
+        vec = []
+    fields = {r["url"]: r for r, _ in bm25}
+    for url, meta in vec:
+        fields.setdefault(url, meta)
+    fused = rrf([[r["url"] for r, _ in bm25], [u for u, _ in vec]])
+    return [_hit(fields[url], score) for url, score in fused[:limit]]
+
+def ir_search(query: str, limit: int = 10, with_content: bool = False,
+              max_chars: Optional[int] = None, mode: Optional[str] = None,
+              budget_ms: float = HYBRID_BUDGET_MS, date_from=None, date_to=None,
+              since_days: Optional[float] = None, fresh: bool = False) -> List[Dict]:
+    """Search indexed docs. `mode` is "bm25" or "hybrid" (default SCRAPER_RETRIEVAL).
+    `date_from`/`date_to` (datetime or date string) or `since_days` restrict the search
+    to docs published in that window; only the monthly shards overlapping it are read.
+    `with_content=True` adds each hit's cached content (trimmed to `max_chars`)
+    from one bulk cache lookup.
+    Searches read the shards' refreshing searchers, so docs queued in the last
+    SCRAPER_INDEX_COMMIT_INTERVAL seconds may not be visible yet; `fresh=True`
+    commits everything queued first (for a search right after collect_and_index)."""
+    date_from = parse_date(date_from) if isinstance(date_from, str) else to_utc_naive(date_from)
+    date_to = parse_date(date_to) if isinstance(date_to, str) else to_utc_naive(date_to)
+    if since_days is not None:
+        date_from = utcnow() - timedelta(days=since_days)
+    if fresh:
+        _index.flush(timeout=30)
+    t0 = time.perf_counter()
+    if (mode or RETRIEVAL) == "hybrid" and _vectors.available():
+        hits = _hybrid_search(query, limit, budget_ms, date_from, date_to)
+    else:
+        # per-shard shared searcher + result cache keyed on (parsed query, limit, shard generation)
+        hits = [_hit(r, score) for r, score in
+                _index.search(_parse_query(query), limit=limit, date_from=date_from, date_to=date_to)]
+    if with_content:
+        docs = get_docs([h["url"] for h in hits], max_chars=max_chars)
+        for h in hits:
+            h["content"] = (docs.get(h["url"]) or {}).get("content")
+    _metrics.record("ir_search", time.perf_counter() - t0)
+    return hits
+
+# ---- Near-duplicate filter
+if DEDUP_DISTANCE > MAX_DEDUP_DISTANCE:
+    log.warning(f"SCRAPER_DEDUP_DISTANCE={DEDUP_DISTANCE} is above what the fingerprint bands can find; "
+                f"using {MAX_DEDUP_DISTANCE}")
+    DEDUP_DISTANCE = MAX_DEDUP_DISTANCE
+_fingerprints = FingerprintIndex(FINGERPRINT_DB, max_distance=DEDUP_DISTANCE) if DEDUP else None
+if INDEX_RETENTION_MONTHS:
+    drop_expired_shards(INDEX_RETENTION_MONTHS)
+
+def _check_dup(dd: Optional[RunDeduper], d: Document, dups: List[Dict]) -> Optional[bool]:
+    """None = drop (copy of a story already kept in this run); True = keep and index;
+    False = keep for the caller but don't re-index (story already indexed in an earlier run)."""
+    if dd is None:
+        return True
+    url = canonicalize(str(d.url))  # the key the index (and so `exists`) uses
+    in_run, earlier = dd.check(url, d.content)
+    if in_run:
+        dups.append({"url": url, "duplicate_of": in_run})
+        return None
+    if earlier:
+        dups.append({"url": url, "duplicate_of": earlier, "indexed": False})
+        return False
+    return True
+
+# ---- Orchestrate: search -> scrape (concurrently) -> dedupe -> index
+def _iter_collect(query: str, k_search: int, k_index: int, max_workers: int,
+                  stats: Dict, budget_s: Optional[float] = None) -> Iterator[Tuple[int, Document]]:
+    """Yield (serper_rank, doc) as each doc is ready; queue it for indexing on the way out.
+
+    URLs in the negative cache are skipped up front; when fetches fail (including
+    fast failures from hosts with an open circuit) or turn out to be duplicates, the
+    next Serper results are scraped to make up the shortfall. After `budget_s`
+    seconds whatever is still downloading is abandoned.
+    """
+    deadline = time.monotonic() + budget_s if budget_s else None
+    # one candidate per canonical URL (Serper often lists tracking/AMP variants of a story)
+    ranked, seen = [], set()
+    for rank, it in enumerate(serper_news(query, num=k_search)):
+        key = canonicalize(str(it.url))
+        if key not in seen:
+            seen.add(key)
+            ranked.append((rank, it))
+    if _failures:
+        bad = _failures.get_many(seen)
+        for u, f in bad.items():
+            log.info(f"Skip {u}: failed recently ({f.reason})")
+        stats["skipped"] += len(bad)
+        ranked = [(rank, it) for rank, it in ranked if canonicalize(str(it.url)) not in bad]
+    dd = RunDeduper(_fingerprints, max_distance=DEDUP_DISTANCE, exists=_index.contains) if DEDUP else None
+    kept = 0
+    while kept < k_index and ranked:
+        if deadline and time.monotonic() >= deadline:
+            break
+        batch, ranked = ranked[:k_index - kept], ranked[k_index - kept:]
+        for _, (rank, it), d, err in run_concurrent(
+            batch,
+            lambda ri: make_doc(str(ri[1].url), title_hint=ri[1].title, source=ri[1].source, date_str=ri[1].date),
+            url_of=lambda ri: str(ri[1].url),
+            max_workers=max_workers,
+            deadline=deadline,
+        ):
+            if err:
+                log.warning(f"Skip {it.url}: {err}")
+                continue
+            if not d:
+                continue
+            verdict = _check_dup(dd, d, stats["duplicates"])
+            if verdict is None:
+                continue
+            if verdict:
+                stats["indexed"] += index_docs([d])  # background writer; doesn't block the stream
+            kept += 1
+            yield rank, d
+    if deadline and kept < k_index and time.monotonic() >= deadline:
+        stats["budget_exhausted"] = True
+        log.warning(f"Collect budget of {budget_s:.0f}s used up with {kept}/{k_index} docs")
+
+
+def iter_collect(query: str, k_search: int = 10, k_index: int = 8,
+                 max_workers: int = MAX_CONCURRENCY, budget_s: float = COLLECT_BUDGET,
+                 with_rank: bool = False) -> Iterator:
+    """Streaming collect_and_index: yields each Document as soon as it is fetched and extracted.
+
+    Documents arrive in completion order, not Serper rank order; `with_rank=True`
+    yields (serper_rank, Document) so callers can restore rank order. Among
+    near-duplicate copies the first one to finish is kept.
+    """
+    stats = {"indexed": 0, "duplicates": [], "skipped": 0, "budget_exhausted": False}
+    for rank, d in _iter_collect(query, k_search, k_index, max_workers, stats, budget_s):
+        yield (rank, d) if with_rank else d
+
+
+async def aiter_collect(query: str, k_search: int = 10, k_index: int = 8,
+                        max_workers: int = MAX_CONCURRENCY,
+                        budget_s: float = COLLECT_BUDGET) -> AsyncIterator[Document]:
+    """Async-iterator form of iter_collect (runs the scrape in the default executor).
+
+    Cancelling the consumer mid-fetch waits for that next() to return on its thread
+    (a running generator can't be closed), then closes the scrape and re-raises.
+    """
+    loop = asyncio.get_running_loop()
+    it = iter_collect(query, k_search, k_index, max_workers, budget_s)
+    done = object()
+    pending = None
+    try:
+        while True:
+            # shielded, so a cancel leaves `pending` tracking the next() still in flight
+            pending = loop.run_in_executor(None, next, it, done)
+            d = await asyncio.shield(pending)
+            if d is done:
+                return
+            yield d
+    finally:
+        if pending is not None and not pending.done():
+            try:
+                await pending
+            except Exception:
+                pass   # the consumer is gone; its error (e.g. CancelledError) is the one to raise
+        await loop.run_in_executor(None, it.close)
+
+
+def collect_and_index(query: str, k_search: int = 10, k_index: int = 8,
+                      max_workers: int = MAX_CONCURRENCY, budget_s: float = COLLECT_BUDGET) -> Dict:
+    stats = {"indexed": 0, "duplicates": [], "skipped": 0, "budget_exhausted": False}
+    found = dict(_iter_collect(query, k_search, k_index, max_workers, stats, budget_s))
+    docs = [found[i] for i in sorted(found)]  # keep Serper rank order
+    if stats["duplicates"]:
+        log.info(f"Near-duplicates: {len(stats['duplicates'])} skipped")
+    return {
+        "indexed": stats["indexed"],
         "query": query,
         "docs": [d.dict() for d in docs],  # include full documents
-        "examples": [d.title for d in docs[:5]]
+        "examples": [d.title for d in docs[:5]],
+        "duplicates": stats["duplicates"],
+        "skipped_known_bad": stats["skipped"],
+        "budget_exhausted": stats["budget_exhausted"],
+    }
+
+
+def pipeline_stats() -> Dict:
+    """Stage latencies plus cache/index/host counters, e.g. for the benchmark harness."""
+    return {
+        "stages": _metrics.summary(),
+        "search_cache": _search_cache.stats(),
+        "doc_cache": cache_stats(),
+        "index": {k: v for k, v in index_stats().items() if k != "per_shard"},
+        "failures": failure_stats(),
+        "hosts": {k: v for k, v in host_stats().items() if k != "hosts"},
+        "extract_timeouts": _extractor.timeouts,
     }
 
 
+def reset_pipeline_stats() -> None:
+    _metrics.reset()
+
+
 
 """ print(collect_and_index("Nvidia stock prices upto 2025 give me the response in jason format", k_search=10, k_index=6))
 hits = ir_search("NVIDIA earnings GPU AI data center")
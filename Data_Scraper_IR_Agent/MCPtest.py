@@ -13,7 +13,7 @@ mcp = FastMCP("MarketPipeline")
 def scraper(query: str) -> dict:
     """Scrape data and return raw docs + IR hits"""
     docs = collect_and_index(query, k_search=10, k_index=6)
-    hits = ir_search(query, limit=5)
+    hits = ir_search(query, limit=5, fresh=True)
     return {"query": query, "scraped_docs": docs, "ir_hits": hits}
 
 @mcp.tool()
@@ -26,7 +26,7 @@ def DataScraper_agent(query: str, json_file: str = "scraped_docs.json") -> dict:
         docs_data = json.load(f)
 
     # Gather context from IR
-    hits = ir_search(query, limit=5)
+    hits = ir_search(query, limit=5, fresh=True)
     context_text = "Pre-scraped document titles:\n"
     for h in hits:
         context_text += f"- {h['title']} ({h['source']})\n"
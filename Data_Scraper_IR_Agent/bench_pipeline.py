@@ -0,0 +1,316 @@
+# bench_pipeline.py
+"""
+Offline benchmark for the DataScraperIR search -> fetch -> extract -> index pipeline.
+
+Starts local stand-in servers instead of Serper and the live web:
+- a fake Serper endpoint (POST /news) that returns links for each query, with
+  tracking parameters attached the way real news links often have them;
+- one article server per fake publisher (127.0.0.1, 127.0.0.2, ... where the OS
+  allows it) serving recorded news HTML from --corpus, or generated articles
+  (with some syndicated near-duplicates) when no corpus is given.
+
+Latency, 5xx errors, 404s and thin pages can be injected. Every round runs
+collect_and_index over the same queries and then ir_search several times; round
+1 is cold, later rounds show the warm caches. Reported: docs/sec, p50/p95 per
+stage (search, fetch, extract, index, ir_search) and cache hit rates.
+
+Everything runs in a throwaway working directory, so the real storage/ is untouched.
+
+    python Data_Scraper_IR_Agent/bench_pipeline.py --docs 200 --queries 10 --latency-ms 80 --error-rate 0.05
+    python Data_Scraper_IR_Agent/bench_pipeline.py --corpus saved_pages/ --json bench.json
+"""
+from __future__ import annotations
+import argparse, hashlib, json, os, random, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TOPICS = ["nvidia", "tesla", "apple", "oil", "bitcoin", "inflation", "semiconductor", "retail",
+          "airline", "pharma", "bank", "cloud", "ev battery", "streaming", "gold"]
+WORDS = ("market shares investors quarter revenue growth guidance analysts earnings demand supply "
+         "margin outlook forecast stock trading rally decline sector regulators report company "
+         "billion million percent profit losses pricing competition customers expansion strategy "
+         "chips data center factory production exports tariffs rates consumer spending index").split()
+
+
+# ---- corpus
+def _article(i: int, rng: random.Random) -> Dict:
+    topic = TOPICS[i % len(TOPICS)]
+    paras = []
+    for _ in range(rng.randint(5, 10)):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(50, 110))]
+        words[rng.randrange(len(words))] = topic
+        paras.append(" ".join(words).capitalize() + ".")
+    title = f"{topic.title()} {rng.choice(WORDS)} {rng.choice(WORDS)} report {i}"
+    return {"title": title, "topic": topic, "paras": paras}
+
+
+def _render(a: Dict) -> bytes:
+    body = "".join(f"<p>{p}</p>" for p in a["paras"])
+    nav = "".join(f"<li><a href='/section/{k}'>Section {k}</a></li>" for k in range(30))
+    return (f"<!doctype html><html><head><meta charset='utf-8'><title>{a['title']}</title></head>"
+            f"<body><nav><ul>{nav}</ul></nav><article><h1>{a['title']}</h1>{body}</article>"
+            f"<footer>Copyright bench news</footer></body></html>").encode()
+
+
+def build_corpus(n: int, dup_rate: float, short_rate: float, seed: int,
+                 corpus_dir: Optional[Path]) -> List[Dict]:
+    """List of {"html": bytes, "topic": str, "title": str}."""
+    rng = random.Random(seed)
+    if corpus_dir:
+        pages = []
+        for i, p in enumerate(sorted(corpus_dir.glob("*.htm*"))):
+            html = p.read_bytes()
+            pages.append({"html": html, "title": p.stem, "topic": TOPICS[i % len(TOPICS)]})
+        if not pages:
+            sys.exit(f"No .html files in {corpus_dir}")
+        return pages
+    pages, arts = [], []
+    for i in range(n):
+        if arts and rng.random() < dup_rate:  # syndicated copy: same story, different chrome
+            a = dict(rng.choice(arts))
+            a["paras"] = a["paras"] + [f"This story was syndicated by partner {i}."]
+        elif rng.random() < short_rate:
+            a = {"title": f"Video {i}", "topic": TOPICS[i % len(TOPICS)], "paras": ["Watch the clip."]}
+        else:
+            a = _article(i, rng)
+        arts.append(a)
+        pages.append({"html": _render(a), "title": a["title"], "topic": a["topic"]})
+    return pages
+
+
+# ---- stand-in servers
+class Faults:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, not_found_rate: float,
+                 serper_latency_ms: float, seed: int):
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.error_rate, self.not_found_rate = error_rate, not_found_rate
+        self.serper_latency_ms = serper_latency_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def delay(self, base_ms: float) -> None:
+        with self.lock:
+            ms = max(0.0, base_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms))
+            self.requests += 1
+        if ms:
+            time.sleep(ms / 1000.0)
+
+    def roll(self) -> Optional[int]:
+        with self.lock:
+            x = self.rng.random()
+        if x < self.error_rate:
+            return 500
+        if x < self.error_rate + self.not_found_rate:
+            return 404
+        return None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # scraper hung up early: expected
+            super().handle_error(request, client_address)
+
+
+def make_handler(pages: List[Dict], hosts: List[str], port_of: Dict[str, int], faults: Faults):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code: int, body: bytes, ctype: str = "text/html; charset=utf-8") -> None:
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/robots.txt":
+                return self._send(404, b"")
+            if not path.startswith("/news/"):
+                return self._send(404, b"not found")
+            faults.delay(faults.latency_ms)
+            code = faults.roll()
+            if code:
+                return self._send(code, b"injected")
+            try:
+                page = pages[int(path.rsplit("/", 1)[1])]
+            except (ValueError, IndexError):
+                return self._send(404, b"not found")
+            self._send(200, page["html"])
+
+        def do_POST(self):
+            if self.path.split("?")[0] != "/news":
+                return self._send(404, b"not found")
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            faults.delay(faults.serper_latency_ms)
+            q, num = req.get("q", ""), int(req.get("num", 10))
+            topic = next((t for t in TOPICS if t in q.lower()), None)
+            ids = [i for i, p in enumerate(pages) if p["topic"] == topic] or list(range(len(pages)))
+            start = int(hashlib.md5(q.encode()).hexdigest(), 16) % len(ids)
+            news = []
+            for k in range(min(num, len(ids))):
+                i = ids[(start + k) % len(ids)]
+                host = hosts[i % len(hosts)]
+                news.append({
+                    "title": pages[i]["title"],
+                    "link": f"http://{host}:{port_of[host]}/news/{i}?utm_source=bench&utm_medium=feed",
+                    "snippet": pages[i]["title"],
+                    "source": f"Publisher {hosts.index(host)}",
+                    "date": f"{1 + i % 20} days ago",
+                })
+            self._send(200, json.dumps({"news": news}).encode(), "application/json")
+
+    return Handler
+
+
+def start_servers(pages: List[Dict], n_hosts: int, faults: Faults):
+    hosts, servers, port_of = [], [], {}
+    for h in range(n_hosts):
+        ip = f"127.0.0.{h + 1}"
+        try:
+            srv = _Server((ip, 0), None)
+        except OSError:  # only 127.0.0.1 is bindable here (e.g. macOS)
+            if not hosts:
+                raise
+            break
+        hosts.append(ip)
+        port_of[ip] = srv.server_address[1]
+        servers.append(srv)
+    handler = make_handler(pages, hosts, port_of, faults)
+    for srv in servers:
+        srv.RequestHandlerClass = handler
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return hosts, port_of, servers
+
+
+# ---- benchmark
+def _delta(now: Dict, before: Dict, keys: List[str]) -> Dict:
+    return {k: now.get(k, 0) - before.get(k, 0) for k in keys}
+
+
+def _rate(hits: int, total: int) -> float:
+    return round(hits / total, 3) if total else 0.0
+
+
+def run(args) -> Dict:
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.not_found_rate,
+                    args.serper_latency_ms, args.seed)
+    pages = build_corpus(args.docs, args.dup_rate, args.short_rate, args.seed, args.corpus)
+    hosts, port_of, servers = start_servers(pages, args.hosts, faults)
+
+    workdir = Path(tempfile.mkdtemp(prefix="dsir-bench-"))
+    os.chdir(workdir)  # DataScraperIR keeps its storage/ under the working directory
+    os.environ.update({
+        "SERPER_URL": f"http://{hosts[0]}:{port_of[hosts[0]]}/news",
+        "SERPER_API_KEY": os.environ.get("SERPER_API_KEY") or "bench",
+        "SCRAPER_HOST_DELAY": str(args.host_delay),
+        "SCRAPER_MAX_CONCURRENCY": str(args.concurrency),
+    })
+    sys.path.insert(0, str(Path(__file__).parent))
+    import DataScraperIR as D
+
+    queries = [f"{TOPICS[i % len(TOPICS)]} stock news {i // len(TOPICS) or ''}".strip()
+               for i in range(args.queries)]
+    rounds = []
+    for rnd in range(1, args.rounds + 1):
+        D.reset_pipeline_stats()
+        before = D.pipeline_stats()
+        t0 = time.perf_counter()
+        docs = 0
+        for q in queries:
+            docs += len(D.collect_and_index(q, k_search=args.k_search, k_index=args.k_index)["docs"])
+        # commit the writer's last batch: searches must see every doc and the
+        # index stage must include that commit
+        D.flush_index()
+        collect_s = time.perf_counter() - t0
+        t1 = time.perf_counter()
+        for _ in range(args.searches):
+            for q in queries:
+                D.ir_search(q, limit=10)
+        search_s = time.perf_counter() - t1
+        after = D.pipeline_stats()
+        dc = _delta(after["doc_cache"], before["doc_cache"], ["hits_mem", "hits_disk", "misses"])
+        sc = _delta(after["search_cache"], before["search_cache"], ["hits", "misses", "shared"])
+        ix = _delta(after["index"], before["index"], ["result_hits", "result_misses"])
+        rounds.append({
+            "round": rnd,
+            "docs": docs,
+            "collect_seconds": round(collect_s, 3),
+            "docs_per_sec": round(docs / collect_s, 2) if collect_s else 0.0,
+            "ir_search_qps": round(args.searches * len(queries) / search_s, 1) if search_s else 0.0,
+            "stages": after["stages"],
+            "hit_rates": {
+                "doc_cache": _rate(dc["hits_mem"] + dc["hits_disk"], sum(dc.values())),
+                "search_cache": _rate(sc["hits"] + sc["shared"], sum(sc.values())),
+                "ir_search_results": _rate(ix["result_hits"], sum(ix.values())),
+            },
+            "failures": after["failures"],
+            "hosts": after["hosts"],
+        })
+    for srv in servers:
+        srv.shutdown()
+    return {
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "publishers": len(hosts),
+        "corpus_pages": len(pages),
+        "server_requests": faults.requests,
+        "workdir": str(workdir),
+        "rounds": rounds,
+    }
+
+
+def print_report(res: Dict) -> None:
+    print(f"corpus={res['corpus_pages']} pages, publishers={res['publishers']}, "
+          f"server requests={res['server_requests']}, workdir={res['workdir']}")
+    for r in res["rounds"]:
+        print(f"\nround {r['round']}: {r['docs']} docs in {r['collect_seconds']}s "
+              f"-> {r['docs_per_sec']} docs/s; ir_search {r['ir_search_qps']} q/s")
+        print(f"  {'stage':<10}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for stage in ("search", "fetch", "extract", "index", "ir_search"):
+            s = r["stages"].get(stage)
+            if s:
+                print(f"  {stage:<10}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['max_ms']:>10}")
+        print("  hit rates: " + ", ".join(f"{k}={v:.1%}" for k, v in r["hit_rates"].items()))
+        if r["failures"].get("active"):
+            print(f"  negative cache: {r['failures']['active']}")
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--docs", type=int, default=150, help="generated articles (ignored with --corpus)")
+    ap.add_argument("--corpus", type=Path, help="directory of recorded .html pages to serve")
+    ap.add_argument("--queries", type=int, default=8)
+    ap.add_argument("--rounds", type=int, default=2)
+    ap.add_argument("--searches", type=int, default=3, help="ir_search passes over the queries per round")
+    ap.add_argument("--k-search", type=int, default=10)
+    ap.add_argument("--k-index", type=int, default=8)
+    ap.add_argument("--hosts", type=int, default=8, help="fake publishers")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--host-delay", type=float, default=0.0, help="per-host politeness gap (s)")
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--serper-latency-ms", type=float, default=150.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of page requests answered 500")
+    ap.add_argument("--not-found-rate", type=float, default=0.0, help="fraction answered 404")
+    ap.add_argument("--dup-rate", type=float, default=0.1, help="syndicated near-duplicate articles")
+    ap.add_argument("--short-rate", type=float, default=0.05, help="pages too thin to extract")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", type=Path, help="also write the full report here")
+    args = ap.parse_args(argv)
+    args.corpus = args.corpus.resolve() if args.corpus else None
+    args.json = args.json.resolve() if args.json else None  # run() changes directory
+    res = run(args)
+    print_report(res)
+    if args.json:
+        args.json.write_text(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
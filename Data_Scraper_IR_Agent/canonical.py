@@ -0,0 +1,89 @@
+# canonical.py
+"""
+URL canonicalization, so one article gets one cache key and one index entry.
+
+- canonicalize(): lowercases scheme/host, drops default ports, fragments and
+  tracking parameters (utm_*, gclid, fbclid, ...), unwraps AMP variants
+  (Google AMP cache links, /amp and .amp paths, ?amp=1 / outputType=amp),
+  strips trailing slashes and sorts the remaining query parameters.
+- link_canonical(): the page's own <link rel="canonical"> if it stays on the
+  same site (cross-site canonicals are ignored; syndication partners set them).
+"""
+from __future__ import annotations
+import re, urllib.parse
+from typing import Optional
+
+TRACKING_PARAMS = {
+    "gclid", "dclid", "gbraid", "wbraid", "fbclid", "msclkid", "yclid", "igshid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi", "ocid", "cmpid", "smid",
+    "ref_src", "ref_url", "sr_share", "spm",
+}
+AMP_PARAMS = {"amp", "outputtype", "amp_js_v", "usqp"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_AMP_CACHE = re.compile(r"^[\w-]+\.cdn\.ampproject\.org$")
+_LINK_TAG = re.compile(r"<link\b[^>]*>", re.I)
+_ATTR = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+
+
+def _drop_param(key: str) -> bool:
+    k = key.lower()
+    return k.startswith("utm_") or k in TRACKING_PARAMS or k in AMP_PARAMS
+
+
+def _strip_amp_path(path: str) -> str:
+    path = re.sub(r"/amp/?$", "/", path)                 # /story/amp -> /story/
+    path = re.sub(r"^/amp/", "/", path)                  # /amp/story -> /story
+    path = re.sub(r"\.amp(\.html?)?$", r"\1", path)       # story.amp.html -> story.html
+    return path
+
+
+def canonicalize(url: str) -> str:
+    """Stable form of `url`; returns the input unchanged if it can't be parsed."""
+    try:
+        p = urllib.parse.urlsplit(url.strip())
+    except ValueError:
+        return url
+    if p.scheme.lower() not in _DEFAULT_PORTS or not p.hostname:
+        return url
+    host = p.hostname.lower()
+    path = p.path
+    # https://www-example-com.cdn.ampproject.org/c/s/www.example.com/story -> https://www.example.com/story
+    if _AMP_CACHE.match(host):
+        m = re.match(r"^/[a-z](?:/s)?/([^/]+)(/.*)?$", path)
+        if m:
+            return canonicalize(f"https://{m.group(1)}{m.group(2) or '/'}" + (f"?{p.query}" if p.query else ""))
+    try:
+        port = p.port
+    except ValueError:
+        port = None
+    netloc = host if port in (None, _DEFAULT_PORTS[p.scheme.lower()]) else f"{host}:{port}"
+    path = _strip_amp_path(path or "/")
+    path = re.sub(r"/{2,}", "/", path)
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = sorted((k, v) for k, v in urllib.parse.parse_qsl(p.query, keep_blank_values=True)
+                   if not _drop_param(k))
+    return urllib.parse.urlunsplit((p.scheme.lower(), netloc, path or "/", urllib.parse.urlencode(query), ""))
+
+
+def _site(host: str) -> str:
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def link_canonical(html: str, base_url: str) -> Optional[str]:
+    """Canonicalized <link rel="canonical"> href from the page head, if on the same site."""
+    head = html[:200_000]
+    end = head.lower().find("</head>")
+    if end != -1:
+        head = head[:end]
+    for tag in _LINK_TAG.findall(head):
+        attrs = {m.group(1).lower(): (m.group(2) or m.group(3) or m.group(4) or "") for m in _ATTR.finditer(tag)}
+        if "canonical" not in attrs.get("rel", "").lower().split() or not attrs.get("href"):
+            continue
+        href = urllib.parse.urljoin(base_url, attrs["href"].strip())
+        a, b = urllib.parse.urlsplit(href).hostname or "", urllib.parse.urlsplit(base_url).hostname or ""
+        if a and _site(a) == _site(b):
+            return canonicalize(href)
+        return None
+    return None
@@ -0,0 +1,135 @@
+# dedup.py
+"""
+Near-duplicate detection for scraped news (syndicated wire copies).
+
+- simhash: 64-bit SimHash over 3-word shingles of the normalized text; copies of
+  the same story with different boilerplate land within a few bits of each other.
+- FingerprintIndex: persistent SQLite store of url -> fingerprint. Fingerprints are
+  split into four 16-bit bands; two fingerprints within 3 bits must share at least
+  one band exactly, so lookups only compare against band matches. That guarantee
+  stops at MAX_DISTANCE (BANDS - 1), so larger distances are rejected.
+- RunDeduper only suppresses a copy of an earlier run's story while that story is
+  still in the index (`exists`); fingerprints of originals that were dropped by
+  shard retention are forgotten, and the copy is indexed in their place.
+"""
+from __future__ import annotations
+import hashlib, re, sqlite3, threading, time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+BANDS = 4
+BAND_BITS = 64 // BANDS
+MASK64 = (1 << 64) - 1
+MAX_DISTANCE = BANDS - 1  # pigeonhole: more differing bits could touch every band
+
+
+def _h64(s: str) -> int:
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle:
+        feats = words or [""]
+    else:
+        feats = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    v = [0] * 64
+    for f in feats:
+        h = _h64(f)
+        for b in range(64):
+            v[b] += 1 if (h >> b) & 1 else -1
+    fp = 0
+    for b in range(64):
+        if v[b] > 0:
+            fp |= 1 << b
+    return fp
+
+
+def distance(a: int, b: int) -> int:
+    return ((a ^ b) & MASK64).bit_count()
+
+
+def _bands(fp: int) -> List[int]:
+    return [(fp >> (i * BAND_BITS)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def _to_sql(fp: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fp - (1 << 64) if fp >= (1 << 63) else fp
+
+
+def _from_sql(v: int) -> int:
+    return v & MASK64
+
+
+class FingerprintIndex:
+    def __init__(self, path: Path, max_distance: int = 3):
+        if not 0 <= max_distance <= MAX_DISTANCE:
+            raise ValueError(f"max_distance must be 0..{MAX_DISTANCE} with {BANDS} bands, got {max_distance}")
+        self.path = Path(path)
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS fingerprints(
+            url TEXT PRIMARY KEY, fp INTEGER NOT NULL,
+            b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER, seen_at REAL)""")
+        for i in range(BANDS):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS fp_b{i} ON fingerprints(b{i})")
+
+    def find(self, url: str, fp: int) -> Optional[Tuple[str, int]]:
+        """Closest other URL within `max_distance` bits, as (url, distance), or None."""
+        b = _bands(fp)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, fp FROM fingerprints WHERE (b0=? OR b1=? OR b2=? OR b3=?) AND url<>?",
+                (*b, url)).fetchall()
+        best = None
+        for other, ofp in rows:
+            d = distance(fp, _from_sql(ofp))
+            if d <= self.max_distance and (best is None or d < best[1]):
+                best = (other, d)
+        return best
+
+    def add(self, url: str, fp: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints(url, fp, b0, b1, b2, b3, seen_at) VALUES(?,?,?,?,?,?,?)",
+                (url, _to_sql(fp), *_bands(fp), time.time()))
+
+    def remove(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM fingerprints WHERE url = ?", (url,))
+
+    def prune(self, older_than: float) -> int:
+        """Forget fingerprints first seen before `older_than` (epoch seconds)."""
+        with self._lock:
+            return self._db.execute("DELETE FROM fingerprints WHERE seen_at < ?", (older_than,)).rowcount
+
+
+class RunDeduper:
+    """Near-duplicate filter for one batch, backed by the persistent index for earlier runs."""
+
+    def __init__(self, store: Optional[FingerprintIndex], max_distance: int = 3,
+                 exists: Optional[Callable[[str], bool]] = None):
+        self.store = store
+        self.max_distance = max_distance
+        self.exists = exists  # is an earlier run's original still indexed?
+        self._seen: List[Tuple[str, int]] = []
+
+    def check(self, url: str, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (in_run_original, earlier_run_original); both None for a new story."""
+        fp = simhash(text)
+        for other, ofp in self._seen:
+            if other != url and distance(fp, ofp) <= self.max_distance:
+                return other, None
+        self._seen.append((url, fp))
+        prior = self.store.find(url, fp) if self.store else None
+        if prior and self.exists is not None and not self.exists(prior[0]):
+            self.store.remove(prior[0])  # original is gone from the index: this copy replaces it
+            prior = None
+        if self.store:
+            self.store.add(url, fp)
+        return None, (prior[0] if prior else None)
@@ -0,0 +1,258 @@
+# doc_cache.py
+"""
+Two-tier cache for scraped documents.
+
+- Front tier: in-memory LRU of decoded documents (hot URLs never touch disk).
+- Back tier: one SQLite file with zlib-compressed compact JSON per document.
+  Writes are transactional (atomic), the file has a size budget (least recently
+  used rows are evicted first) and rows older than `ttl` seconds are dropped.
+
+Each entry also keeps the HTTP validators (ETag, Last-Modified) and the time it
+was last fetched or revalidated, so callers can decide between serving it,
+sending a conditional GET, or refetching.
+
+Keys are sha256(url)[:24], the same names the old one-file-per-URL cache used,
+so `import_legacy` can pull existing storage/cache/*.json files in once.
+"""
+from __future__ import annotations
+import hashlib, json, sqlite3, threading, time, zlib, logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+log = logging.getLogger("doc_cache")
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()[:24]
+
+
+class CacheEntry(NamedTuple):
+    doc: dict
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class DocCache:
+    def __init__(self, path: Path, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 30 * 86400, mem_items: int = 256):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.mem_items = mem_items
+        self._mem: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits_mem = self.hits_disk = self.misses = self.evictions = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS docs(
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL)""")
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(docs)")}
+        for col in ("etag", "last_modified"):
+            if col not in cols:
+                self._db.execute(f"ALTER TABLE docs ADD COLUMN {col} TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS docs_accessed ON docs(accessed_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta(k TEXT PRIMARY KEY, v TEXT)")
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+
+    # ---- encoding
+    @staticmethod
+    def _encode(d: dict) -> bytes:
+        return zlib.compress(json.dumps(d, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(b: bytes) -> dict:
+        return json.loads(zlib.decompress(b).decode("utf-8"))
+
+    # ---- front tier
+    def _remember(self, key: str, e: CacheEntry) -> None:
+        self._mem[key] = e
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    # ---- public API
+    def get(self, url: str) -> Optional[dict]:
+        e = self.lookup(url)
+        return e.doc if e else None
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Document plus validators and last fetch time, or None."""
+        key, now = cache_key(url), time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and now - hit.fetched_at < self.ttl:
+                self._mem.move_to_end(key)
+                self.hits_mem += 1
+                return hit
+            row = self._db.execute(
+                "SELECT data, stored_at, etag, last_modified FROM docs WHERE key=?", (key,)).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                if row is not None:
+                    self._delete(key)
+                self._mem.pop(key, None)
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE docs SET accessed_at=? WHERE key=?", (now, key))
+            e = CacheEntry(self._decode(row[0]), row[1], row[2], row[3])
+            self._remember(key, e)
+            self.hits_disk += 1
+            return e
+
+    def get_many(self, urls) -> dict:
+        """{url: doc} for every cached, unexpired url; one SQL query for all memory misses."""
+        now = time.time()
+        keys = {cache_key(u): u for u in urls}
+        out, missing = {}, []
+        with self._lock:
+            for key, u in keys.items():
+                hit = self._mem.get(key)
+                if hit and now - hit.fetched_at < self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits_mem += 1
+                    out[u] = hit.doc
+                else:
+                    missing.append(key)
+            found = []
+            for i in range(0, len(missing), 500):  # stay under SQLite's bound-parameter limit
+                chunk = missing[i:i + 500]
+                found += self._db.execute(
+                    f"SELECT key, data, stored_at, etag, last_modified FROM docs "
+                    f"WHERE key IN ({','.join('?' * len(chunk))}) AND stored_at >= ?",
+                    (*chunk, now - self.ttl)).fetchall()
+            for key, data, stored_at, etag, lm in found:
+                e = CacheEntry(self._decode(data), stored_at, etag, lm)
+                self._remember(key, e)
+                out[keys[key]] = e.doc
+            if found:
+                self._db.executemany("UPDATE docs SET accessed_at=? WHERE key=?", [(now, r[0]) for r in found])
+            self.hits_disk += len(found)
+            self.misses += len(missing) - len(found)
+        return out
+
+    def iter_docs(self, batch: int = 500) -> Iterator[dict]:
+        """Every stored document, oldest row first; the lock is only held per batch,
+        so a rebuild can stream the whole cache while scrapes keep writing to it."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT rowid, data FROM docs WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                        (last, batch)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, data in rows:
+                try:
+                    yield self._decode(data)
+                except Exception as e:
+                    log.warning(f"Skipping unreadable cache row: {e}")
+
+    def put(self, url: str, d: dict, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        key, now = cache_key(url), time.time()
+        blob = self._encode(d)
+        with self._lock:
+            old = self._db.execute("SELECT size FROM docs WHERE key=?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO docs(key, url, data, size, stored_at, accessed_at, etag, last_modified) "
+                "VALUES(?,?,?,?,?,?,?,?)",
+                (key, url, blob, len(blob), now, now, etag, last_modified))
+            self._bytes += len(blob) - (old[0] if old else 0)
+            self._remember(key, CacheEntry(d, now, etag, last_modified))
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Mark an entry as just revalidated (e.g. after a 304), optionally with new validators."""
+        key, now = cache_key(url), time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE docs SET stored_at=?, accessed_at=?, etag=COALESCE(?, etag), "
+                "last_modified=COALESCE(?, last_modified) WHERE key=?",
+                (now, now, etag, last_modified, key))
+            hit = self._mem.get(key)
+            if hit:
+                self._remember(key, hit._replace(fetched_at=now, etag=etag or hit.etag,
+                                                 last_modified=last_modified or hit.last_modified))
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute("SELECT size FROM docs WHERE key=?", (key,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM docs WHERE key=?", (key,))
+            self._bytes -= row[0]
+
+    def _evict(self) -> None:
+        """Drop expired rows, then least recently used rows until 90% of the budget."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cutoff = time.time() - self.ttl
+                n = self._db.execute("DELETE FROM docs WHERE stored_at < ?", (cutoff,)).rowcount
+                self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+                target = int(self.max_bytes * 0.9)
+                if self._bytes > target:
+                    freed, doomed = 0, []
+                    for key, size in self._db.execute("SELECT key, size FROM docs ORDER BY accessed_at"):
+                        if self._bytes - freed <= target:
+                            break
+                        doomed.append((key,))
+                        freed += size
+                    self._db.executemany("DELETE FROM docs WHERE key=?", doomed)
+                    self._bytes -= freed
+                    n += len(doomed)
+                    for (key,) in doomed:
+                        self._mem.pop(key, None)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.evictions += n
+
+    def purge_expired(self) -> None:
+        self._evict()
+
+    def import_legacy(self, cache_dir: Path) -> int:
+        """One-time import of the old storage/cache/<key>.json files (files are left in place)."""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM meta WHERE k='legacy_imported'").fetchone():
+                return 0
+            n = 0
+            for p in sorted(Path(cache_dir).glob("*.json")):
+                try:
+                    with open(p, "r", encoding="utf-8") as f:
+                        d = json.load(f)
+                    blob = self._encode(d)
+                    st = p.stat().st_mtime
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO docs(key, url, data, size, stored_at, accessed_at) VALUES(?,?,?,?,?,?)",
+                        (p.stem, str(d.get("url", "")), blob, len(blob), st, st))
+                    n += 1
+                except Exception as e:
+                    log.warning(f"Skipping legacy cache file {p.name}: {e}")
+            self._db.execute("INSERT OR REPLACE INTO meta(k, v) VALUES('legacy_imported', ?)", (str(time.time()),))
+            self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+        if n:
+            log.info(f"Imported {n} legacy cache files into {self.path.name}")
+        return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            lookups = self.hits_mem + self.hits_disk + self.misses
+            return {
+                "entries": entries, "bytes": self._bytes, "mem_entries": len(self._mem),
+                "hits_mem": self.hits_mem, "hits_disk": self.hits_disk, "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits_mem + self.hits_disk) / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
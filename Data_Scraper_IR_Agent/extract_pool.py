@@ -0,0 +1,140 @@
+# extract_pool.py
+"""
+Bounded process pool for trafilatura extraction.
+
+Fetch threads hand HTML to `ExtractPool.extract`, which runs `trafilatura.extract`
+in a worker process, so extraction no longer competes with fetching for the GIL
+and uses every core. Each document gets a CPU-time budget enforced inside the
+worker (ITIMER_PROF where available) plus a wall-clock guard in the caller; a
+document that blows the budget is dropped instead of stalling the pipeline.
+
+PDF responses go through `extract_pdf` on the same pool (pypdf or PyPDF2,
+whichever is installed).
+
+The pool is started lazily from scrape threads, after the index writer, optimize
+and embedding threads are already running, so workers never come from a plain
+fork() of that process: the default start method is forkserver (spawn where
+forkserver doesn't exist).
+"""
+from __future__ import annotations
+import atexit, importlib.util, io, logging, multiprocessing, os, signal, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+log = logging.getLogger("extract_pool")
+
+
+class ExtractTimeout(Exception):
+    """A document ran out of CPU or wall time, or kept crashing the pool."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise ExtractTimeout()
+
+
+def _extract(html: str, url: str) -> Optional[str]:
+    import trafilatura
+    return trafilatura.extract(html, url=url, include_comments=False, include_tables=False)
+
+
+def _extract_pdf(data: bytes, url: str, max_pages: int = 50) -> Optional[str]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    pages = [(p.extract_text() or "") for p in reader.pages[:max_pages]]
+    text = "\n".join(t.strip() for t in pages if t.strip())
+    return text or None
+
+
+def pdf_supported() -> bool:
+    return bool(importlib.util.find_spec("pypdf") or importlib.util.find_spec("PyPDF2"))
+
+
+def _extract_worker(fn, data, url: str, cpu_timeout: float) -> Optional[str]:
+    """Runs in the child process; gives up after `cpu_timeout` seconds of CPU time."""
+    use_timer = cpu_timeout > 0 and hasattr(signal, "setitimer")
+    if use_timer:
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+        signal.setitimer(signal.ITIMER_PROF, cpu_timeout)
+    try:
+        return fn(data, url)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def default_start_method() -> str:
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class ExtractPool:
+    def __init__(self, workers: Optional[int] = None, cpu_timeout: float = 10.0,
+                 start_method: Optional[str] = None):
+        self.workers = (os.cpu_count() or 2) if workers is None else workers
+        self.cpu_timeout = cpu_timeout
+        # forkserver/spawn re-import __main__ in the workers, so scripts need a __main__ guard
+        self.start_method = start_method or default_start_method()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        atexit.register(self.shutdown)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            return self._pool
+
+    def _reset(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, html: str, url: str) -> Optional[str]:
+        """Extracted main text, or None when there is none; ExtractTimeout when it ran out of time."""
+        return self._run(_extract, html, url)
+
+    def extract_pdf(self, data: bytes, url: str) -> Optional[str]:
+        """Text of a PDF document, or None when it has no text layer or can't be parsed."""
+        try:
+            return self._run(_extract_pdf, data, url)
+        except ExtractTimeout:
+            raise
+        except Exception as e:
+            log.warning(f"PDF extraction failed for {url}: {e}")
+            return None
+
+    def _run(self, fn, data, url: str) -> Optional[str]:
+        if self.workers <= 0:
+            return fn(data, url)
+        # wall-clock guard: generous on top of the CPU budget (queueing behind other docs)
+        wall = self.cpu_timeout * 3 + 5 if self.cpu_timeout > 0 else None
+        for attempt in (1, 2):
+            pool = self._get_pool()
+            try:
+                return pool.submit(_extract_worker, fn, data, url, self.cpu_timeout).result(timeout=wall)
+            except ExtractTimeout:
+                self.timeouts += 1
+                log.warning(f"Extraction exceeded {self.cpu_timeout}s CPU for {url}, skipping")
+                raise ExtractTimeout(f"over {self.cpu_timeout}s CPU") from None
+            except FutureTimeout:
+                self.timeouts += 1
+                log.warning(f"Extraction timed out for {url}, skipping")
+                raise ExtractTimeout(f"over {wall}s wall clock") from None
+            except BrokenProcessPool:
+                log.warning(f"Extraction pool broke on {url} (attempt {attempt}), restarting")
+                self._reset(pool)
+        raise ExtractTimeout("extraction pool crashed twice")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
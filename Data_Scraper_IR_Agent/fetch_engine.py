@@ -0,0 +1,260 @@
+# fetch_engine.py
+"""
+Concurrent fetch engine used by DataScraperIR.
+
+- HostScheduler: hands out per-host start slots so one publisher is never hit
+  more than once per `delay` seconds, while different hosts proceed in parallel.
+- HostHealth: per-host latency EWMA, error-rate EWMA and a circuit breaker
+  (closed -> open -> half-open probe -> closed), honoring Retry-After, so a slow
+  or blocking publisher is skipped instead of eating retries and timeouts.
+- run_concurrent: runs a worker over many items on the process-wide fetch pool
+  (the global cap on in-flight work, shared by concurrent callers) and yields
+  (index, item, result, error) as each one finishes, optionally until a deadline.
+"""
+from __future__ import annotations
+import threading, time, urllib.parse
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait as wait_futures
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def host_of(url: str) -> str:
+    try:
+        return (urllib.parse.urlparse(url).hostname or "").lower()
+    except Exception:
+        return ""
+
+
+class HostScheduler:
+    """Per-host politeness: requests to the same host start at least `delay` seconds apart.
+
+    Hosts whose next slot has already passed carry no state worth keeping; they are
+    swept out whenever more than `max_hosts` are tracked.
+    """
+
+    def __init__(self, delay: float = 1.0, max_hosts: int = 1024):
+        self.delay = delay
+        self.max_hosts = max_hosts
+        self._next: dict[str, float] = {}
+        self._prune_at = max_hosts
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Block the calling thread until `url`'s host may be hit again."""
+        if self.delay <= 0:
+            return
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.delay
+            if len(self._next) > self._prune_at:
+                self._next = {h: t for h, t in self._next.items() if t > now}
+                self._prune_at = max(self.max_hosts, 2 * len(self._next))
+        if start > now:
+            time.sleep(start - now)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _Host:
+    latency: Optional[float] = None   # EWMA seconds to response headers
+    error_rate: float = 0.0           # EWMA of failures (0..1)
+    samples: int = 0
+    consecutive: int = 0
+    state: str = "closed"             # closed | open | half_open
+    open_until: float = 0.0
+    trips: int = 0
+    probing: bool = False
+
+
+class HostHealth:
+    """Per-host health and circuit breaker.
+
+    A host opens after `fail_threshold` consecutive failures, or when its error-rate
+    EWMA passes `max_error_rate` (after `min_samples` requests). While open, `allow`
+    refuses it; after the cooldown (doubling on each re-trip, capped at `max_cooldown`)
+    one probe request is let through: success closes the circuit, failure re-opens it.
+    A Retry-After from the host opens it for at least that long.
+    """
+
+    def __init__(self, alpha: float = 0.3, fail_threshold: int = 2, max_error_rate: float = 0.5,
+                 min_samples: int = 4, cooldown: float = 60.0, max_cooldown: float = 1800.0,
+                 max_retry_after: float = 3600.0):
+        self.alpha = alpha
+        self.fail_threshold = fail_threshold
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_retry_after = max_retry_after
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self, url: str) -> Tuple[bool, str]:
+        """(allowed, state). In half-open state only one probe is allowed at a time."""
+        host = host_of(url)
+        now = time.monotonic()
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None or h.state == "closed":
+                return True, "closed"
+            if h.state == "open" and now >= h.open_until:
+                h.state, h.probing = "half_open", False
+            if h.state == "half_open" and not h.probing:
+                h.probing = True
+                return True, "half_open"
+            self.rejected += 1
+            return False, h.state
+
+    def record(self, url: str, ok: bool, latency: Optional[float] = None,
+               retry_after: Optional[float] = None) -> None:
+        host = host_of(url)
+        now = time.monotonic()
+        with self._lock:
+            h = self._hosts.setdefault(host, _Host())
+            h.samples += 1
+            if latency is not None:
+                h.latency = latency if h.latency is None else (1 - self.alpha) * h.latency + self.alpha * latency
+            h.error_rate = (1 - self.alpha) * h.error_rate + self.alpha * (0.0 if ok else 1.0)
+            h.probing = False
+            if ok:
+                h.consecutive = 0
+                if h.state != "closed":
+                    h.state, h.trips = "closed", 0
+                return
+            h.consecutive += 1
+            trip = (h.state == "half_open" or h.consecutive >= self.fail_threshold
+                    or (h.samples >= self.min_samples and h.error_rate > self.max_error_rate))
+            if retry_after is not None:
+                until = now + min(retry_after, self.max_retry_after)
+                h.state, h.open_until = "open", max(h.open_until, until)
+            elif trip and h.state != "open":  # late failures from requests already in flight don't re-trip
+                h.trips += 1
+                h.state = "open"
+                h.open_until = now + min(self.cooldown * 2 ** (h.trips - 1), self.max_cooldown)
+
+    def release(self, url: str) -> None:
+        """Free a half-open probe slot without recording an outcome (the request was interrupted)."""
+        with self._lock:
+            h = self._hosts.get(host_of(url))
+            if h is not None:
+                h.probing = False
+
+    def timeout_for(self, url: str, default: float, factor: float = 4.0, floor: float = 3.0) -> float:
+        """Read timeout scaled to the host's typical latency, never above `default`."""
+        with self._lock:
+            h = self._hosts.get(host_of(url))
+            if h is None or h.latency is None or h.samples < 3:
+                return default
+            return min(default, max(floor, h.latency * factor))
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "rejected": self.rejected,
+                "hosts": {host: {"state": h.state, "latency_ewma": h.latency, "error_rate": round(h.error_rate, 3),
+                                 "samples": h.samples,
+                                 "open_for": max(0.0, h.open_until - now) if h.state == "open" else 0.0}
+                          for host, h in self._hosts.items()},
+            }
+
+
+def interleave_by_host(items: Sequence[T], url_of: Callable[[T], str]) -> List[Tuple[int, T]]:
+    """Round-robin items across hosts (keeping rank order per host) so workers rarely queue on one host."""
+    buckets: "OrderedDict[str, List[Tuple[int, T]]]" = OrderedDict()
+    for i, it in enumerate(items):
+        buckets.setdefault(host_of(url_of(it)), []).append((i, it))
+    out: List[Tuple[int, T]] = []
+    while buckets:
+        for host in list(buckets):
+            out.append(buckets[host].pop(0))
+            if not buckets[host]:
+                del buckets[host]
+    return out
+
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_size = 8
+_pool_lock = threading.Lock()
+
+
+def set_max_concurrency(n: int) -> None:
+    """Size the process-wide fetch pool; must be called before its first use."""
+    global _pool_size
+    with _pool_lock:
+        if _pool is not None and n != _pool_size:
+            raise RuntimeError("fetch pool already started; set_max_concurrency must run first")
+        _pool_size = max(1, n)
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_pool_size, thread_name_prefix="scrape")
+        return _pool
+
+
+def run_concurrent(
+    items: Sequence[T],
+    worker: Callable[[T], R],
+    url_of: Callable[[T], str],
+    max_workers: int = 8,
+    deadline: Optional[float] = None,
+) -> Iterator[Tuple[int, T, Optional[R], Optional[BaseException]]]:
+    """Run `worker` over `items` and yield results as they complete.
+
+    Work runs on one process-wide pool, so concurrent calls together never have more
+    than set_max_concurrency() items in flight; `max_workers` further caps this call.
+    With a `deadline` (time.monotonic() value) iteration stops when it passes. When
+    iteration stops early, work still running is abandoned to finish in the
+    background and unstarted work is never submitted.
+    """
+    if not items:
+        return
+    pool = _shared_pool()
+    pending = iter(interleave_by_host(items, url_of))
+    futs: Dict[Future, Tuple[int, T]] = {}
+
+    def submit_next() -> None:
+        nxt = next(pending, None)
+        if nxt is not None:
+            futs[pool.submit(worker, nxt[1])] = nxt
+
+    for _ in range(max(1, max_workers)):
+        submit_next()
+    try:
+        while futs:
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return
+            done, _ = wait_futures(futs, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                i, it = futs.pop(f)
+                submit_next()
+                err = f.exception()
+                yield i, it, (None if err else f.result()), err
+    finally:
+        # consumer stopped early or deadline hit: drop anything still queued behind other callers
+        for f in futs:
+            f.cancel()
@@ -0,0 +1,189 @@
+# http_client.py
+"""
+Process-wide pooled HTTP client.
+
+One keep-alive `requests.Session` (plus an optional HTTP/2 `httpx.Client`) shared by
+every DataScraperIR call (Serper, page fetches, robots.txt) and reusable by other
+agents, e.g. the Ollama caller in Competitor_Comparison_Agent.
+
+- Connection pooling: connections are reused per host instead of a fresh TCP+TLS
+  handshake on every call.
+- HTTP/2 (opt-in, HTTP_HTTP2=1): non-streaming calls go through httpx with h2
+  multiplexing when `httpx[http2]` is installed; otherwise falls back to requests.
+- DNS cache: the session's own connections resolve hosts through a small TTL cache
+  (HTTP_DNS_TTL s); `socket.getaddrinfo` itself is left alone, so other libraries in
+  the process (Mongo, LLM clients) keep their normal resolution. The httpx/HTTP/2
+  path resolves normally; its multiplexed connections rarely reconnect anyway.
+- read_limited: read a `stream=True` response body up to a byte cap, so callers
+  can inspect headers first and never buffer an unbounded download.
+"""
+from __future__ import annotations
+import os, socket, threading, time, logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+log = logging.getLogger("http_client")
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))  # distinct hosts kept pooled
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))          # keep-alive connections per host
+HTTP2 = os.getenv("HTTP_HTTP2", "0") == "1"
+DNS_TTL = float(os.getenv("HTTP_DNS_TTL", "300"))
+DNS_MAX = 1024
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_h2 = None            # httpx.Client once created
+_h2_failed = False
+
+# ---- DNS cache (scraper transport only)
+_dns: "OrderedDict[tuple, tuple[float, List[str]]]" = OrderedDict()
+_dns_lock = threading.Lock()
+
+
+def resolve(host: str, port: int) -> List[str]:
+    """Addresses for host:port, memoized for DNS_TTL seconds; [] if resolution fails."""
+    key = (host, port)
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns.get(key)
+        if hit and hit[0] > now:
+            _dns.move_to_end(key)
+            return hit[1]
+    try:
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    except OSError:
+        return []
+    addrs = list(dict.fromkeys(info[4][0] for info in infos))
+    with _dns_lock:
+        _dns[key] = (now + DNS_TTL, addrs)
+        _dns.move_to_end(key)
+        while len(_dns) > DNS_MAX:
+            _dns.popitem(last=False)
+    return addrs
+
+
+def clear_dns_cache() -> None:
+    with _dns_lock:
+        _dns.clear()
+
+
+class _CachedDNSMixin:
+    """Connect to cached addresses; TLS SNI/verification still use the real host name."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        addrs = resolve(host, self.port) if DNS_TTL > 0 else []
+        if not addrs:
+            return super()._new_conn()   # uncached path, with urllib3's own error reporting
+        err = None
+        try:
+            for addr in addrs:
+                self._dns_host = addr
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError) as e:
+                    err = e
+            raise err
+        finally:
+            self._dns_host = host
+
+
+class _HTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _HTTPPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class _Adapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+# ---- Clients
+def get_session() -> requests.Session:
+    """Shared keep-alive session (created on first use)."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = _Adapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+def _get_h2():
+    global _h2, _h2_failed
+    if not HTTP2 or _h2_failed:
+        return None
+    if _h2 is None:
+        with _lock:
+            if _h2 is None and not _h2_failed:
+                try:
+                    import httpx
+                    _h2 = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+                                            max_keepalive_connections=POOL_CONNECTIONS),
+                    )
+                except ImportError as e:  # httpx or h2 not installed
+                    log.warning(f"HTTP/2 disabled: {e}")
+                    _h2_failed = True
+    return _h2
+
+
+def request(method: str, url: str, **kwargs):
+    """Send a request on the shared pool. Streaming calls always use requests."""
+    h2 = None if kwargs.get("stream") else _get_h2()
+    if h2 is not None:
+        kwargs["follow_redirects"] = kwargs.pop("allow_redirects", True)
+        return h2.request(method, url, **kwargs)
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def read_limited(resp, max_bytes: int, chunk_size: int = 65536) -> Tuple[bytes, bool]:
+    """(body, truncated) of a streamed response, reading at most `max_bytes`."""
+    buf = bytearray()
+    for chunk in resp.iter_content(chunk_size):
+        buf += chunk
+        if len(buf) > max_bytes:
+            return bytes(buf[:max_bytes]), True
+    return bytes(buf), False
+
+
+def close() -> None:
+    """Drop pooled connections (e.g. on server shutdown)."""
+    global _session, _h2
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _h2 is not None:
+            _h2.close()
+            _h2 = None
@@ -0,0 +1,175 @@
+# hybrid.py
+"""
+Optional dense retrieval for scraped news, fused with Whoosh BM25.
+
+- NewsVectorStore: local Chroma collection (same all-MiniLM-L6-v2 embeddings as
+  vectorStore/chroma_manager.py) holding overlapping word chunks of each indexed
+  document. Embedding runs on a single background thread so indexing never waits;
+  queries use their own small pool so they never queue behind embedding work.
+- Chunks carry a numeric `published_ts` (UTC epoch seconds, -1 when undated) so
+  date windows are applied inside the Chroma query (`where=`) and the top-k is
+  taken within the window.
+- Chunks are keyed on the canonical URL, the same key BM25 hits carry, so
+  fusion counts a document once.
+- The embedding model loads in the background (`warm_up`); until it is ready
+  `available()` is False and queries stay on BM25 instead of waiting for it.
+- rrf: reciprocal rank fusion of several ranked URL lists.
+
+chromadb (and sentence-transformers) are optional; without them `available()` is
+False and callers stay on BM25.
+"""
+from __future__ import annotations
+import hashlib, logging, threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from .canonical import canonicalize
+except ImportError:
+    from canonical import canonicalize
+
+log = logging.getLogger("hybrid")
+
+try:
+    from chromadb import PersistentClient
+    from chromadb.utils import embedding_functions
+except ImportError:  # optional dependency
+    PersistentClient = None
+
+
+UNDATED = -1.0
+
+
+def _epoch(dt) -> float:
+    """UTC epoch seconds for a datetime or ISO string (naive = UTC); UNDATED if missing/unparseable."""
+    if isinstance(dt, str):
+        try:
+            dt = datetime.fromisoformat(dt)
+        except ValueError:
+            return UNDATED
+    if not isinstance(dt, datetime):
+        return UNDATED
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def date_where(date_from: Optional[datetime], date_to: Optional[datetime]) -> Optional[Dict]:
+    """Chroma `where` for published_ts in [date_from, date_to]; undated chunks always match."""
+    conds = []
+    if date_from is not None:
+        conds.append({"published_ts": {"$gte": _epoch(date_from)}})
+    if date_to is not None:
+        conds.append({"published_ts": {"$lte": _epoch(date_to)}})
+    if not conds:
+        return None
+    window = conds[0] if len(conds) == 1 else {"$and": conds}
+    return {"$or": [window, {"published_ts": {"$eq": UNDATED}}]}
+
+
+def chunk_words(text: str, size: int = 200, overlap: int = 40) -> List[str]:
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step)]
+
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+class NewsVectorStore:
+    def __init__(self, path: Path, collection: str = "scraped_news",
+                 model: str = "all-MiniLM-L6-v2", chunk_size: int = 200):
+        self.path = Path(path)
+        self.collection_name = collection
+        self.model = model
+        self.chunk_size = chunk_size
+        self._col = None
+        self._failed = PersistentClient is None
+        self._warming: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self._qpool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vecquery")
+
+    def warm_up(self) -> Optional[Future]:
+        """Open the collection and load the embedding model on the embed thread."""
+        if self._col is not None or self._failed:
+            return None
+        with self._lock:
+            if self._warming is None:
+                self._warming = self._pool.submit(self._collection)
+            return self._warming
+
+    def available(self) -> bool:
+        """Ready for queries now; never loads the model on the caller's thread."""
+        if self._col is None:
+            self.warm_up()
+        return self._col is not None
+
+    def _collection(self):
+        if self._col is None and not self._failed:
+            with self._lock:
+                if self._col is None and not self._failed:
+                    try:
+                        self.path.mkdir(parents=True, exist_ok=True)
+                        client = PersistentClient(path=str(self.path))
+                        ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=self.model)
+                        self._col = client.get_or_create_collection(name=self.collection_name, embedding_function=ef)
+                    except Exception as e:
+                        log.warning(f"Vector store unavailable, using BM25 only: {e}")
+                        self._failed = True
+        return self._col
+
+    def _add(self, docs: List[Dict]) -> None:
+        col = self._collection()
+        if col is None:
+            return
+        ids, texts, metas = [], [], []
+        for d in docs:
+            url = canonicalize(d["url"])
+            key = hashlib.sha256(url.encode()).hexdigest()[:24]
+            for i, chunk in enumerate(chunk_words(d.get("content") or "", self.chunk_size)):
+                ids.append(f"{key}:{i}")
+                texts.append(chunk)
+                metas.append({"url": url, "title": d.get("title") or "",
+                              "source": d.get("source") or "", "published_at": d.get("published_at") or "",
+                              "published_ts": _epoch(d.get("published_at"))})
+        if ids:
+            try:
+                col.upsert(ids=ids, documents=texts, metadatas=metas)
+            except Exception as e:
+                log.warning(f"Embedding {len(docs)} docs failed: {e}")
+
+    def add_async(self, docs: Iterable[Dict]) -> Optional[Future]:
+        """Queue docs (dicts with url/title/content/source/published_at) for embedding."""
+        docs = list(docs)
+        if not docs or self._failed:
+            return None
+        return self._pool.submit(self._add, docs)
+
+    def query(self, text: str, k: int = 20, where: Optional[Dict] = None) -> List[Tuple[str, Dict]]:
+        """Best-first (url, metadata) list; several chunks of one doc count once."""
+        col = self._collection()
+        if col is None:
+            return []
+        res = col.query(query_texts=[text], n_results=k, where=where)
+        out, seen = [], set()
+        for meta in (res.get("metadatas") or [[]])[0]:
+            url = (meta or {}).get("url")
+            if url and url not in seen:
+                seen.add(url)
+                out.append((url, meta))
+        return out
+
+    def submit_query(self, text: str, k: int = 20, where: Optional[Dict] = None) -> Future:
+        """Run `query` off-thread so callers can bound it with a latency budget."""
+        return self._qpool.submit(self.query, text, k, where)
@@ -0,0 +1,266 @@
+# index_manager.py
+"""
+Long-lived Whoosh index handle with a batched background writer.
+
+- The index is opened (or created / recreated if unreadable) once per process.
+- `add()` only queues documents; one writer thread turns them into
+  `update_document` calls and commits when `batch_size` documents are pending or
+  `commit_interval` seconds have passed since the first pending one.
+- Writer-lock contention (MAIN_WRITELOCK held by another process) is retried with
+  backoff instead of failing the request; the batch is kept until it commits.
+- `flush()` waits for everything queued so far to be committed, so a search right
+  after indexing still sees the new documents.
+- An unreadable index is moved aside to `<dir>.broken-<timestamp>` (not deleted)
+  before an empty one is created; rebuild_index.py restores it from the doc cache.
+- `optimize()` merges segments, retrying around the background writer's lock.
+- `search()` reuses one searcher, refreshed only when the index generation moves
+  (our own commits, or a disk check every `refresh_interval` seconds for commits
+  from other processes), and keeps an LRU of results keyed on
+  (parsed query, filter, limit, generation).
+"""
+from __future__ import annotations
+import atexit, logging, queue, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from whoosh.index import create_in, open_dir, exists_in, LockError
+from whoosh.fields import Schema
+
+log = logging.getLogger("index_manager")
+
+_STOP = object()
+
+
+class _Flush:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class IndexManager:
+    def __init__(self, index_dir: Path, schema_factory: Callable[[], Schema],
+                 batch_size: int = 64, commit_interval: float = 2.0,
+                 lock_timeout: float = 5.0, limitmb: int = 128,
+                 refresh_interval: float = 1.0, result_cache_size: int = 256,
+                 on_commit: Optional[Callable[[int, float], None]] = None):
+        self.dir = Path(index_dir)
+        self.schema_factory = schema_factory
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.lock_timeout = lock_timeout
+        self.limitmb = limitmb
+        self._ix = None
+        self._open_lock = threading.Lock()
+        self._q: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.commits = 0
+        self.refresh_interval = refresh_interval
+        self.result_cache_size = result_cache_size
+        self._searcher = None
+        self._searcher_commits = -1
+        self._checked_at = 0.0
+        self._search_lock = threading.Lock()
+        self._results: "OrderedDict[tuple, List[Tuple[Dict, float]]]" = OrderedDict()
+        self.result_hits = self.result_misses = 0
+        self.on_commit = on_commit  # (docs, seconds) after each successful commit
+        self._optimized_commits = -1
+        atexit.register(self.close)
+
+    # ---- index handle
+    def _open(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        schema = self.schema_factory()
+        try:
+            if not exists_in(str(self.dir)):
+                return create_in(str(self.dir), schema)
+            return open_dir(str(self.dir))
+        except Exception as e:
+            aside = self.dir.parent / f"{self.dir.name}.broken-{int(time.time())}"
+            aside.mkdir(parents=True, exist_ok=True)
+            for f in self.dir.iterdir():
+                if f.is_file():
+                    f.rename(aside / f.name)
+            log.warning(f"Index at {self.dir} unreadable ({e}); moved to {aside}, starting empty. "
+                        f"Run Data_Scraper_IR_Agent/rebuild_index.py to restore it from the document cache.")
+            return create_in(str(self.dir), schema)
+
+    def index(self):
+        if self._ix is None:
+            with self._open_lock:
+                if self._ix is None:
+                    self._ix = self._open()
+        return self._ix
+
+    # ---- writes
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._open_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="whoosh-writer", daemon=True)
+                    self._thread.start()
+
+    def add(self, fields: Dict) -> None:
+        self.add_many([fields])
+
+    def add_many(self, docs: Iterable[Dict]) -> int:
+        n = 0
+        self._ensure_writer()
+        for fields in docs:
+            with self._pending_lock:
+                self._pending += 1
+            self._q.put(fields)
+            n += 1
+        return n
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued before this call is committed."""
+        if not self._pending:
+            return True
+        self._ensure_writer()
+        marker = _Flush()
+        self._q.put(marker)
+        return marker.done.wait(timeout)
+
+    def _commit(self, batch: List[Dict]) -> bool:
+        delay = 0.25
+        for attempt in range(1, 6):
+            try:
+                w = self.index().writer(limitmb=self.limitmb, timeout=self.lock_timeout, delay=0.1)
+            except LockError:
+                log.warning(f"Index writer lock busy (attempt {attempt}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, 4.0)
+                continue
+            try:
+                t0 = time.perf_counter()
+                for fields in batch:
+                    w.update_document(**fields)
+                w.commit()
+                self.commits += 1
+                if self.on_commit:
+                    self.on_commit(len(batch), time.perf_counter() - t0)
+                return True
+            except Exception as e:
+                w.cancel()
+                log.error(f"Dropping batch of {len(batch)} docs after commit error: {e}")
+                return True
+        return False  # still locked: keep the batch for the next round
+
+    def optimize(self, force: bool = False) -> bool:
+        """Merge all segments into one; skipped when nothing was committed since the last run."""
+        if not force and self._optimized_commits == self.commits:
+            return False
+        delay = 0.25
+        for attempt in range(1, 6):
+            try:
+                w = self.index().writer(limitmb=self.limitmb, timeout=self.lock_timeout, delay=0.1)
+            except LockError:
+                time.sleep(delay)
+                delay = min(delay * 2, 4.0)
+                continue
+            t0 = time.perf_counter()
+            w.commit(optimize=True)
+            self.commits += 1
+            self._optimized_commits = self.commits
+            log.info(f"Optimized {self.dir} in {time.perf_counter() - t0:.2f}s")
+            return True
+        log.warning(f"Optimize of {self.dir} skipped: writer lock stayed busy")
+        return False
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        flushes: List[_Flush] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, _Flush):
+                flushes.append(item)
+            elif item is not None and item is not _STOP:
+                if not batch:
+                    deadline = time.monotonic() + self.commit_interval
+                batch.append(item)
+            due = item is _STOP or flushes or len(batch) >= self.batch_size \
+                or (batch and time.monotonic() >= deadline)
+            if due and batch:
+                if self._commit(batch):
+                    with self._pending_lock:
+                        self._pending -= len(batch)
+                    batch = []
+                else:
+                    deadline = time.monotonic() + self.commit_interval
+            if not batch:
+                for f in flushes:
+                    f.done.set()
+                flushes = []
+            if item is _STOP:
+                if batch:
+                    log.error(f"Index still locked at shutdown, {len(batch)} docs not committed")
+                for f in flushes:
+                    f.done.set()
+                return
+
+    # ---- reads
+    def _current_searcher(self):
+        """Shared searcher, refreshed when the index generation moved. Call with _search_lock held."""
+        now = time.monotonic()
+        if self._searcher is None:
+            self._searcher = self.index().searcher()
+        elif self._searcher_commits != self.commits or now - self._checked_at >= self.refresh_interval:
+            if not self._searcher.up_to_date():
+                self._searcher = self._searcher.refresh()
+            self._checked_at = now
+        self._searcher_commits = self.commits
+        return self._searcher
+
+    def generation(self) -> int:
+        with self._search_lock:
+            return self._current_searcher().reader().generation()
+
+    def search(self, q, limit: int = 10, filter=None) -> List[Tuple[Dict, float]]:
+        """(stored fields, score) for the top `limit` hits of a parsed query.
+
+        `filter` (a whoosh query) restricts the candidates before ranking, so the
+        top `limit` are taken inside it.
+        """
+        with self._search_lock:
+            s = self._current_searcher()
+            key = (str(q), str(filter), limit, s.reader().generation())
+            hit = self._results.get(key)
+            if hit is not None:
+                self._results.move_to_end(key)
+                self.result_hits += 1
+            else:
+                self.result_misses += 1
+                hit = [(dict(r.fields()), float(r.score)) for r in s.search(q, limit=limit, filter=filter)]
+                self._results[key] = hit
+                while len(self._results) > self.result_cache_size:
+                    self._results.popitem(last=False)
+        return [(dict(f), score) for f, score in hit]
+
+    def contains(self, url: str) -> bool:
+        with self._search_lock:
+            return self._current_searcher().document_number(url=url) is not None
+
+    def stats(self) -> Dict:
+        return {"pending": self._pending, "commits": self.commits,
+                "result_hits": self.result_hits, "result_misses": self.result_misses}
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Commit whatever is queued and stop the writer thread."""
+        t = self._thread
+        if t is not None and t.is_alive():
+            self._q.put(_STOP)
+            t.join(timeout)
+        with self._search_lock:
+            if self._searcher is not None:
+                self._searcher.close()
+                self._searcher = None
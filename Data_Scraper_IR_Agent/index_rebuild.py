@@ -0,0 +1,77 @@
+# index_rebuild.py
+"""
+Bulk (re)build of the monthly Whoosh shards from already-scraped documents.
+
+`build_shards` streams index fields, groups them by month and writes each group
+in chunks with Whoosh's multi-process writer (`writer(procs=N, multisegment=True)`),
+then optionally merges each shard down to one segment. The result is a fresh
+directory tree that ShardedIndex.swap_in() moves into place.
+"""
+from __future__ import annotations
+import logging, time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+from whoosh.index import create_in
+from whoosh.fields import Schema
+
+try:
+    from .sharded_index import shard_for
+except ImportError:
+    from sharded_index import shard_for
+
+log = logging.getLogger("index_rebuild")
+
+
+def _write_chunk(ix, docs: List[Dict], procs: int, limitmb: int) -> None:
+    if procs > 1:
+        w = ix.writer(procs=procs, multisegment=True, limitmb=limitmb)
+    else:
+        w = ix.writer(limitmb=limitmb)
+    try:
+        for fields in docs:
+            w.add_document(**fields)
+        w.commit()
+    except Exception:
+        w.cancel()
+        raise
+
+
+def build_shards(docs: Iterable[Dict], schema_factory: Callable[[], Schema], out_root: Path,
+                 procs: int = 4, limitmb: int = 256, chunk_docs: int = 5000,
+                 optimize: bool = True, progress_every: int = 5000) -> Dict[str, int]:
+    """Index `docs` (field dicts with a unique "url") into out_root/<YYYY-MM>; returns docs per shard.
+
+    The first copy of a URL wins, so aliases from the doc cache are indexed once.
+    """
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    indexes, buffers, counts = {}, {}, {}
+    seen = set()
+    t0 = time.perf_counter()
+
+    def flush(name: str) -> None:
+        if name not in indexes:
+            (out_root / name).mkdir(parents=True, exist_ok=True)
+            indexes[name] = create_in(str(out_root / name), schema_factory())
+        _write_chunk(indexes[name], buffers.pop(name), procs, limitmb)
+
+    total = 0
+    for fields in docs:
+        if fields["url"] in seen:
+            continue
+        seen.add(fields["url"])
+        name = shard_for(fields.get("published_at"))
+        buffers.setdefault(name, []).append(fields)
+        counts[name] = counts.get(name, 0) + 1
+        total += 1
+        if len(buffers[name]) >= chunk_docs:
+            flush(name)
+        if progress_every and total % progress_every == 0:
+            log.info(f"Rebuild: {total} docs streamed ({total / (time.perf_counter() - t0):.0f}/s)")
+    for name in list(buffers):
+        flush(name)
+    if optimize:
+        for name, ix in indexes.items():
+            ix.optimize()
+    log.info(f"Rebuild: {total} docs into {len(counts)} shards in {time.perf_counter() - t0:.1f}s")
+    return counts
@@ -0,0 +1,93 @@
+# neg_cache.py
+"""
+Negative cache for URLs that failed to fetch or extract.
+
+Each failure is stored with a reason code and expires after that reason's TTL,
+so a paywalled or dead article is skipped for days while a timeout is retried
+after a few hours. Rows live in a small SQLite file next to the document cache.
+
+Reason codes: http_4xx, http_5xx, timeout, too_short, non_html, too_large, error.
+"""
+from __future__ import annotations
+import logging, sqlite3, threading, time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional
+
+log = logging.getLogger("neg_cache")
+
+DEFAULT_TTLS = {
+    "http_4xx": 7 * 86400,
+    "http_5xx": 3600,
+    "timeout": 6 * 3600,
+    "too_short": 3 * 86400,
+    "non_html": 30 * 86400,
+    "too_large": 30 * 86400,
+    "error": 3600,
+}
+
+
+class Failure(NamedTuple):
+    reason: str
+    detail: str
+    failed_at: float
+    expires_at: float
+    count: int
+
+
+class NegativeCache:
+    def __init__(self, path: Path, ttls: Optional[Dict[str, float]] = None):
+        self.path = Path(path)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self.hits = self.recorded = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS failures(
+            url TEXT PRIMARY KEY, reason TEXT NOT NULL, detail TEXT,
+            failed_at REAL NOT NULL, expires_at REAL NOT NULL, count INTEGER NOT NULL DEFAULT 1)""")
+
+    def get(self, url: str) -> Optional[Failure]:
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Failure]:
+        """Unexpired failures for any of `urls`, as {url: Failure}."""
+        urls = list(dict.fromkeys(urls))
+        out: Dict[str, Failure] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT url, reason, detail, failed_at, expires_at, count FROM failures "
+                    f"WHERE expires_at > ? AND url IN ({','.join('?' * len(chunk))})", (now, *chunk)).fetchall()
+                for url, *rest in rows:
+                    out[url] = Failure(*rest)
+            self.hits += len(out)
+        return out
+
+    def record(self, url: str, reason: str, detail: str = "") -> None:
+        ttl = self.ttls.get(reason, self.ttls["error"])
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO failures(url, reason, detail, failed_at, expires_at) VALUES(?,?,?,?,?) "
+                "ON CONFLICT(url) DO UPDATE SET reason=excluded.reason, detail=excluded.detail, "
+                "failed_at=excluded.failed_at, expires_at=excluded.expires_at, count=count+1",
+                (url, reason, detail[:300], now, now + ttl))
+            self.recorded += 1
+        log.info(f"Negative-cached {url} ({reason}) for {ttl / 3600:.1f}h")
+
+    def clear(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM failures WHERE url=?", (url,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db.execute("DELETE FROM failures WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            by_reason = dict(self._db.execute(
+                "SELECT reason, COUNT(*) FROM failures WHERE expires_at > ? GROUP BY reason", (time.time(),)))
+        return {"hits": self.hits, "recorded": self.recorded, "active": by_reason}
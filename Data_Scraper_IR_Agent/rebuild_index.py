@@ -0,0 +1,43 @@
+# rebuild_index.py
+"""
+Rebuild or compact the IR index from local data.
+
+Run from the project root (DataScraperIR keeps storage/ under the working directory),
+ideally while the API is stopped. A running server keeps its old index handles
+until restart; DataScraperIR.rebuild_index() does the same work in-process.
+
+    python Data_Scraper_IR_Agent/rebuild_index.py                # rebuild all shards from storage/cache
+    python Data_Scraper_IR_Agent/rebuild_index.py --procs 8 --drop-legacy
+    python Data_Scraper_IR_Agent/rebuild_index.py --optimize-only  # just merge segments (e.g. from cron)
+"""
+from __future__ import annotations
+import argparse, json, logging, sys, time
+from pathlib import Path
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Rebuild/compact the DataScraperIR Whoosh index")
+    ap.add_argument("--procs", type=int, default=None, help="writer processes (default SCRAPER_INDEX_REBUILD_PROCS)")
+    ap.add_argument("--no-optimize", action="store_true", help="leave rebuilt shards multi-segment")
+    ap.add_argument("--drop-legacy", action="store_true", help="delete the pre-sharding index in storage/index")
+    ap.add_argument("--force", action="store_true",
+                    help="swap shards in even when their rebuild lacks docs no longer in the cache")
+    ap.add_argument("--optimize-only", action="store_true", help="merge segments of existing shards, no rebuild")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import DataScraperIR as D
+
+    t0 = time.perf_counter()
+    if args.optimize_only:
+        print(json.dumps({"optimized": D.optimize_index(force=True)}))
+    else:
+        counts = D.rebuild_index(procs=args.procs or D.INDEX_REBUILD_PROCS, optimize=not args.no_optimize,
+                                 drop_legacy=args.drop_legacy, force=args.force)
+        print(json.dumps({"shards": counts, "docs": sum(counts.values())}))
+    print(f"done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
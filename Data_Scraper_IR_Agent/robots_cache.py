@@ -0,0 +1,145 @@
+# robots_cache.py
+"""
+Per-host robots.txt cache.
+
+Keeps parsed robots.txt rules per origin (scheme://host) in a bounded in-memory
+LRU, backed by a small SQLite file so rules survive restarts; a new host costs
+one single-row upsert, not a rewrite of every cached body. Entries expire
+after `ttl` seconds; failed downloads (network errors, 5xx) are cached too, for
+the shorter `fail_ttl`, so a dead publisher is not re-asked for every article.
+"""
+from __future__ import annotations
+import sqlite3, threading, time, logging, urllib.parse
+import urllib.robotparser as robotparser
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+log = logging.getLogger("robots_cache")
+
+# fetch(robots_url) -> (status_code, body)
+RobotsFetcher = Callable[[str], Tuple[int, str]]
+
+
+class RobotsCache:
+    def __init__(self, path: Path, fetch: RobotsFetcher, ttl: float = 86400,
+                 fail_ttl: float = 900, max_hosts: int = 2048):
+        self.path = Path(path)
+        self.fetch = fetch
+        self.ttl = ttl
+        self.fail_ttl = fail_ttl
+        self.max_hosts = max_hosts
+        # origin -> {"state": ok|allow_all|disallow_all|error, "body": str, "expires": epoch}
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._parsers: Dict[str, robotparser.RobotFileParser] = {}
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+        self._open()
+
+    # ---- persistence
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS robots(
+            origin TEXT PRIMARY KEY, state TEXT NOT NULL, body TEXT NOT NULL, expires REAL NOT NULL)""")
+        self._db.execute("DELETE FROM robots WHERE expires <= ?", (time.time(),))
+
+    def _load(self, origin: str) -> Optional[dict]:
+        row = self._db.execute("SELECT state, body, expires FROM robots WHERE origin=?", (origin,)).fetchone()
+        return {"state": row[0], "body": row[1], "expires": row[2]} if row else None
+
+    def _save(self, origin: str, e: dict) -> None:
+        try:
+            self._db.execute("INSERT OR REPLACE INTO robots(origin, state, body, expires) VALUES(?,?,?,?)",
+                             (origin, e["state"], e["body"], e["expires"]))
+        except sqlite3.Error as err:
+            log.warning(f"Could not persist robots rules for {origin}: {err}")
+
+    # ---- lookup
+    def _remember(self, origin: str, entry: dict) -> None:
+        self._entries[origin] = entry
+        self._entries.move_to_end(origin)
+        while len(self._entries) > self.max_hosts:
+            old, _ = self._entries.popitem(last=False)
+            self._parsers.pop(old, None)
+            self._host_locks.pop(old, None)
+
+    def _get(self, origin: str) -> Optional[dict]:
+        with self._lock:
+            e = self._entries.get(origin)
+            if e is None:
+                e = self._load(origin)  # evicted from memory, or cached by an earlier process
+                if e is None:
+                    return None
+            if e["expires"] <= time.time():
+                self._entries.pop(origin, None)
+                self._parsers.pop(origin, None)
+                return None
+            self._remember(origin, e)
+            return e
+
+    def _put(self, origin: str, entry: dict) -> None:
+        with self._lock:
+            self._parsers.pop(origin, None)
+            self._remember(origin, entry)
+            self._save(origin, entry)
+
+    def _download(self, origin: str) -> dict:
+        now = time.time()
+        try:
+            status, body = self.fetch(f"{origin}/robots.txt")
+        except Exception as e:
+            log.info(f"robots.txt fetch failed for {origin}: {e}")
+            return {"state": "error", "body": "", "expires": now + self.fail_ttl}
+        # same rules as RobotFileParser.read(): 401/403 block everything, other 4xx allow everything
+        if status in (401, 403):
+            return {"state": "disallow_all", "body": "", "expires": now + self.ttl}
+        if 400 <= status < 500:
+            return {"state": "allow_all", "body": "", "expires": now + self.ttl}
+        if status >= 500 or status < 200:
+            return {"state": "error", "body": "", "expires": now + self.fail_ttl}
+        return {"state": "ok", "body": body, "expires": now + self.ttl}
+
+    def _entry(self, origin: str) -> dict:
+        e = self._get(origin)
+        if e is not None:
+            return e
+        with self._lock:
+            host_lock = self._host_locks.setdefault(origin, threading.Lock())
+        with host_lock:  # one download per host even when many threads ask at once
+            e = self._get(origin)
+            if e is None:
+                e = self._download(origin)
+                self._put(origin, e)
+        return e
+
+    def _parser(self, origin: str, e: dict) -> robotparser.RobotFileParser:
+        with self._lock:
+            rp = self._parsers.get(origin)
+        if rp is None:
+            rp = robotparser.RobotFileParser()
+            rp.parse(e["body"].splitlines())
+            with self._lock:
+                self._parsers[origin] = rp
+        return rp
+
+    def allowed(self, url: str, user_agent: str) -> bool:
+        p = urllib.parse.urlparse(url)
+        origin = f"{p.scheme}://{p.netloc}".lower()
+        e = self._entry(origin)
+        if e["state"] == "allow_all":
+            return True
+        if e["state"] in ("disallow_all", "error"):
+            return False
+        return self._parser(origin, e).can_fetch(user_agent, url)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hosts": len(self._entries),
+                    "failed": sum(1 for e in self._entries.values() if e["state"] == "error")}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
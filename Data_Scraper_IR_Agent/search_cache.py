@@ -0,0 +1,79 @@
+# search_cache.py
+"""
+TTL cache with single-flight loading, used in front of the Serper search API.
+
+- normalize_query: "EV market trends 2025" and " ev  market trends 2025 " share a key.
+- SearchCache.get_or_fetch: returns a cached value while it is younger than `ttl`;
+  otherwise exactly one caller runs `fetch` and concurrent callers with the same
+  key wait for that result instead of hitting the upstream API themselves.
+  Errors are passed to every waiter and are not cached.
+"""
+from __future__ import annotations
+import threading, time, unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def normalize_query(q: str) -> str:
+    q = unicodedata.normalize("NFKC", q or "").casefold()
+    return " ".join(q.split())
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchCache:
+    def __init__(self, ttl: float = 900, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.shared = 0
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit and time.monotonic() - hit[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fetch()
+            with self._lock:
+                self._data[key] = (time.monotonic(), flight.value)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses, "shared": self.shared}
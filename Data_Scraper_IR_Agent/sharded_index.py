@@ -0,0 +1,313 @@
+# sharded_index.py
+"""
+Time-sharded Whoosh index.
+
+Documents go to one index per month (storage/index/shards/YYYY-MM) keyed on
+`published_at`; undated documents land in the month they were scraped. Each
+shard is an IndexManager (own background writer, searcher and result cache).
+
+- search(): fans out only to shards overlapping the requested date range and
+  merges hits by score (a URL found in several shards counts once).
+- drop_expired(): removes whole shards older than the retention window.
+- A flat index left at the root by older versions is still searched as the
+  read-only "legacy" shard until it is rebuilt or dropped.
+- swap_in(): replaces shards with ones bulk-built elsewhere (index_rebuild.py).
+  Writes that arrive after `begin_capture()` (the rebuild's snapshot) are
+  replayed into the new shards; reads and writes wait while the swap runs, so
+  nothing touches a closed shard. A shard whose rebuild lacks docs the live copy
+  has (their text left the doc cache) is kept unless the swap is forced.
+- optimize(): merges segments of shards that changed since their last merge.
+"""
+from __future__ import annotations
+import logging, re, shutil, threading, time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from whoosh.index import exists_in, open_dir
+from whoosh.fields import Schema
+from whoosh.query import DateRange, Every, Not, Or
+
+try:
+    from .index_manager import IndexManager
+except ImportError:
+    from index_manager import IndexManager
+
+log = logging.getLogger("sharded_index")
+
+LEGACY = "legacy"
+_SHARD_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def to_utc_naive(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def shard_for(dt: Optional[datetime]) -> str:
+    dt = to_utc_naive(dt) or utcnow()
+    return f"{dt.year:04d}-{dt.month:02d}"
+
+
+def date_filter(date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Whoosh filter for published_at in [date_from, date_to]; undated docs always pass."""
+    if date_from is None and date_to is None:
+        return None
+    return Or([DateRange("published_at", date_from, date_to), Not(Every("published_at"))])
+
+
+def _month_index(name: str) -> int:
+    y, m = name.split("-")
+    return int(y) * 12 + int(m) - 1
+
+
+class ShardedIndex:
+    def __init__(self, root: Path, schema_factory: Callable[[], Schema], **manager_kwargs):
+        self.root = Path(root)
+        self.shard_dir = self.root / "shards"
+        self.schema_factory = schema_factory
+        self.manager_kwargs = manager_kwargs
+        self._shards: Dict[str, IndexManager] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._active = 0           # reads/writes running against the current shard set
+        self._swapping = False
+        self._capture: Optional[List[Dict]] = None  # writes since begin_capture(), replayed by swap_in
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        for p in sorted(self.shard_dir.iterdir()):
+            if p.is_dir() and _SHARD_RE.match(p.name):
+                self._shards[p.name] = IndexManager(p, schema_factory, **manager_kwargs)
+        if exists_in(str(self.root)):
+            self._shards[LEGACY] = IndexManager(self.root, schema_factory, **manager_kwargs)
+
+    # ---- shards
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._shards)
+
+    def shard(self, name: str) -> IndexManager:
+        with self._lock:
+            return self._shard_locked(name)
+
+    def _shard_locked(self, name: str) -> IndexManager:
+        m = self._shards.get(name)
+        if m is None:
+            m = self._shards[name] = IndexManager(self.shard_dir / name, self.schema_factory,
+                                                  **self.manager_kwargs)
+        return m
+
+    @contextmanager
+    def _using(self):
+        """Hold the current shard set: waits out a running swap, and a swap waits for us."""
+        with self._lock:
+            self._idle.wait_for(lambda: not self._swapping)
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                if not self._active:
+                    self._idle.notify_all()
+
+    @property
+    def schema(self) -> Schema:
+        return self.schema_factory()
+
+    def _select(self, date_from: Optional[datetime], date_to: Optional[datetime]) -> List[IndexManager]:
+        lo = _month_index(shard_for(date_from)) if date_from else None
+        hi = _month_index(shard_for(date_to)) if date_to else None
+        with self._lock:
+            out = []
+            for name, m in self._shards.items():
+                if name == LEGACY:
+                    out.append(m)  # unknown dates: always searched
+                    continue
+                k = _month_index(name)
+                if (lo is None or k >= lo) and (hi is None or k <= hi):
+                    out.append(m)
+            return out
+
+    # ---- writes
+    @staticmethod
+    def _by_shard(docs: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        by_shard: Dict[str, List[Dict]] = {}
+        for fields in docs:
+            fields = dict(fields, published_at=to_utc_naive(fields.get("published_at")))
+            by_shard.setdefault(shard_for(fields["published_at"]), []).append(fields)
+        return by_shard
+
+    def add_many(self, docs: Iterable[Dict]) -> int:
+        by_shard = self._by_shard(docs)
+        with self._using():
+            with self._lock:
+                if self._capture is not None:
+                    self._capture.extend(f for batch in by_shard.values() for f in batch)
+            return sum(self.shard(name).add_many(batch) for name, batch in by_shard.items())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every shard's queued docs to commit; `timeout` bounds the whole call."""
+        with self._using():
+            with self._lock:
+                shards = list(self._shards.values())
+            deadline = None if timeout is None else time.monotonic() + timeout
+            ok = True
+            for m in shards:
+                left = None if deadline is None else max(0.0, deadline - time.monotonic())
+                ok = m.flush(left) and ok
+            return ok
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(m.pending for m in self._shards.values())
+
+    # ---- reads
+    def search(self, q, limit: int = 10, date_from: Optional[datetime] = None,
+               date_to: Optional[datetime] = None) -> List[Tuple[Dict, float]]:
+        """Top `limit` (stored fields, score) across the shards overlapping [date_from, date_to]."""
+        date_from, date_to = to_utc_naive(date_from), to_utc_naive(date_to)
+        flt = date_filter(date_from, date_to)  # applied inside each shard's top-k, not after it
+        best: Dict[str, Tuple[Dict, float]] = {}
+        with self._using():
+            for m in self._select(date_from, date_to):
+                for fields, score in m.search(q, limit=limit, filter=flt):
+                    url = fields.get("url")
+                    if url not in best or score > best[url][1]:
+                        best[url] = (fields, score)
+        return sorted(best.values(), key=lambda fs: fs[1], reverse=True)[:limit]
+
+    def contains(self, url: str) -> bool:
+        """Is `url` committed in any shard?"""
+        with self._using():
+            with self._lock:
+                shards = list(self._shards.values())
+            return any(m.contains(url) for m in shards)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            shards = dict(self._shards)
+        per = {name: m.stats() for name, m in shards.items()}
+        return {"shards": len(per),
+                "pending": sum(s["pending"] for s in per.values()),
+                "commits": sum(s["commits"] for s in per.values()),
+                "result_hits": sum(s["result_hits"] for s in per.values()),
+                "result_misses": sum(s["result_misses"] for s in per.values()),
+                "per_shard": per}
+
+    # ---- retention
+    def drop(self, name: str) -> bool:
+        """Close and delete one shard (the legacy root index only loses its index files)."""
+        with self._lock:
+            self._idle.wait_for(lambda: not self._swapping)
+            m = self._shards.pop(name, None)
+        if m is None:
+            return False
+        m.close()
+        if name == LEGACY:
+            for f in self.root.iterdir():
+                if f.is_file():
+                    f.unlink()
+        else:
+            shutil.rmtree(m.dir, ignore_errors=True)
+        log.info(f"Dropped index shard {name}")
+        return True
+
+    def drop_expired(self, keep_months: int, now: Optional[datetime] = None) -> List[str]:
+        """Drop monthly shards entirely older than the last `keep_months` months (0 = keep all)."""
+        if keep_months <= 0:
+            return []
+        cutoff = _month_index(shard_for(now)) - keep_months + 1
+        doomed = [n for n in self.names() if n != LEGACY and _month_index(n) < cutoff]
+        for n in doomed:
+            self.drop(n)
+        return doomed
+
+    # ---- maintenance
+    def optimize(self, force: bool = False) -> List[str]:
+        """Merge segments in every shard with new commits; returns the shards merged."""
+        with self._using():
+            with self._lock:
+                shards = [(n, m) for n, m in self._shards.items() if n != LEGACY]
+            return [n for n, m in shards if m.optimize(force=force)]
+
+    def begin_capture(self) -> None:
+        """Start recording writes so swap_in can replay whatever the rebuild's snapshot missed."""
+        with self._lock:
+            self._capture = []
+
+    def end_capture(self) -> None:
+        with self._lock:
+            self._capture = None
+
+    @staticmethod
+    def _urls(index_dir: Path) -> set:
+        try:
+            with open_dir(str(index_dir)).searcher() as s:
+                return {f.get("url") for f in s.all_stored_fields()}
+        except Exception:
+            return set()  # unreadable (e.g. the corruption being rebuilt away): nothing to keep
+
+    def swap_in(self, build_root: Path, drop_legacy: bool = False, force: bool = False) -> List[str]:
+        """Replace shards with the ones built under `build_root` (one directory per month).
+
+        Reads and writes wait while the swap runs; the live shards are flushed and
+        closed, each rebuilt one is moved in with a rename on the same filesystem,
+        and writes recorded since `begin_capture()` are replayed into the new set.
+        A live shard holding URLs its rebuild lacks (and no replayed write brings
+        back) is kept as it is, unless `force`. Returns the shards swapped in.
+        """
+        build_root = Path(build_root)
+        built = sorted(p.name for p in build_root.iterdir() if p.is_dir() and _SHARD_RE.match(p.name))
+        with self._lock:
+            self._swapping = True
+            try:
+                self._idle.wait_for(lambda: self._active == 0)
+                old, self._shards = self._shards, {}
+                for m in old.values():
+                    m.close()
+                replay, self._capture = self._capture or [], None
+                replayed = {f.get("url") for f in replay}
+                swapped = []
+                trash = self.shard_dir / f".old-{int(time.time())}"
+                for name in built:
+                    live = self.shard_dir / name
+                    if live.exists():
+                        lost = self._urls(live) - self._urls(build_root / name) - replayed
+                        if lost and not force:
+                            log.warning(f"Kept live shard {name}: its rebuild lacks {len(lost)} docs "
+                                        f"no longer in the document cache (force=True swaps anyway)")
+                            continue
+                        trash.mkdir(exist_ok=True)
+                        live.rename(trash / name)
+                    (build_root / name).rename(live)
+                    swapped.append(name)
+                for p in sorted(self.shard_dir.iterdir()):
+                    if p.is_dir() and _SHARD_RE.match(p.name):
+                        self._shards[p.name] = IndexManager(p, self.schema_factory, **self.manager_kwargs)
+                if LEGACY in old and not drop_legacy:
+                    self._shards[LEGACY] = IndexManager(self.root, self.schema_factory, **self.manager_kwargs)
+                for name, batch in self._by_shard(replay).items():
+                    self._shard_locked(name).add_many(batch)
+            finally:
+                self._capture = None
+                self._swapping = False
+                self._idle.notify_all()
+        if drop_legacy and LEGACY in old:
+            for f in self.root.iterdir():
+                if f.is_file():
+                    f.unlink()
+        shutil.rmtree(trash, ignore_errors=True)
+        log.info(f"Swapped in {len(swapped)} of {len(built)} rebuilt shards, replayed {len(replay)} writes")
+        return swapped
+
+    def close(self) -> None:
+        with self._lock:
+            shards = list(self._shards.values())
+        for m in shards:
+            m.close()
@@ -0,0 +1,60 @@
+# stage_metrics.py
+"""
+Per-stage latency samples for the scrape pipeline (search, fetch, extract, index, ir_search).
+
+A bounded window of recent durations is kept per stage; `summary()` reports
+count, mean, p50, p95 and max in milliseconds. Cheap enough to leave on in
+production and read from the benchmark harness or a debug endpoint.
+"""
+from __future__ import annotations
+import threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+
+def _pct(sorted_vals, q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, round(q * (len(sorted_vals) - 1))))
+    return sorted_vals[i]
+
+
+class StageStats:
+    def __init__(self, window: int = 4096):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snap = {k: (sorted(v), self._counts[k]) for k, v in self._samples.items()}
+        out = {}
+        for stage, (vals, count) in snap.items():
+            out[stage] = {
+                "count": count,
+                "mean_ms": round(1000 * sum(vals) / len(vals), 2) if vals else 0.0,
+                "p50_ms": round(1000 * _pct(vals, 0.50), 2),
+                "p95_ms": round(1000 * _pct(vals, 0.95), 2),
+                "max_ms": round(1000 * vals[-1], 2) if vals else 0.0,
+            }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
@@ -20,7 +20,6 @@ Market Researcher Agent (using Groq/OpenAI LLM backend)
 
 import json
 import os
-import hashlib
 from typing import Dict, Any
 import sys
 from dotenv import load_dotenv
@@ -70,20 +69,9 @@ def run_market_research(query: str, k_search: int = 10, k_index: int = 6, n_hits
     # Step 1: Scrape and index documents
     collect_and_index(query, k_search=k_search, k_index=k_index)
 
-    # Step 2: Retrieve relevant docs from Whoosh
-    hits = ir_search(query, limit=n_hits)
-
-    # Step 3: Load cached content
-    doc_texts = []
-    for h in hits:
-        try:
-            hsh = hashlib.sha256(h["url"].encode()).hexdigest()[:24]
-            cache_path = f"storage/cache/{hsh}.json"
-            with open(cache_path, "r", encoding="utf-8") as f:
-                doc = json.load(f)
-                doc_texts.append(f"### {doc['title']}\nURL: {doc['url']}\n\n{doc['content'][:2000]}")
-        except Exception as e:
-            continue
+    # Step 2 + 3: Retrieve relevant docs from Whoosh with their cached content (one bulk lookup)
+    hits = ir_search(query, limit=n_hits, with_content=True, max_chars=2000, fresh=True)
+    doc_texts = [f"### {h['title']}\nURL: {h['url']}\n\n{h['content']}" for h in hits if h.get("content")]
 
     if not doc_texts:
         return {"summary": {}, "error": "No usable documents retrieved"}
@@ -4,6 +4,8 @@ from phi.model.groq import Groq
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from vectorStore.chroma_manager import ChromaManager
+from utills.llm_cache import cached
+from utills.map_reduce import groq_limiter
 
 
 class RAGAgent:
@@ -26,7 +28,7 @@ class RAGAgent:
             context = context[:MAX_CONTEXT_CHARS]
             context += "\n...[truncated for length]..."
 
-        agent = Agent(
+        agent = cached(Agent(
             name="RAGAgent",
             model=Groq(id="llama-3.3-70b-versatile"),
             instructions=(
@@ -34,7 +36,7 @@ class RAGAgent:
                 "Answer concisely using only the context provided. "
                 "If the context doesn’t include the answer, say you don’t know."
             ),
-        )
+        ), limiter=groq_limiter())
 
         response = agent.run(f"Context:\n{context}\n\nQuestion:\n{query}")
         return response.content if response else "No answer found."
@@ -7,6 +7,8 @@ from phi.agent import Agent
 from phi.model.groq import Groq
 from twikit import Client
 from dotenv import load_dotenv
+from utills.llm_cache import cached
+from utills.map_reduce import groq_limiter
 load_dotenv()
 
 # --------------------------
@@ -48,7 +50,7 @@ def fetch_social_posts(query: str, limit: int = 20):
 # --------------------------
 # LLM Agent Setup
 # --------------------------
-llm = Groq(id="openai/gpt-oss-20b", api_key=os.getenv("GROQ_API_KEY"))
+SOCIAL_MODEL = "openai/gpt-oss-20b"
 
 instructions = """
 You are a Social Trends Analysis agent.
@@ -90,11 +92,13 @@ Example output:
 """
 
 
-social_agent = Agent(
-    name="Social Trends Agent",
-    model=llm,
-    instructions=instructions
-)
+# new Agent and model per call; both are mutated while a run is in flight
+def social_agent():
+    return cached(Agent(
+        name="Social Trends Agent",
+        model=Groq(id=SOCIAL_MODEL, api_key=os.getenv("GROQ_API_KEY")),
+        instructions=instructions
+    ), limiter=groq_limiter(os.getenv("GROQ_API_KEY")))
 
 # --------------------------
 # JSON Extraction Helper
@@ -126,7 +130,7 @@ def extract_trends_from_agent_response(response):
 def SocialTrends_agent(query: str):
     posts = fetch_social_posts(query, limit=20)
 
-    response = social_agent.run(f"Analyze these posts for trends: {posts}")
+    response = social_agent().run(f"Analyze these posts for trends: {posts}")
 
     try:
         # The model outputs JSON directly in response.content
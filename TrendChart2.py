@@ -6,6 +6,8 @@ from phi.tools.yfinance import YFinanceTools
 import json
 from utills.scope_utils import _salvage_json
 from utills.ta_helpers import _agent_text
+from utills.llm_cache import cached
+from utills.map_reduce import groq_limiter
 
 load_dotenv()
 
@@ -14,13 +16,12 @@ protocol = AgentProtocol()
 # ---------------------------
 # Agents
 # ---------------------------
+# Factories rather than module-level instances, so concurrent requests never share one Agent.
+# One live (uncached) call each: the answers embed prices their tools just fetched. Paced by
+# the shared Groq limiter like every other agent.
 
 # CompetitorTrendAgent — keep it simple: accept upstream payload and figure it out
-competitor_trend_agent = Agent(
-    name="CompetitorTrendAgent",
-    model=Groq(id="llama-3.3-70b-versatile"),
-    tools=[YFinanceTools()],
-    instructions="""
+COMPETITOR_TREND_INSTRUCTIONS = """
 Emit JSON ONLY.
 
 INPUT (one of):
@@ -80,14 +81,17 @@ Rules:
 - If neither competitors nor a useful query is provided, return empty arrays and add a note like "no competitors provided or inferred".
 - Do NOT output any text outside the JSON object.
   """
-)
+
+def competitor_trend_agent():
+    return cached(Agent(
+        name="CompetitorTrendAgent",
+        model=Groq(id="llama-3.3-70b-versatile"),
+        tools=[YFinanceTools()],
+        instructions=COMPETITOR_TREND_INSTRUCTIONS,
+    ), live=True, limiter=groq_limiter())
 
 # MarketTrendAnalyzer (product vs sector + adoption)
-market_trend_anlyzer_agent = Agent(
-    name="MarketTrendAnalyzerAgent",
-    model=Groq(id="llama-3.3-70b-versatile"),
-    tools=[YFinanceTools()],
-    instructions="""
+MARKET_TREND_INSTRUCTIONS = """
 Emit JSON ONLY.
 
 INPUT:
@@ -163,14 +167,17 @@ STRICT:
 - Output exactly one JSON object matching the schema.
 - No prose outside JSON. No tool/function call traces in output.
 """
-)
+
+def market_trend_anlyzer_agent():
+    return cached(Agent(
+        name="MarketTrendAnalyzerAgent",
+        model=Groq(id="llama-3.3-70b-versatile"),
+        tools=[YFinanceTools()],
+        instructions=MARKET_TREND_INSTRUCTIONS,
+    ), live=True, limiter=groq_limiter())
 
 # EventSpikeAgent — uses query + adoption outputs when available
-event_price_spike_agent = Agent(
-    name="EventSpikeAgent",
-    model= Groq(id="llama-3.3-70b-versatile"),
-    tools=[YFinanceTools()],
-    instructions="""
+EVENT_SPIKE_INSTRUCTIONS = """
 Emit JSON ONLY.
 
 INPUT:
@@ -228,7 +235,14 @@ STRICT:
 - Output **only** the JSON object above.
 - Ensure `events_detected` length ≤ 5 and sorted by date desc.
   """
-)
+
+def event_price_spike_agent():
+    return cached(Agent(
+        name="EventSpikeAgent",
+        model= Groq(id="llama-3.3-70b-versatile"),
+        tools=[YFinanceTools()],
+        instructions=EVENT_SPIKE_INSTRUCTIONS,
+    ), live=True, limiter=groq_limiter())
 
 # ---------------------------
 # Agent Functions
@@ -257,7 +271,7 @@ def CompetitorTrend_agent(query: str | None = None):
     payload.setdefault("rebase", "per_series")
     try:
         # Run the agent and capture raw text
-        raw = _agent_text(competitor_trend_agent.run(json.dumps(payload)))
+        raw = _agent_text(competitor_trend_agent().run(json.dumps(payload)))
         # Print raw for debugging before salvage
         print("\n[CompetitorTrendAgent][raw]\n" + str(raw) + "\n")
 
@@ -309,7 +323,7 @@ def MarketTrendAnalyzer_agent(query: str):
     """
     try:
         payload = {"query": query, "period": {"from": "2019", "to": "2025"}, "region": "global", "rebase": "none"}
-        raw = _agent_text(market_trend_anlyzer_agent.run(json.dumps(payload)))
+        raw = _agent_text(market_trend_anlyzer_agent().run(json.dumps(payload)))
         text = _salvage_json(raw) or {}
     except Exception as e:
         fallback = {
@@ -340,7 +354,7 @@ def EventPriceSpike_agent(query: str, adoption: dict | None = None):
     if isinstance(adoption, dict):
         payload["adoption"] = adoption
     try:
-        raw = _agent_text(event_price_spike_agent.run(json.dumps(payload)))
+        raw = _agent_text(event_price_spike_agent().run(json.dumps(payload)))
         text = _salvage_json(raw) or {}
     except Exception as e:
         fallback = {
@@ -2,7 +2,7 @@
 # Market-level NLP-first trend analyzer (phidata + DuckDuckGo, with robust ddgs fallback).
 # Focus: aggregated market signals (sentiment/topics/NER/keywords). Finance = tiny snapshots only.
 
-import os, json, random, time, re, warnings, math
+import os, sys, json, random, time, re, warnings, math
 from pathlib import Path
 from typing import List, Tuple, Dict, Any, Iterable
 
@@ -22,6 +22,9 @@ from phi.agent import Agent
 from phi.model.groq import Groq
 from phi.tools.yfinance import YFinanceTools
 from phi.tools.duckduckgo import DuckDuckGo
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utills.llm_cache import cached
+from utills.map_reduce import groq_limiter
 try:
     from groq import BadRequestError
 except Exception:
@@ -108,7 +111,7 @@ def sleep_backoff(i: int):
 def build_agent() -> Agent:
     if not os.getenv("GROQ_API_KEY"):
         raise RuntimeError("GROQ_API_KEY missing in .env next to this script.")
-    return Agent(
+    return cached(Agent(
         model=Groq(id=GROQ_MODEL),
         tools=[
             YFinanceTools(stock_price=False, stock_fundamentals=True, analyst_recommendations=False),
@@ -122,17 +125,17 @@ def build_agent() -> Agent:
         markdown=False,
         show_tool_calls=False,
         debug_mode=False
-    )
+    ), limiter=groq_limiter())
 
 def agent_no_tools(agent: Agent) -> Agent:
-    return Agent(
+    return cached(Agent(
         model=agent.model,
         tools=[],
         instructions=agent.instructions,
         markdown=agent.markdown,
         show_tool_calls=agent.show_tool_calls,
         debug_mode=agent.debug_mode
-    )
+    ), limiter=groq_limiter())
 
 # ---------------- 1) Companies (model-only; no tools) ----------------
 def propose_companies(agent: Agent, topic: str, brand: str, cap: int) -> List[Tuple[str,str]]:
@@ -168,7 +171,7 @@ def _ddg_titles_from_agent(agent: Agent, query: str, limit: int) -> List[str]:
     q = f'Use duckduckgo_search to return up to {min(limit,10)} titles only (no links) for recent news about "{query}" in the past 90 days.'
     for i in range(RETRIES):
         try:
-            out = only_text(agent.run(q))
+            out = only_text(agent.run(q, live=True))  # recent headlines: always a live search
             # agent often returns JSON list from the tool; parse if present
             titles = []
             t = out.strip()
@@ -294,7 +297,7 @@ def bucket_counts(texts: List[str]) -> Dict[str,int]:
 # ---------------- 4) Tiny fundamentals snapshots (context only) ----------------
 def fundamentals_once(agent: Agent, ticker: str) -> Dict[str, Any]:
     try:
-        resp = agent.run(f"Call get_stock_fundamentals for symbol {ticker} and return the raw JSON only.")
+        resp = agent.run(f"Call get_stock_fundamentals for symbol {ticker} and return the raw JSON only.", live=True)
         txt = only_text(resp).strip()
         data = json.loads(txt) if txt.startswith("{") else {}
         keep = {k:data.get(k) for k in ("symbol","company_name","sector","industry","market_cap","pe_ratio","pb_ratio","dividend_yield")}
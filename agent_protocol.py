@@ -1,11 +1,116 @@
 # agent_protocol.py
+"""
+Request-scoped message bus between agents.
+
+Each pipeline run opens `run_scope()`; the scope lives in a contextvar, so agents
+running on worker threads (StageGraph copies the caller's context) or in other
+tasks of the same request see that run's channels and nobody else's. A channel
+is a bounded queue per receiver: `send` blocks while it is full (backpressure)
+and raises ChannelFull after `timeout`; `receive` takes the oldest message.
+
+Outside any run scope (scripts, notebooks) a shared default scope keeps the old
+behaviour: one slot per receiver, a new message replaces the previous one, and
+`receive` returns it without taking it, so repeated reads see the same message.
+"""
+import contextvars, os, queue, threading, uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+CHANNEL_SIZE = int(os.getenv("AGENT_CHANNEL_SIZE", "8"))          # messages buffered per receiver and run
+SEND_TIMEOUT = float(os.getenv("AGENT_SEND_TIMEOUT", "30"))        # seconds a sender waits on a full channel
+
+
+class ChannelFull(RuntimeError):
+    pass
+
+
+class RunScope:
+    def __init__(self, run_id: str, maxsize: int = CHANNEL_SIZE, replace_when_full: bool = False,
+                 keep_on_read: bool = False):
+        self.run_id = run_id
+        self.maxsize = max(1, maxsize)
+        self.replace_when_full = replace_when_full
+        self.keep_on_read = keep_on_read
+        self._channels: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    def channel(self, name: str) -> queue.Queue:
+        with self._lock:
+            q = self._channels.get(name)
+            if q is None:
+                q = self._channels[name] = queue.Queue(maxsize=self.maxsize)
+            return q
+
+    def put(self, receiver: str, content: dict, timeout: Optional[float]) -> None:
+        q = self.channel(receiver)
+        if self.replace_when_full:
+            with self._lock:   # drop the oldest so the newest always lands
+                while q.full():
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        break
+                q.put_nowait(content)
+            return
+        try:
+            q.put(content, timeout=timeout)
+        except queue.Full:
+            raise ChannelFull(f"run {self.run_id}: channel {receiver!r} full for {timeout}s") from None
+
+    def get(self, receiver: str, timeout: Optional[float]) -> dict:
+        """Oldest message for `receiver`; raises queue.Empty if none arrives within `timeout`."""
+        q = self.channel(receiver)
+        if not self.keep_on_read:
+            return q.get(timeout=timeout) if timeout else q.get_nowait()
+        with q.not_empty:   # peek: the message stays for the next reader
+            if timeout:
+                q.not_empty.wait_for(lambda: q.queue, timeout)
+            if not q.queue:
+                raise queue.Empty
+            return q.queue[0]
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: q.qsize() for name, q in self._channels.items() if q.qsize()}
+
+
+_current: contextvars.ContextVar[Optional[RunScope]] = contextvars.ContextVar("agent_run", default=None)
+_default_scope = RunScope("default", maxsize=1, replace_when_full=True, keep_on_read=True)
+
+
+@contextmanager
+def run_scope(run_id: Optional[str] = None, maxsize: int = CHANNEL_SIZE):
+    """Give everything inside this block (and stage threads it starts) a private set of channels."""
+    scope = RunScope(run_id or uuid.uuid4().hex[:12], maxsize)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        leftover = scope.pending()
+        if leftover:
+            print(f"[A2A] run {scope.run_id} ended with unread messages: {leftover}")
+
+
+def current_scope() -> RunScope:
+    return _current.get() or _default_scope
+
+
 class AgentProtocol:
-    def __init__(self):
-        self.messages = {}
+    """Agent-facing API; all state lives in the current run scope."""
+
+    def send(self, sender: str, receiver: str, content: dict, timeout: Optional[float] = SEND_TIMEOUT):
+        scope = current_scope()
+        print(f"\n📨 [A2A] {sender} → {receiver} (run {scope.run_id})")
+        scope.put(receiver, content, timeout)
 
-    def send(self, sender: str, receiver: str, content: dict):
-        print(f"\n📨 [A2A] {sender} → {receiver}")
-        self.messages[receiver] = content
+    def receive(self, agent_name: str, timeout: Optional[float] = None):
+        """Oldest message for `agent_name` in this run, or {} if none arrives within `timeout`.
 
-    def receive(self, agent_name: str):
-        return self.messages.get(agent_name, {})
+        Inside a run scope the message is taken off the channel; in the default scope it
+        stays until the next send replaces it.
+        """
+        try:
+            return current_scope().get(agent_name, timeout)
+        except queue.Empty:
+            return {}
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+# repo root for utills/ and agent_protocol; the scraper package imports its siblings by bare name
+for p in (ROOT, ROOT / "Data_Scraper_IR_Agent"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+
+@pytest.fixture(scope="session")
+def scraper(tmp_path_factory):
+    """DataScraperIR imported with its storage/ under a temp dir, extraction inline and
+    no robots checks, host delay or scheduled optimize."""
+    mp = pytest.MonkeyPatch()
+    mp.chdir(tmp_path_factory.mktemp("scraper"))
+    for key, value in {"SCRAPER_EXTRACT_WORKERS": "0", "SCRAPER_RESPECT_ROBOTS": "0", "SCRAPER_HOST_DELAY": "0",
+                       "SCRAPER_INDEX_OPTIMIZE_HOURS": "0", "SCRAPER_INDEX_COMMIT_INTERVAL": "0.05",
+                       "SERPER_API_KEY": "test"}.items():
+        mp.setenv(key, value)
+    try:
+        import DataScraperIR
+    finally:
+        mp.undo()
+    return DataScraperIR
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from agent_protocol import AgentProtocol, ChannelFull, current_scope, run_scope
+
+protocol = AgentProtocol()
+
+
+def test_runs_do_not_see_each_others_messages():
+    ready, results = threading.Barrier(2, timeout=2), {}
+
+    def run(name):
+        with run_scope(name):
+            protocol.send("Scraper", "Summarizer", {"run": name})
+            ready.wait()  # both runs have sent before either reads
+            results[name] = [protocol.receive("Summarizer"), protocol.receive("Summarizer")]
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in ("r1", "r2")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {"r1": [{"run": "r1"}, {}], "r2": [{"run": "r2"}, {}]}
+
+
+def test_messages_are_read_oldest_first():
+    with run_scope():
+        for i in range(3):
+            protocol.send("A", "B", {"i": i})
+        assert [protocol.receive("B")["i"] for _ in range(3)] == [0, 1, 2]
+
+
+def test_full_channel_applies_backpressure():
+    with run_scope(maxsize=1):
+        protocol.send("A", "B", {"i": 0})
+        with pytest.raises(ChannelFull):
+            protocol.send("A", "B", {"i": 1}, timeout=0.05)
+
+
+def test_scope_ends_with_the_block(capsys):
+    with run_scope("r") as scope:
+        assert current_scope() is scope
+        protocol.send("A", "Nobody", {})
+    assert current_scope() is not scope
+    assert "unread messages: {'Nobody': 1}" in capsys.readouterr().out
+
+
+def test_default_scope_keeps_latest_message():
+    protocol.send("A", "Latest", {"i": 0})
+    protocol.send("A", "Latest", {"i": 1})
+    assert protocol.receive("Latest") == {"i": 1}
+    assert protocol.receive("Latest") == {"i": 1}
+    assert protocol.receive("Unsent") == {}
+
+
+def test_default_scope_receive_waits_for_a_message():
+    threading.Timer(0.05, protocol.send, args=("A", "Waiting", {"i": 0})).start()
+    assert protocol.receive("Waiting", timeout=2) == {"i": 0}
@@ -0,0 +1,36 @@
+import pytest
+
+from canonical import canonicalize, link_canonical
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/a/b/?utm_source=x&b=2&a=1#frag", "https://example.com/a/b?a=1&b=2"),
+    ("http://example.com:80/", "http://example.com/"),
+    ("http://example.com:8080/x", "http://example.com:8080/x"),
+    ("https://example.com/story/amp/", "https://example.com/story"),
+    ("https://example.com/amp/story", "https://example.com/story"),
+    ("https://example.com/story.amp.html", "https://example.com/story.html"),
+    ("https://example.com/s?amp=1&gclid=abc&id=7", "https://example.com/s?id=7"),
+    ("https://www-example-com.cdn.ampproject.org/c/s/www.example.com/story?id=1",
+     "https://www.example.com/story?id=1"),
+    ("https://example.com//a//b", "https://example.com/a/b"),
+])
+def test_canonicalize(url, expected):
+    assert canonicalize(url) == expected
+
+
+@pytest.mark.parametrize("url", ["mailto:someone@example.com", "not a url", "ftp://example.com/x"])
+def test_canonicalize_leaves_unsupported_urls_alone(url):
+    assert canonicalize(url) == url
+
+
+def test_canonicalize_is_idempotent():
+    once = canonicalize("https://Example.com/a/?utm_medium=m&z=1&y=2")
+    assert canonicalize(once) == once
+
+
+def test_link_canonical_same_site_only():
+    html = '<head><link rel="canonical" href="https://www.example.com/story?utm_source=x"></head>'
+    assert link_canonical(html, "https://example.com/story/amp") == "https://www.example.com/story"
+    other = '<link rel="canonical" href="https://partner.net/story">'
+    assert link_canonical(other, "https://example.com/story") is None
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from dedup import MAX_DISTANCE, FingerprintIndex, RunDeduper, simhash
+
+STORY = ("Shares of the chipmaker rose sharply on Thursday after the company reported quarterly revenue "
+         "well above analyst expectations, driven by strong demand for data center processors used to "
+         "train large artificial intelligence models, and raised its forecast for the current quarter.")
+
+
+def flip(fp, bits):
+    for b in bits:
+        fp ^= 1 << b
+    return fp
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FingerprintIndex(tmp_path / "fp.sqlite3")
+
+
+def test_band_lookup_finds_every_fingerprint_within_max_distance(store):
+    rng = random.Random(7)
+    base = rng.getrandbits(64)
+    store.add("https://a.com/original", base)
+    for _ in range(200):
+        near = flip(base, rng.sample(range(64), MAX_DISTANCE))
+        assert store.find("https://b.com/copy", near) == ("https://a.com/original", MAX_DISTANCE)
+
+
+def test_distances_the_bands_cannot_guarantee_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="max_distance"):
+        FingerprintIndex(tmp_path / "fp.sqlite3", max_distance=MAX_DISTANCE + 1)
+
+
+def test_copies_within_a_run_are_dropped():
+    dd = RunDeduper(None)
+    assert dd.check("https://a.com/1", STORY) == (None, None)
+    assert dd.check("https://b.com/1", STORY) == ("https://a.com/1", None)
+
+
+def test_earlier_runs_suppress_copies_while_the_original_is_indexed(store):
+    indexed = {"https://a.com/1"}
+    RunDeduper(store, exists=indexed.__contains__).check("https://a.com/1", STORY)
+    assert RunDeduper(store, exists=indexed.__contains__).check("https://b.com/1", STORY) == (None, "https://a.com/1")
+
+
+def test_copy_replaces_an_original_that_left_the_index(store):
+    RunDeduper(store).check("https://a.com/1", STORY)
+    assert RunDeduper(store, exists=lambda url: False).check("https://b.com/1", STORY) == (None, None)
+    assert store.find("https://c.com/1", simhash(STORY))[0] == "https://b.com/1"
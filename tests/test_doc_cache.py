@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from doc_cache import DocCache, cache_key
+
+
+def doc(n, size=10):
+    return {"title": f"t{n}", "url": f"https://a.com/{n}", "content": "word " * size}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DocCache(tmp_path / "docs.sqlite3", mem_items=2)
+
+
+def test_roundtrip_through_both_tiers(tmp_path, cache):
+    cache.put("https://a.com/1", doc(1))
+    assert cache.get("https://a.com/1") == doc(1)
+    assert cache.stats()["hits_mem"] == 1
+    reopened = DocCache(tmp_path / "docs.sqlite3")
+    assert reopened.get("https://a.com/1") == doc(1)
+    assert reopened.stats()["hits_disk"] == 1
+    assert reopened.get("https://a.com/missing") is None
+
+
+def test_memory_tier_is_bounded(cache):
+    for n in range(3):
+        cache.put(f"https://a.com/{n}", doc(n))
+    assert cache.stats()["mem_entries"] == 2
+    assert cache.get("https://a.com/0") == doc(0)
+    assert cache.stats()["hits_disk"] == 1
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = DocCache(tmp_path / "docs.sqlite3", ttl=-1)
+    cache.put("https://a.com/1", doc(1))
+    assert cache.get("https://a.com/1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_size_budget_evicts_least_recently_used(tmp_path):
+    # random hex compresses to roughly half: ~470 bytes stored each, one fits the budget, two don't
+    cache = DocCache(tmp_path / "docs.sqlite3", max_bytes=600, mem_items=0)
+    cache.put("https://a.com/old", {"content": os.urandom(400).hex()})
+    cache.put("https://a.com/new", {"content": os.urandom(400).hex()})
+    assert cache.get("https://a.com/old") is None
+    assert cache.get("https://a.com/new") is not None
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_get_many_mixes_tiers(cache):
+    for n in range(3):
+        cache.put(f"https://a.com/{n}", doc(n))
+    urls = [f"https://a.com/{n}" for n in range(4)]
+    assert cache.get_many(urls) == {u: doc(n) for n, u in enumerate(urls[:3])}
+
+
+def test_iter_docs_streams_every_row(cache):
+    for n in range(5):
+        cache.put(f"https://a.com/{n}", doc(n))
+    assert [d["title"] for d in cache.iter_docs(batch=2)] == [f"t{n}" for n in range(5)]
+
+
+def test_legacy_json_files_are_imported_once(tmp_path):
+    legacy = tmp_path / "cache"
+    legacy.mkdir()
+    (legacy / f"{cache_key('https://a.com/1')}.json").write_text(json.dumps(doc(1)))
+    cache = DocCache(legacy / "docs.sqlite3")
+    assert cache.import_legacy(legacy) == 1
+    assert cache.import_legacy(legacy) == 0
+    assert cache.get("https://a.com/1") == doc(1)
+
+
+def test_touch_refreshes_fetch_time_and_keeps_missing_validators(tmp_path):
+    cache = DocCache(tmp_path / "docs.sqlite3", mem_items=0)
+    cache.put("https://a.com/1", doc(1), etag='"v1"', last_modified="Mon, 05 Jan 2026 10:00:00 GMT")
+    before = cache.lookup("https://a.com/1").fetched_at
+    cache.touch("https://a.com/1", etag='"v2"')
+    e = cache.lookup("https://a.com/1")
+    assert e.fetched_at >= before
+    assert (e.etag, e.last_modified) == ('"v2"', "Mon, 05 Jan 2026 10:00:00 GMT")
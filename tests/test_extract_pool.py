@@ -0,0 +1,41 @@
+import warnings
+
+import pytest
+
+from extract_pool import ExtractPool, ExtractTimeout
+
+HTML = "<html><body><article><p>" + " ".join(f"word{i}" for i in range(200)) + "</p></article></body></html>"
+
+
+def test_workers_are_not_forked_from_the_threaded_parent():
+    pool = ExtractPool(workers=1)
+    assert pool.start_method in ("forkserver", "spawn")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)  # fork() with live threads warns on 3.12+
+            text = pool.extract(HTML, "https://a.com/story")
+        assert "word199" in text
+        assert pool._get_pool()._mp_context.get_start_method() == pool.start_method
+    finally:
+        pool.shutdown()
+
+
+def test_inline_mode_skips_the_pool():
+    pool = ExtractPool(workers=0)
+    assert "word0" in pool.extract(HTML, "https://a.com/story")
+    assert pool._pool is None
+
+
+def spin(data, url):
+    while True:
+        pass
+
+
+def test_cpu_budget_overruns_raise_instead_of_looking_empty():
+    pool = ExtractPool(workers=1, cpu_timeout=0.2)
+    try:
+        with pytest.raises(ExtractTimeout):
+            pool._run(spin, "", "https://a.com/slow")
+        assert pool.timeouts == 1
+    finally:
+        pool.shutdown()
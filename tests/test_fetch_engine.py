@@ -0,0 +1,115 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import fetch_engine
+from fetch_engine import HostScheduler, interleave_by_host, run_concurrent
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="test-scrape")
+    monkeypatch.setattr(fetch_engine, "_pool", pool)
+    yield pool
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def same(url):
+    return url
+
+
+def test_interleave_round_robins_hosts_in_rank_order():
+    urls = ["https://a.com/1", "https://a.com/2", "https://b.com/1", "https://a.com/3", "https://c.com/1"]
+    assert [i for i, _ in interleave_by_host(urls, same)] == [0, 2, 4, 1, 3]
+
+
+def test_scheduler_spaces_requests_per_host_only():
+    sched = HostScheduler(delay=0.1)
+    t0 = time.monotonic()
+    sched.wait("https://a.com/1")
+    sched.wait("https://b.com/1")
+    assert time.monotonic() - t0 < 0.05
+    sched.wait("https://a.com/2")
+    assert time.monotonic() - t0 >= 0.09
+
+
+def test_scheduler_evicts_hosts_whose_slot_passed():
+    sched = HostScheduler(delay=0.01, max_hosts=4)
+    for i in range(4):
+        sched.wait(f"https://h{i}.com/")
+    time.sleep(0.02)
+    sched.wait("https://fresh.com/")
+    assert list(sched._next) == ["fresh.com"]
+
+
+def test_results_cover_every_item(pool):
+    urls = [f"https://h{i % 3}.com/{i}" for i in range(7)]
+    out = {i: r for i, _, r, err in run_concurrent(urls, str.upper, same, max_workers=3)}
+    assert out == {i: u.upper() for i, u in enumerate(urls)}
+
+
+def test_errors_are_yielded_not_raised(pool):
+    def worker(url):
+        raise ValueError(url)
+
+    [(_, _, res, err)] = run_concurrent(["https://a.com/"], worker, same)
+    assert res is None and isinstance(err, ValueError)
+
+
+def test_concurrent_calls_share_the_global_cap(pool):
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def worker(url):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    urls = [f"https://h{i}.com/" for i in range(6)]
+    callers = [threading.Thread(target=lambda: list(run_concurrent(urls, worker, same, max_workers=8)))
+               for _ in range(3)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    assert peak[0] == 2
+
+
+def test_deadline_stops_iteration_and_never_starts_the_rest(pool):
+    started = []
+
+    def worker(url):
+        started.append(url)
+        time.sleep(0.01 if url.endswith("fast") else 0.5)
+        return url
+
+    urls = ["https://a.com/fast", "https://b.com/slow", "https://c.com/never", "https://d.com/never"]
+    t0 = time.monotonic()
+    got = [r for _, _, r, _ in run_concurrent(urls, worker, same, max_workers=2, deadline=t0 + 0.2)]
+    assert time.monotonic() - t0 < 0.4
+    assert got == ["https://a.com/fast"]
+    time.sleep(0.05)
+    assert "https://d.com/never" not in started
+
+
+def test_closing_the_iterator_cancels_queued_work(pool):
+    gate = threading.Event()
+    started = []
+
+    def worker(url):
+        started.append(url)
+        if not url.endswith("/0"):
+            gate.wait(1)
+        return url
+
+    urls = [f"https://h{i}.com/{i}" for i in range(6)]
+    it = run_concurrent(urls, worker, same, max_workers=4)
+    assert next(it)[2] == urls[0]
+    it.close()
+    gate.set()
+    time.sleep(0.05)
+    assert sorted(started) == urls[:3]  # two pool threads: the first item, then two gated ones
@@ -0,0 +1,64 @@
+import time
+
+from fetch_engine import HostHealth
+
+URL = "https://example.com/a"
+COOLDOWN = 0.05
+
+
+def test_opens_after_consecutive_failures():
+    h = HostHealth(fail_threshold=2, cooldown=COOLDOWN)
+    h.record(URL, ok=False)
+    assert h.allow(URL) == (True, "closed")
+    h.record(URL, ok=False)
+    assert h.allow("https://example.com/other") == (False, "open")  # whole host, not one URL
+    assert h.allow("https://elsewhere.org/") == (True, "closed")
+
+
+def test_success_resets_the_failure_streak():
+    h = HostHealth(fail_threshold=2, min_samples=100, cooldown=COOLDOWN)
+    for _ in range(3):
+        h.record(URL, ok=False)
+        h.record(URL, ok=True)
+    assert h.allow(URL) == (True, "closed")
+
+
+def test_half_open_allows_one_probe_and_success_closes():
+    h = HostHealth(fail_threshold=1, cooldown=COOLDOWN)
+    h.record(URL, ok=False)
+    assert h.allow(URL)[0] is False
+    time.sleep(COOLDOWN * 1.5)
+    assert h.allow(URL) == (True, "half_open")
+    assert h.allow(URL) == (False, "half_open")  # second caller waits for the probe
+    h.record(URL, ok=True)
+    assert h.allow(URL) == (True, "closed")
+
+
+def test_failed_probe_reopens_with_longer_cooldown():
+    h = HostHealth(fail_threshold=1, cooldown=COOLDOWN)
+    h.record(URL, ok=False)
+    time.sleep(COOLDOWN * 1.5)
+    assert h.allow(URL) == (True, "half_open")
+    h.record(URL, ok=False)
+    assert h.allow(URL) == (False, "open")
+    time.sleep(COOLDOWN * 1.5)  # cooldown doubled on the re-trip
+    assert h.allow(URL) == (False, "open")
+    time.sleep(COOLDOWN)
+    assert h.allow(URL) == (True, "half_open")
+
+
+def test_retry_after_opens_the_circuit_for_that_long():
+    h = HostHealth(fail_threshold=10, cooldown=COOLDOWN)
+    h.record(URL, ok=False, retry_after=COOLDOWN * 3)
+    time.sleep(COOLDOWN * 1.5)
+    assert h.allow(URL) == (False, "open")
+
+
+def test_released_probe_lets_the_next_request_probe():
+    h = HostHealth(fail_threshold=1, cooldown=COOLDOWN)
+    h.record(URL, ok=False)
+    time.sleep(COOLDOWN * 1.5)
+    assert h.allow(URL) == (True, "half_open")
+    assert h.allow(URL)[0] is False
+    h.release(URL)
+    assert h.allow(URL) == (True, "half_open")
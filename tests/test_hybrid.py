@@ -0,0 +1,44 @@
+import threading
+
+import hybrid
+from hybrid import NewsVectorStore, rrf
+
+
+class FakeCollection:
+    def __init__(self):
+        self.metas = []
+
+    def upsert(self, ids, documents, metadatas):
+        self.metas += metadatas
+
+
+def test_rrf_rewards_agreement():
+    fused = dict(rrf([["a", "b", "c"], ["b", "d"]]))
+    assert max(fused, key=fused.get) == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+
+
+def test_chunks_are_keyed_on_the_canonical_url(tmp_path):
+    store = NewsVectorStore(tmp_path)
+    store._col = FakeCollection()
+    store._add([{"url": "https://www.Example.com/story/amp?utm_source=x", "content": "word " * 50}])
+    assert {m["url"] for m in store._col.metas} == {hybrid.canonicalize("https://www.example.com/story")}
+
+
+def test_available_never_waits_for_the_model(tmp_path, monkeypatch):
+    store = NewsVectorStore(tmp_path)
+    monkeypatch.setattr(store, "_failed", False)
+    loaded = threading.Event()
+
+    def slow_collection():
+        loaded.wait(1)
+        store._col = FakeCollection()
+        return store._col
+
+    monkeypatch.setattr(store, "_collection", slow_collection)
+    assert store.available() is False
+    warming = store.warm_up()
+    assert warming is not None and store.warm_up() is warming  # one load in flight
+    loaded.set()
+    warming.result(1)
+    assert store.available() is True
@@ -0,0 +1,101 @@
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from utills import llm_cache
+from utills.llm_cache import LLMCache, cache_key, cached
+
+
+class FakeAgent:
+    def __init__(self, instructions="be brief", model_id="m1", tools=()):
+        self.model = SimpleNamespace(provider="Groq", id=model_id)
+        self.instructions = instructions
+        self.tools = list(tools)
+        self.calls = 0
+
+    def run(self, message, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(content=f"answer {self.calls}: {message}", messages=[])
+
+
+class Limiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "ENABLED", True)
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache(tmp_path / "llm.sqlite3"))
+    return llm_cache._cache
+
+
+def test_key_covers_model_instructions_prompt_and_tools():
+    base = cache_key(FakeAgent(), "q")
+    assert cache_key(FakeAgent(), "q") == base
+    assert cache_key(FakeAgent(), "other") != base
+    assert cache_key(FakeAgent(instructions="be long"), "q") != base
+    assert cache_key(FakeAgent(model_id="m2"), "q") != base
+    assert cache_key(FakeAgent(tools=[SimpleNamespace(name="yfinance")]), "q") != base
+
+
+def test_hit_skips_the_model_and_the_limiter(store):
+    agent, limiter = FakeAgent(), Limiter()
+    proxy = cached(agent, limiter=limiter)
+    first = proxy.run("q")
+    again = proxy.run("q")
+    assert (agent.calls, limiter.acquired) == (1, 1)
+    assert again.content == first.content and str(again) == str(first)
+    assert store.stats()["hits"] == 1
+
+
+def test_expired_entries_are_refetched():
+    agent = FakeAgent()
+    proxy = cached(agent, ttl=-1)
+    proxy.run("q")
+    assert proxy.run("q").content == "answer 2: q"
+
+
+def test_live_calls_bypass_the_cache(store):
+    agent = FakeAgent()
+    proxy = cached(agent)
+    proxy.run("q")
+    assert proxy.run("q", live=True).content == "answer 2: q"
+    assert cached(agent, live=True).run("q").content == "answer 3: q"
+    assert store.stats()["bypassed"] == 2
+
+
+def test_proxy_passes_attributes_through():
+    agent = FakeAgent()
+    proxy = cached(agent)
+    assert proxy.instructions == "be brief"
+    proxy.instructions = "changed"
+    assert agent.instructions == "changed"
+    assert cached(proxy) is proxy
+
+
+def test_tool_agents_default_to_the_short_ttl():
+    assert cached(FakeAgent()).ttl == llm_cache.DEFAULT_TTL
+    assert cached(FakeAgent(tools=[SimpleNamespace(name="duckduckgo")])).ttl == llm_cache.TOOL_TTL
+    assert cached(FakeAgent(tools=[SimpleNamespace(name="duckduckgo")]), ttl=5).ttl == 5
+
+
+def test_rewrapping_applies_new_settings_without_touching_the_original():
+    agent, limiter = FakeAgent(), Limiter()
+    proxy = cached(agent, ttl=60)
+    paced = cached(proxy, limiter=limiter)
+    assert paced is not proxy and paced.agent is agent
+    assert (paced.ttl, paced.limiter) == (60, limiter)
+    assert proxy.limiter is None
+    assert cached(proxy, live=True).live and not proxy.live
+
+
+@pytest.mark.skipif(bool(os.getenv("LLM_CACHE_PATH")), reason="store path overridden")
+def test_store_lives_under_the_repo_storage_dir():
+    repo = Path(llm_cache.__file__).resolve().parents[1]
+    assert llm_cache.CACHE_PATH == repo / "storage" / "cache" / "llm_responses.sqlite3"
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import pytest
+
+from utills import map_reduce
+from utills.map_reduce import RateLimiter, call_limited, groq_limiter, map_ordered, reduce_tree
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code, msg="error"):
+        super().__init__(msg)
+        self.status_code = status_code
+
+
+def test_limiter_allows_the_burst_then_paces():
+    limiter = RateLimiter(per_minute=600, burst=2)   # one token per 0.1s
+    t0 = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+    assert time.monotonic() - t0 < 0.05
+    limiter.acquire()
+    assert time.monotonic() - t0 >= 0.09
+
+
+def test_penalize_makes_the_next_acquire_wait():
+    limiter = RateLimiter(per_minute=600, burst=4)
+    limiter.penalize(0.1)
+    t0 = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - t0 >= 0.15   # 0.1s penalty + 0.1s for one token
+
+
+def test_one_groq_limiter_per_key(monkeypatch):
+    monkeypatch.setattr(map_reduce, "_limiters", {})
+    monkeypatch.setenv("GROQ_API_KEY", "k1")
+    assert groq_limiter() is groq_limiter("k1")
+    assert groq_limiter("k2") is not groq_limiter()
+
+
+@pytest.mark.parametrize("error, limited", [
+    (HTTPError(429), True),
+    (HTTPError(500, "upstream returned 429 bytes"), False),
+    (ValueError("429"), False),
+])
+def test_rate_limits_are_recognised_by_status_code(error, limited):
+    assert map_reduce._is_rate_limited(error) is limited
+
+
+def test_wrapped_rate_limit_errors_are_recognised():
+    try:
+        try:
+            raise HTTPError(429)
+        except HTTPError as e:
+            raise RuntimeError("model call failed") from e
+    except RuntimeError as e:
+        assert map_reduce._is_rate_limited(e)
+
+
+def test_rate_limited_calls_are_retried_and_penalize_the_limiter(monkeypatch):
+    class Limiter:
+        def __init__(self):
+            self.acquired, self.penalties = 0, []
+
+        def acquire(self):
+            self.acquired += 1
+
+        def penalize(self, seconds):
+            self.penalties.append(seconds)
+
+    attempts = []
+
+    def flaky(item):
+        attempts.append(item)
+        if len(attempts) < 3:
+            raise HTTPError(429)
+        return item * 2
+
+    limiter = Limiter()
+    assert call_limited(flaky, 21, limiter, backoff=0.01, pace=False) == 42
+    assert limiter.penalties == [0.01, 0.02]
+    assert limiter.acquired == 0
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def broken(item):
+        calls.append(item)
+        raise HTTPError(400)
+
+    with pytest.raises(HTTPError):
+        call_limited(broken, 1, backoff=0.01)
+    assert calls == [1]
+
+
+def test_map_ordered_keeps_input_order_and_reports_failures():
+    errors = []
+
+    def work(n):
+        time.sleep(0.01 * (5 - n))
+        if n == 2:
+            raise ValueError(n)
+        return n * 10
+
+    out = map_ordered(work, list(range(5)), max_workers=5, on_error=lambda item, e: errors.append(item))
+    assert out == [0, 10, None, 30, 40]
+    assert errors == [2]
+
+
+def test_map_ordered_caps_calls_in_flight():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def work(n):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return n
+
+    map_ordered(work, list(range(8)), max_workers=3)
+    assert peak[0] == 3
+
+
+def test_reduce_tree_merges_level_by_level_until_fan_in_remain():
+    calls = []
+
+    def merge(group):
+        calls.append(len(group))
+        return "+".join(group)
+
+    parts = [str(n) for n in range(10)]
+    out = reduce_tree(parts, merge, fan_in=3)
+    assert sorted(calls) == [1, 1, 3, 3, 3, 3]
+    assert out == ["0+1+2+3+4+5+6+7+8", "9"]
+
+
+def test_reduce_tree_keeps_the_first_partial_of_a_failed_group():
+    def merge(group):
+        if "a" in group:
+            raise RuntimeError("model down")
+        return "".join(group)
+
+    assert reduce_tree(list("abcdef"), merge, fan_in=2) == ["a", "ef"]
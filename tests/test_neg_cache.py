@@ -0,0 +1,45 @@
+import pytest
+
+from neg_cache import DEFAULT_TTLS, NegativeCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return NegativeCache(tmp_path / "failures.sqlite3")
+
+
+@pytest.mark.parametrize("reason", sorted(DEFAULT_TTLS))
+def test_ttl_follows_reason(cache, reason):
+    cache.record("https://example.com/a", reason, "boom")
+    f = cache.get("https://example.com/a")
+    assert f.reason == reason
+    assert f.expires_at - f.failed_at == pytest.approx(DEFAULT_TTLS[reason])
+
+
+def test_unknown_reason_uses_error_ttl(cache):
+    cache.record("https://example.com/a", "mystery")
+    f = cache.get("https://example.com/a")
+    assert f.expires_at - f.failed_at == pytest.approx(DEFAULT_TTLS["error"])
+
+
+def test_rerecord_replaces_reason_and_counts(cache):
+    cache.record("https://example.com/a", "timeout")
+    cache.record("https://example.com/a", "http_4xx", "HTTP 404")
+    f = cache.get("https://example.com/a")
+    assert (f.reason, f.detail, f.count) == ("http_4xx", "HTTP 404", 2)
+
+
+def test_expired_entries_are_ignored_and_purged(tmp_path):
+    cache = NegativeCache(tmp_path / "failures.sqlite3", ttls={"timeout": -1})
+    cache.record("https://example.com/a", "timeout")
+    cache.record("https://example.com/b", "http_5xx")
+    assert cache.get("https://example.com/a") is None
+    assert set(cache.get_many(["https://example.com/a", "https://example.com/b"])) == {"https://example.com/b"}
+    assert cache.purge_expired() == 1
+    assert cache.stats()["active"] == {"http_5xx": 1}
+
+
+def test_clear(cache):
+    cache.record("https://example.com/a", "http_5xx")
+    cache.clear("https://example.com/a")
+    assert cache.get("https://example.com/a") is None
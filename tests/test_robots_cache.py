@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from robots_cache import RobotsCache
+
+UA = "TestBot/1.0"
+RULES = "User-agent: *\nDisallow: /private/\n"
+
+
+class Fetcher:
+    def __init__(self, status=200, body=RULES, error=None):
+        self.status, self.body, self.error = status, body, error
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        if self.error:
+            raise self.error
+        return self.status, self.body
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "robots.sqlite3"
+
+
+def test_rules_are_fetched_once_per_host(path):
+    fetch = Fetcher()
+    cache = RobotsCache(path, fetch)
+    assert cache.allowed("https://a.com/news/1", UA)
+    assert not cache.allowed("https://a.com/private/x", UA)
+    assert cache.allowed("https://b.com/private/x", UA) is False
+    assert fetch.calls == ["https://a.com/robots.txt", "https://b.com/robots.txt"]
+
+
+@pytest.mark.parametrize("status, allowed", [(401, False), (403, False), (404, True), (503, False)])
+def test_status_codes_follow_robotparser(path, status, allowed):
+    assert RobotsCache(path, Fetcher(status=status)).allowed("https://a.com/x", UA) is allowed
+
+
+def test_failures_use_the_short_ttl(path):
+    fetch = Fetcher(error=OSError("unreachable"))
+    cache = RobotsCache(path, fetch, ttl=3600, fail_ttl=-1)
+    assert not cache.allowed("https://a.com/x", UA)
+    fetch.error = None
+    assert cache.allowed("https://a.com/x", UA)
+    assert len(fetch.calls) == 2
+
+
+def test_rules_survive_a_restart(path):
+    RobotsCache(path, Fetcher()).allowed("https://a.com/x", UA)
+    fetch = Fetcher(status=500)
+    cache = RobotsCache(path, fetch)
+    assert not cache.allowed("https://a.com/private/x", UA)
+    assert fetch.calls == []
+
+
+def test_hosts_evicted_from_memory_are_reloaded_from_disk(path):
+    fetch = Fetcher()
+    cache = RobotsCache(path, fetch, max_hosts=1)
+    cache.allowed("https://a.com/x", UA)
+    cache.allowed("https://b.com/x", UA)
+    assert cache.stats()["hosts"] == 1
+    assert not cache.allowed("https://a.com/private/x", UA)
+    assert len(fetch.calls) == 2
+
+
+def test_concurrent_lookups_share_one_download(path):
+    gate = threading.Event()
+
+    class Slow(Fetcher):
+        def __call__(self, url):
+            gate.wait(1)
+            return super().__call__(url)
+
+    fetch = Slow()
+    cache = RobotsCache(path, fetch)
+    threads = [threading.Thread(target=cache.allowed, args=("https://a.com/x", UA)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert fetch.calls == ["https://a.com/robots.txt"]
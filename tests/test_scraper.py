@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import random
+import time
+
+import pytest
+
+_ids = itertools.count()
+TEXT = " ".join(f"word{i}" for i in range(80))
+
+
+def fresh_url(host="news.example.com"):
+    return f"https://{host}/story/{next(_ids)}"
+
+
+class FakeWeb:
+    """Stands in for fetch_page/extract_text: serves queued Pages and records validators."""
+
+    def __init__(self, scraper, monkeypatch):
+        self.scraper, self.calls, self.pages = scraper, [], {}
+        monkeypatch.setattr(scraper, "fetch_page", self.fetch_page)
+        monkeypatch.setattr(scraper, "extract_text", lambda html, url: html or None)
+
+    def fetch_page(self, url, etag=None, last_modified=None):
+        self.calls.append((url, etag, last_modified))
+        page = self.pages[url]
+        if isinstance(page, BaseException):
+            raise page
+        return page
+
+    def serve(self, url, html=TEXT, status=200, etag=None, last_modified=None):
+        self.pages[url] = self.scraper.Page(status, html, etag, last_modified)
+
+
+@pytest.fixture
+def web(scraper, monkeypatch):
+    return FakeWeb(scraper, monkeypatch)
+
+
+def test_fresh_entries_are_served_without_a_request(scraper, web):
+    url = fresh_url()
+    web.serve(url, etag='"v1"')
+    first = scraper.make_doc(url, title_hint="t")
+    assert scraper.make_doc(url, title_hint="t") == first
+    assert web.calls == [(url, None, None)]
+
+
+def test_stale_entries_send_a_conditional_get(scraper, web, monkeypatch):
+    url = fresh_url()
+    web.serve(url, etag='"v1"', last_modified="Mon, 05 Jan 2026 10:00:00 GMT")
+    first = scraper.make_doc(url, title_hint="t")
+    monkeypatch.setattr(scraper, "FRESH_TTL", 0)
+    web.serve(url, html="", status=304, etag='"v2"')
+    assert scraper.make_doc(url, title_hint="t") == first
+    assert web.calls[-1] == (url, '"v1"', "Mon, 05 Jan 2026 10:00:00 GMT")
+    entry = scraper._doc_cache.lookup(url)
+    assert (entry.etag, entry.last_modified) == ('"v2"', "Mon, 05 Jan 2026 10:00:00 GMT")
+
+
+def test_changed_pages_are_re_extracted(scraper, web, monkeypatch):
+    url = fresh_url()
+    web.serve(url, etag='"v1"')
+    scraper.make_doc(url, title_hint="t")
+    monkeypatch.setattr(scraper, "FRESH_TTL", 0)
+    web.serve(url, html="updated " + TEXT, etag='"v2"')
+    assert scraper.make_doc(url, title_hint="t").content.startswith("updated")
+    assert scraper._doc_cache.lookup(url).etag == '"v2"'
+
+
+def test_failed_revalidation_serves_the_stale_copy(scraper, web, monkeypatch):
+    url = fresh_url()
+    web.serve(url)
+    first = scraper.make_doc(url, title_hint="t")
+    monkeypatch.setattr(scraper, "FRESH_TTL", 0)
+    web.pages[url] = ConnectionError("down")
+    assert scraper.make_doc(url, title_hint="t") == first
+
+
+def test_search_only_commits_queued_docs_when_asked(scraper, monkeypatch):
+    flushes = []
+    flush = scraper._index.flush
+    monkeypatch.setattr(scraper._index, "flush", lambda timeout=None: flushes.append(timeout) or flush(timeout))
+    url = fresh_url()
+    scraper.index_docs([scraper.Document(title="Zyqxor quarterly results", url=url, content=TEXT)])
+    scraper.ir_search("zyqxor")
+    assert flushes == []
+    assert [h["url"] for h in scraper.ir_search("zyqxor", fresh=True)] == [url]
+    assert flushes == [30]
+
+
+def test_dedup_keys_on_the_canonical_url_the_index_uses(scraper):
+    original = fresh_url() + "?utm_source=feed"
+    doc = scraper.Document(title="t", url=original, content=TEXT + " dedup")
+    dd = scraper.RunDeduper(scraper._fingerprints, exists=scraper._index.contains)
+    assert scraper._check_dup(dd, doc, []) is True
+    scraper.index_docs([doc], wait=True)
+    dups = []
+    copy = scraper.Document(title="t", url=fresh_url("wire.example.com"), content=doc.content)
+    dd = scraper.RunDeduper(scraper._fingerprints, exists=scraper._index.contains)
+    assert scraper._check_dup(dd, copy, dups) is False
+    assert dups[0]["duplicate_of"] == scraper.canonicalize(original)
+
+
+def story(n):
+    rng = random.Random(n)
+    return " ".join(f"w{rng.randrange(10**6)}" for _ in range(80))
+
+
+@pytest.fixture
+def serp(scraper, monkeypatch):
+    """Fake Serper + make_doc: results[i] is (url, delay, outcome) where outcome is text, None or an exception."""
+    results = []
+
+    def serper_news(query, num=10):
+        return [scraper.SearchResult(title=f"r{i}", url=u) for i, (u, _, _) in enumerate(results[:num])]
+
+    def make_doc(url, title_hint=None, source=None, date_str=None):
+        _, delay, outcome = next(r for r in results if r[0] == url)
+        time.sleep(delay)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome and scraper.Document(title=title_hint, url=url, content=outcome)
+
+    monkeypatch.setattr(scraper, "serper_news", serper_news)
+    monkeypatch.setattr(scraper, "make_doc", make_doc)
+    return results
+
+
+def test_stream_yields_in_completion_order_with_serper_ranks(scraper, serp):
+    serp += [(fresh_url(f"h{i}.example.com"), 0.03 * (3 - i), story(f"rank{i}")) for i in range(3)]
+    got = list(scraper.iter_collect("q", k_search=3, k_index=3, with_rank=True))
+    assert [rank for rank, _ in got] == [2, 1, 0]
+    assert all(str(d.url) == serp[rank][0] for rank, d in got)
+
+
+def test_collect_and_index_restores_rank_order(scraper, serp):
+    serp += [(fresh_url(f"h{i}.example.com"), 0.03 * (3 - i), story(f"order{i}")) for i in range(3)]
+    out = scraper.collect_and_index("q", k_search=3, k_index=3)
+    assert [d["title"] for d in out["docs"]] == ["r0", "r1", "r2"]
+    assert out["indexed"] == 3
+
+
+def test_get_docs_looks_up_canonical_keys_and_trims_copies(scraper):
+    url = fresh_url()
+    scraper._save_cache(url, {"title": "t", "url": url, "content": "abcdef"})
+    tracked = url + "?utm_campaign=x"
+    missing = fresh_url()
+    docs = scraper.get_docs([tracked, missing], max_chars=3)
+    assert list(docs) == [tracked] and docs[tracked]["content"] == "abc"
+    assert scraper.get_doc(url)["content"] == "abcdef"
+
+
+@pytest.mark.parametrize("reason", ["robots", "invalid_url"])
+def test_cheap_rejections_are_not_negative_cached(scraper, monkeypatch, reason):
+    if reason == "robots":
+        monkeypatch.setattr(scraper, "RESPECT_ROBOTS", True)
+        monkeypatch.setattr(scraper, "_robots_ok", lambda url: False)
+        url = fresh_url()
+    else:
+        url = "ftp://files.example.com/report.txt"
+    with pytest.raises(scraper.ScrapeError) as e:
+        scraper.make_doc(url)
+    assert e.value.reason == reason
+    assert scraper._failures.get(scraper.canonicalize(url)) is None
+
+
+def test_extraction_timeouts_get_the_timeout_reason(scraper, web, monkeypatch):
+    url = fresh_url()
+    web.serve(url)
+
+    def too_slow(html, url):
+        raise scraper.ExtractTimeout("over 10s CPU")
+
+    monkeypatch.setattr(scraper, "extract_text", too_slow)
+    assert scraper.make_doc(url) is None
+    assert scraper._failures.get(url).reason == "timeout"
+
+
+def test_failures_are_refilled_from_later_results(scraper, serp):
+    serp += [(fresh_url("bad.example.com"), 0, scraper.ScrapeError("HTTP 404", reason="http_4xx")),
+             (fresh_url("short.example.com"), 0, None),
+             (fresh_url("ok1.example.com"), 0, story("refill1")),
+             (fresh_url("ok2.example.com"), 0, story("refill2"))]
+    out = scraper.collect_and_index("q", k_search=4, k_index=2)
+    assert [d["title"] for d in out["docs"]] == ["r2", "r3"]
+
+
+def test_negative_cached_urls_are_skipped_up_front(scraper, serp):
+    bad = fresh_url("bad.example.com")
+    scraper._failures.record(bad, "http_4xx")
+    serp += [(bad, 0, story("never")), (fresh_url("ok.example.com"), 0, story("skip-ok"))]
+    out = scraper.collect_and_index("q", k_search=2, k_index=2)
+    assert out["skipped_known_bad"] == 1
+    assert [d["title"] for d in out["docs"]] == ["r1"]
+
+
+def test_interrupts_do_not_count_against_the_host(scraper, monkeypatch):
+    url = fresh_url("flaky.example.com")
+
+    def interrupted(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(scraper, "_get_page", interrupted)
+    for _ in range(scraper.HOST_FAIL_THRESHOLD):
+        with pytest.raises(KeyboardInterrupt):
+            scraper.fetch_page(url)
+    assert scraper._health.allow(url) == (True, "closed")
+
+
+def test_cancelling_aiter_collect_mid_fetch_closes_the_scrape(scraper, monkeypatch):
+    closed = []
+
+    def slow_collect(*args):
+        try:
+            time.sleep(0.5)
+            yield "doc"
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(scraper, "iter_collect", slow_collect)
+
+    async def consume():
+        task = asyncio.create_task(anext(scraper.aiter_collect("q")))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(consume())
+    assert closed == [True]
@@ -0,0 +1,77 @@
+import threading
+
+from search_cache import SearchCache, normalize_query
+
+
+def test_normalize_query_folds_case_width_and_spacing():
+    assert normalize_query("  EV  market\ttrends ２０２５ ") == "ev market trends 2025"
+
+
+def test_hits_within_ttl_skip_the_fetch():
+    cache, calls = SearchCache(ttl=60), []
+    fetch = lambda: calls.append(1) or ["r"]
+    assert cache.get_or_fetch("q", fetch) == ["r"]
+    assert cache.get_or_fetch("q", fetch) == ["r"]
+    assert len(calls) == 1 and cache.stats()["hits"] == 1
+
+
+def test_expired_entries_are_refetched():
+    cache, calls = SearchCache(ttl=-1), []
+    for _ in range(2):
+        cache.get_or_fetch("q", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache, calls = SearchCache(), []
+    gate = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait(1)
+        return ["r"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("q", fetch))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while cache.stats()["shared"] < 4:
+        threading.Event().wait(0.005)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert calls == [1] and results == [["r"]] * 5
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = SearchCache()
+    gate = threading.Event()
+    errors = []
+
+    def fetch():
+        gate.wait(1)
+        raise RuntimeError("serper down")
+
+    def call():
+        try:
+            cache.get_or_fetch("q", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    while cache.stats()["shared"] < 2:
+        threading.Event().wait(0.005)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert errors == ["serper down"] * 3
+    assert cache.get_or_fetch("q", lambda: "ok") == "ok"
+
+
+def test_size_is_bounded():
+    cache = SearchCache(max_entries=2)
+    for q in "abc":
+        cache.get_or_fetch(q, lambda: q)
+    assert cache.stats()["entries"] == 2
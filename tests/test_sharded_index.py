@@ -0,0 +1,135 @@
+import shutil
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from whoosh.analysis import StemmingAnalyzer
+from whoosh.fields import DATETIME, ID, TEXT, Schema
+from whoosh.qparser import QueryParser
+
+from index_rebuild import build_shards
+from sharded_index import ShardedIndex
+
+
+def _schema() -> Schema:
+    return Schema(
+        url=ID(stored=True, unique=True),
+        title=TEXT(stored=True, analyzer=StemmingAnalyzer()),
+        content=TEXT(stored=False, analyzer=StemmingAnalyzer()),
+        source=TEXT(stored=True),
+        published_at=DATETIME(stored=True),
+    )
+
+
+def _doc(url, when, hits=1):
+    return {"url": url, "title": url, "content": " ".join(["battery"] * hits + ["filler"] * 20),
+            "source": "test", "published_at": when}
+
+
+@pytest.fixture
+def index(tmp_path):
+    ix = ShardedIndex(tmp_path / "index", _schema, batch_size=1000, commit_interval=0.05)
+    yield ix
+    ix.close()
+
+
+def _search(ix, limit, **window):
+    q = QueryParser("content", ix.schema).parse("battery")
+    return [fields["url"] for fields, _ in ix.search(q, limit=limit, **window)]
+
+
+def test_docs_land_in_monthly_shards(index):
+    index.add_many([_doc("https://a/1", datetime(2025, 1, 5)), _doc("https://a/2", datetime(2025, 2, 5))])
+    assert index.flush(10)
+    assert index.names() == ["2025-01", "2025-02"]
+    assert index.contains("https://a/1") and not index.contains("https://a/3")
+
+
+def test_window_is_applied_inside_each_shards_top_k(index):
+    # late-January docs outscore the early ones; a post-filter on the shard's top 5 would return nothing
+    late = [_doc(f"https://late/{i}", datetime(2025, 1, 25), hits=10) for i in range(10)]
+    early = [_doc(f"https://early/{i}", datetime(2025, 1, 5)) for i in range(5)]
+    index.add_many(late + early)
+    assert index.flush(10)
+    got = _search(index, 5, date_to=datetime(2025, 1, 10))
+    assert sorted(got) == sorted(d["url"] for d in early)
+    assert len(_search(index, 5, date_from=datetime(2025, 1, 20))) == 5
+
+
+def test_window_bounds_are_inclusive_and_timezone_aware(index):
+    index.add_many([_doc("https://a/edge", datetime(2025, 3, 1, 12)), _doc("https://a/out", datetime(2025, 3, 2))])
+    assert index.flush(10)
+    cet = timezone(timedelta(hours=1))
+    got = _search(index, 10, date_from=datetime(2025, 3, 1, 13, tzinfo=cet), date_to=datetime(2025, 3, 1, 13, tzinfo=cet))
+    assert got == ["https://a/edge"]
+
+
+def test_shards_outside_the_window_are_skipped(index):
+    index.add_many([_doc("https://a/jan", datetime(2025, 1, 5)), _doc("https://a/mar", datetime(2025, 3, 5))])
+    assert index.flush(10)
+    assert _search(index, 10, date_from=datetime(2025, 2, 1)) == ["https://a/mar"]
+    assert sorted(_search(index, 10)) == ["https://a/jan", "https://a/mar"]
+
+
+def test_drop_expired(index):
+    index.add_many([_doc("https://a/old", datetime(2024, 1, 5)), _doc("https://a/new", datetime(2025, 6, 5))])
+    assert index.flush(10)
+    assert index.drop_expired(3, now=datetime(2025, 6, 20)) == ["2024-01"]
+    assert _search(index, 10) == ["https://a/new"]
+
+
+def _rebuild(index, tmp_path, docs):
+    build_root = tmp_path / "build"
+    build_shards(docs, _schema, build_root, procs=1)
+    return build_root
+
+
+def test_writes_during_a_rebuild_are_replayed_into_the_new_shards(index, tmp_path):
+    a, b = _doc("https://a/1", datetime(2025, 1, 5)), _doc("https://a/2", datetime(2025, 1, 6))
+    index.add_many([a])
+    index.begin_capture()
+    assert index.flush(10)
+    build_root = _rebuild(index, tmp_path, [a])
+    index.add_many([b])  # arrives after the snapshot
+    assert index.swap_in(build_root) == ["2025-01"]
+    assert index.flush(10)
+    assert sorted(_search(index, 10)) == ["https://a/1", "https://a/2"]
+
+
+def test_shards_whose_rebuild_would_lose_docs_are_kept_unless_forced(index, tmp_path):
+    a, gone = _doc("https://a/1", datetime(2025, 1, 5)), _doc("https://a/evicted", datetime(2025, 1, 6))
+    index.add_many([a, gone])
+    assert index.flush(10)
+    assert index.swap_in(_rebuild(index, tmp_path, [a])) == []
+    assert sorted(_search(index, 10)) == ["https://a/1", "https://a/evicted"]
+    assert index.swap_in(_rebuild(index, tmp_path, [a]), force=True) == ["2025-01"]
+    assert _search(index, 10) == ["https://a/1"]
+
+
+def test_reads_and_writes_during_a_swap_never_hit_closed_shards(index, tmp_path):
+    docs = [_doc(f"https://a/{i}", datetime(2025, 1, 5)) for i in range(20)]
+    index.add_many(docs)
+    assert index.flush(10)
+    errors, stop = [], threading.Event()
+
+    def hammer():
+        n = 0
+        while not stop.is_set():
+            try:
+                _search(index, 5)
+                index.contains("https://a/1")
+                index.add_many([_doc(f"https://b/{n}", datetime(2025, 1, 7))])
+                n += 1
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=hammer) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for _ in range(3):
+        index.swap_in(_rebuild(index, tmp_path, docs), force=True)
+        shutil.rmtree(tmp_path / "build", ignore_errors=True)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert errors == []
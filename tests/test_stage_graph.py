@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_protocol import AgentProtocol, run_scope
+from utills.stage_graph import Stage, StageGraph
+
+
+def test_dependencies_run_first_and_pass_values():
+    order = []
+
+    def stage(name, fn):
+        def run(**kw):
+            order.append(name)
+            return fn(**kw)
+        return run
+
+    graph = StageGraph([
+        Stage("total", stage("total", lambda a, b: a + b), inputs=["a", "b"]),
+        Stage("a", stage("a", lambda x: x * 2), inputs=["x"]),
+        Stage("b", stage("b", lambda: 10)),
+        Stage("report", stage("report", lambda: "done"), after=["total"]),
+    ])
+    res = graph.run({"x": 3})
+    assert res["total"].value == 16 and res["total"].waited_on == ["a", "b"]
+    assert order.index("total") > max(order.index("a"), order.index("b"))
+    assert order[-1] == "report"
+
+
+def test_independent_stages_overlap():
+    barrier = threading.Barrier(2, timeout=2)
+    graph = StageGraph([Stage("a", barrier.wait), Stage("b", barrier.wait)], max_concurrency=2)
+    res = graph.run()
+    assert {r.status for r in res.values()} == {"done"}
+
+
+def test_failure_and_timeout_yield_defaults_downstream():
+    def boom():
+        raise ValueError("nope")
+
+    graph = StageGraph([
+        Stage("bad", boom, default=[]),
+        Stage("slow", lambda: time.sleep(1), timeout=0.05, default="late"),
+        Stage("use", lambda bad, slow: (bad, slow), inputs=["bad", "slow"]),
+    ])
+    events = []
+    res = graph.run(on_event=events.append)
+    assert (res["bad"].status, res["bad"].error) == ("failed", "nope")
+    assert res["slow"].status == "timeout"
+    assert res["use"].value == ([], "late")
+    assert [e["status"] for e in events if e["stage"] == "bad"] == ["started", "failed"]
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph([Stage("a", int, inputs=["b"]), Stage("b", int, inputs=["a"])])
+    with pytest.raises(ValueError, match="unknown stage"):
+        StageGraph([Stage("a", int, after=["ghost"])])
+    with pytest.raises(ValueError, match="missing inputs"):
+        StageGraph([Stage("a", lambda q: q, inputs=["q"])]).run()
+
+
+def test_run_inside_event_loop_fails_clearly():
+    graph = StageGraph([Stage("a", lambda: 1)])
+
+    async def handler():
+        with pytest.raises(RuntimeError, match="arun"):
+            graph.run()
+        return (await graph.arun())["a"].value
+
+    assert asyncio.run(handler()) == 1
+
+
+def test_stage_threads_see_the_callers_run_scope():
+    protocol = AgentProtocol()
+    graph = StageGraph([
+        Stage("send", lambda: protocol.send("A", "B", {"n": 1})),
+        Stage("recv", lambda: protocol.receive("B"), after=["send"]),
+    ])
+    with run_scope():
+        res = graph.run()
+    assert res["recv"].value == {"n": 1}
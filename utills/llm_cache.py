@@ -0,0 +1,272 @@
+# utills/llm_cache.py
+"""
+Content-addressed cache for phi Agent runs.
+
+`cached(agent)` returns a drop-in proxy whose `.run()` looks up
+(model id, instructions hash, prompt hash, tool set) in a SQLite store under
+storage/cache/ before calling the model. Hits come back as `CachedRunResponse`, which
+exposes `.content`, `.messages` and the same `str()` as the live response, so
+get_text / _agent_text / only_text keep working unchanged.
+
+- Entries expire after a TTL (per proxy, default LLM_CACHE_TTL, or the much shorter
+  LLM_CACHE_TOOL_TTL for agents with tools, whose answers embed web/price lookups)
+  and the store is trimmed least-recently-used when it grows past LLM_CACHE_MAX_MB.
+- `run(..., live=True)` (or `cached(agent, live=True)`) bypasses the cache for
+  tool calls that must see fresh data; streaming runs and agents that replay
+  chat history are never cached.
+- LLM_CACHE=0 disables it globally; `stats()` reports hits/misses/bypasses and
+  the model time saved.
+"""
+from __future__ import annotations
+import hashlib, json, logging, os, sqlite3, threading, time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger("llm_cache")
+
+# anchored to the repo, so the API (run from API/) and the scripts share one store
+CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH")
+                  or Path(__file__).resolve().parents[1] / "storage" / "cache" / "llm_responses.sqlite3")
+ENABLED = os.getenv("LLM_CACHE", "1") != "0"                      # 0 = always call the model
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 86400)))   # seconds
+TOOL_TTL = float(os.getenv("LLM_CACHE_TOOL_TTL", "3600"))         # seconds, agents with tools
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+TRIM_EVERY = 50                                                    # puts between size checks
+
+
+def _sha(s: str) -> str:
+    return hashlib.sha256(s.encode("utf-8", "replace")).hexdigest()
+
+
+def _dump(v: Any) -> str:
+    return v if isinstance(v, str) else json.dumps(v, sort_keys=True, default=str)
+
+
+def model_id(agent) -> str:
+    m = getattr(agent, "model", None)
+    if m is None:
+        return "default"
+    return f"{getattr(m, 'provider', None) or type(m).__name__}:{getattr(m, 'id', '')}"
+
+
+def tool_names(agent) -> List[str]:
+    names = []
+    for t in getattr(agent, "tools", None) or []:
+        fns = getattr(t, "functions", None)   # phi Toolkit: name -> Function
+        if isinstance(fns, dict):
+            names.extend(f"{getattr(t, 'name', type(t).__name__)}.{f}" for f in fns)
+        else:
+            names.append(getattr(t, "name", None) or getattr(t, "__name__", type(t).__name__))
+    return sorted(names)
+
+
+def instructions_hash(agent) -> str:
+    """Everything besides the prompt that ends up in the system message."""
+    parts = {a: getattr(agent, a, None) for a in
+             ("description", "instructions", "system_prompt", "expected_output",
+              "additional_context", "markdown", "response_model", "structured_outputs")}
+    return _sha(_dump(parts))
+
+
+def cache_key(agent, message: Any) -> str:
+    return _sha(_dump({
+        "model": model_id(agent),
+        "instructions": instructions_hash(agent),
+        "prompt": _sha(_dump(message)),
+        "tools": tool_names(agent),
+    }))
+
+
+class CachedRunResponse:
+    """Stored stand-in for phi's RunResponse."""
+
+    def __init__(self, content: str, text: str, messages: List[Dict[str, str]], model: str, cached_at: float):
+        self.content = content
+        self.messages = [SimpleNamespace(**m) for m in messages]
+        self.model = model
+        self.cached_at = cached_at
+        self.cached = True
+        self._text = text
+
+    def __str__(self) -> str:
+        return self._text
+
+    __repr__ = __str__
+
+
+class LLMCache:
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.bypassed = self.stored = self.evicted = 0
+        self.saved_s = 0.0
+        self._puts = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses(
+            key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, text TEXT, messages TEXT,
+            created REAL NOT NULL, expires REAL NOT NULL, last_hit REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0, latency REAL NOT NULL DEFAULT 0, size INTEGER NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_hit)")
+
+    def get(self, key: str) -> Optional[CachedRunResponse]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content, text, messages, model, created, latency FROM responses "
+                "WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET hits = hits + 1, last_hit = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.saved_s += row[5]
+        content, text, messages, model, created, _ = row
+        return CachedRunResponse(content, text or content, json.loads(messages or "[]"), model, created)
+
+    def put(self, key: str, model: str, response: Any, ttl: float, latency: float) -> None:
+        content = getattr(response, "content", None)
+        if not isinstance(content, str) or not content.strip():
+            return   # tool-only / structured / empty runs: nothing reusable
+        messages = [{"role": getattr(m, "role", ""), "content": m.content}
+                    for m in getattr(response, "messages", None) or []
+                    if isinstance(getattr(m, "content", None), str)]
+        text, msgs = str(response), json.dumps(messages)
+        size = len(content) + len(text) + len(msgs)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses(key, model, content, text, messages, created, expires, "
+                "last_hit, latency, size) VALUES(?,?,?,?,?,?,?,?,?,?)",
+                (key, model, content, text, msgs, now, now + ttl, now, latency, size))
+            self.stored += 1
+            self._puts += 1
+            if self._puts % TRIM_EVERY == 0:
+                self._trim()
+
+    def _trim(self) -> None:
+        """Drop expired rows, then least-recently-used ones until under 90% of max_bytes."""
+        now = time.time()
+        self.evicted += self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,)).rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target, freed, victims = total - int(self.max_bytes * 0.9), 0, []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_hit"):
+            victims.append(key)
+            freed += size
+            if freed >= target:
+                break
+        for i in range(0, len(victims), 500):
+            chunk = victims[i:i + 500]
+            self._db.execute(f"DELETE FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        self.evicted += len(victims)
+        log.info(f"LLM cache trimmed {len(victims)} entries ({freed / 1e6:.1f} MB)")
+
+    def note_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def trim(self) -> None:
+        with self._lock:
+            self._trim()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {"enabled": ENABLED, "entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0, "bypassed": self.bypassed,
+                "stored": self.stored, "evicted": self.evicted, "saved_s": round(self.saved_s, 1)}
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Process-wide cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def stats() -> Dict[str, Any]:
+    return get_cache().stats()
+
+
+class CachedAgent:
+    """Proxy around a phi Agent; everything except run() is passed through.
+
+    `limiter` (anything with .acquire(), e.g. map_reduce.RateLimiter) paces only the
+    calls that actually reach the model, so cache hits don't spend provider quota.
+    """
+
+    def __init__(self, agent, ttl: Optional[float] = None, live: bool = False, limiter=None):
+        if ttl is None:
+            ttl = TOOL_TTL if tool_names(agent) else DEFAULT_TTL
+        object.__setattr__(self, "agent", agent)
+        object.__setattr__(self, "ttl", ttl)
+        object.__setattr__(self, "live", live)
+        object.__setattr__(self, "limiter", limiter)
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.agent, name, value)
+
+    def run(self, message: Any = None, *, live: Optional[bool] = None, **kwargs):
+        agent = self.agent
+        bypass = (not ENABLED or (self.live if live is None else live) or kwargs.get("stream")
+                  or kwargs.get("messages") or kwargs.get("images")
+                  or getattr(agent, "add_history_to_messages", False))
+        if bypass:
+            if ENABLED:
+                get_cache().note_bypass()
+            return self._call(message, **kwargs)[0]
+        cache = get_cache()
+        key = cache_key(agent, message)
+        try:
+            hit = cache.get(key)
+        except Exception as e:
+            log.warning(f"LLM cache read failed: {e}")
+            hit = None
+        if hit is not None:
+            return hit
+        response, latency = self._call(message, **kwargs)
+        try:
+            cache.put(key, model_id(agent), response, self.ttl, latency)
+        except Exception as e:   # a cache write must never fail the call
+            log.warning(f"LLM cache write failed: {e}")
+        return response
+
+    def _call(self, message: Any, **kwargs):
+        """Live run; returns (response, model latency without the limiter wait)."""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        t0 = time.perf_counter()
+        return self.agent.run(message, **kwargs), time.perf_counter() - t0
+
+
+def cached(agent, ttl: Optional[float] = None, live: bool = False, limiter=None) -> CachedAgent:
+    """Wrap `agent` so repeated identical runs are served from the LLM cache.
+
+    Re-wrapping a proxy returns it unchanged unless settings are given; those then
+    apply to a new proxy over the same agent (the original keeps its own).
+    """
+    if isinstance(agent, CachedAgent):
+        if ttl is None and not live and limiter is None:
+            return agent
+        return CachedAgent(agent.agent, ttl=agent.ttl if ttl is None else ttl, live=live or agent.live,
+                           limiter=agent.limiter if limiter is None else limiter)
+    return CachedAgent(agent, ttl=ttl, live=live, limiter=limiter)
@@ -0,0 +1,158 @@
+# utills/map_reduce.py
+"""
+Concurrent map-reduce helpers for LLM calls.
+
+- RateLimiter: thread-safe token bucket (requests per minute + burst), shared by
+  every call that hits the same provider quota; `groq_limiter()` hands out the one
+  bucket per Groq API key.
+- map_ordered: run fn over items on a bounded thread pool; results come back in
+  input order, failures as None. Rate-limit errors (HTTP 429) are retried with
+  backoff.
+- reduce_tree: merge many partials in groups of `fan_in` (concurrently, level by
+  level) until one final call can take them all.
+"""
+from __future__ import annotations
+import hashlib, logging, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+log = logging.getLogger("map_reduce")
+
+# Groq quotas are per key and model; keep this below the account's requests/minute
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", os.getenv("SUMMARIZER_CONCURRENCY", "4")))
+
+
+class RateLimiter:
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = max(per_minute, 0.001) / 60.0   # tokens per second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, seconds: float) -> None:
+        """Provider said slow down: drain the bucket so every caller backs off."""
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)   # concurrent 429s don't stack
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def shared_limiter(quota: str, per_minute: float, burst: int = 1) -> RateLimiter:
+    """The process-wide limiter for `quota`; the first caller's rate and burst win."""
+    with _limiters_lock:
+        limiter = _limiters.get(quota)
+        if limiter is None:
+            limiter = _limiters[quota] = RateLimiter(per_minute, burst)
+        return limiter
+
+
+def groq_limiter(api_key: Optional[str] = None) -> RateLimiter:
+    """Limiter for every call made with `api_key` (default GROQ_API_KEY), whichever agent makes it."""
+    key = api_key if api_key is not None else os.getenv("GROQ_API_KEY", "")
+    return shared_limiter("groq:" + hashlib.sha256(key.encode()).hexdigest()[:16], GROQ_RPM, GROQ_BURST)
+
+
+def _status_code(e: BaseException) -> Optional[int]:
+    code = getattr(e, "status_code", None)
+    if code is None:
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    """HTTP 429 on the error or on the provider error it was raised from."""
+    for _ in range(4):
+        if e is None:
+            return False
+        if _status_code(e) == 429:
+            return True
+        e = e.__cause__
+    return False
+
+
+def call_limited(fn: Callable[[T], R], item: T, limiter: Optional[RateLimiter] = None,
+                 retries: int = 3, backoff: float = 2.0, pace: bool = True) -> R:
+    """fn(item) under the rate limiter, retrying rate-limit errors with exponential backoff.
+
+    pace=False: fn acquires `limiter` itself (a CachedAgent built with it, so cache hits
+    stay free); the limiter is then only penalized on 429s, which still makes every
+    other caller of the same quota back off.
+    """
+    for attempt in range(retries + 1):
+        if limiter and pace:
+            limiter.acquire()
+        try:
+            return fn(item)
+        except Exception as e:
+            if attempt >= retries or not _is_rate_limited(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            log.warning(f"rate limited, retrying in {delay:.0f}s: {e}")
+            if limiter:
+                limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+
+
+def map_ordered(fn: Callable[[T], R], items: Sequence[T], max_workers: int = 4,
+                limiter: Optional[RateLimiter] = None, on_error: Optional[Callable[[T, Exception], None]] = None,
+                pace: bool = True) -> List[Optional[R]]:
+    """[fn(item) for item in items] with at most max_workers calls in flight; a failed item gives None."""
+    def run(item: T) -> Optional[R]:
+        try:
+            return call_limited(fn, item, limiter, pace=pace)
+        except Exception as e:
+            if on_error:
+                on_error(item, e)
+            return None
+
+    if len(items) <= 1 or max_workers <= 1:
+        return [run(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="map") as pool:
+        return list(pool.map(run, items))   # pool.map keeps input order
+
+
+def reduce_tree(parts: Sequence[R], reduce_fn: Callable[[List[R]], R], fan_in: int = 6,
+                max_workers: int = 4, limiter: Optional[RateLimiter] = None,
+                on_error: Optional[Callable[[List[R], Exception], None]] = None,
+                pace: bool = True) -> List[R]:
+    """Reduce `parts` in groups of fan_in until at most fan_in remain; returns the survivors in order.
+
+    A group whose reduce call fails is represented by its first partial, so every level
+    still shrinks and one failed call never empties the result.
+    """
+    fan_in = max(2, fan_in)
+    parts = [p for p in parts if p]
+    while len(parts) > fan_in:
+        groups = [list(parts[i:i + fan_in]) for i in range(0, len(parts), fan_in)]
+        merged = map_ordered(reduce_fn, groups, max_workers, limiter, on_error, pace)
+        nxt: List[R] = []
+        for group, m in zip(groups, merged):
+            if m:
+                nxt.append(m)
+            else:
+                nxt.append(group[0])
+        parts = nxt
+    return list(parts)
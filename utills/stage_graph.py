@@ -0,0 +1,147 @@
+# utills/stage_graph.py
+"""
+Small declarative stage-graph (DAG) executor for agent pipelines.
+
+Each Stage names the upstream values it needs (`inputs`, passed as keyword
+arguments: initial context keys or other stage names) and the stages it must
+merely wait for (`after`). Independent stages run concurrently, at most
+`max_concurrency` at a time; plain functions run on a worker thread with the
+caller's contextvars, coroutine functions run on the event loop.
+
+A stage that raises or exceeds its `timeout` yields its `default` value so the
+rest of the graph still completes (a timed-out thread is abandoned, not killed).
+`on_event` receives a dict per state change (started / done / failed / timeout),
+e.g. to stream progress to a client.
+"""
+from __future__ import annotations
+import asyncio, contextvars, functools, inspect, logging, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+log = logging.getLogger("stage_graph")
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[..., Any]
+    inputs: Sequence[str] = ()
+    after: Sequence[str] = ()
+    timeout: Optional[float] = None
+    default: Any = None
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str                      # done | failed | timeout
+    value: Any = None
+    error: Optional[str] = None
+    started_at: float = 0.0
+    elapsed: float = 0.0
+    waited_on: List[str] = field(default_factory=list)
+
+
+class StageGraph:
+    def __init__(self, stages: Sequence[Stage], max_concurrency: int = 4):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("duplicate stage names")
+        self.max_concurrency = max(1, max_concurrency)
+        self.order = self._toposort()
+
+    def _deps(self, s: Stage) -> List[str]:
+        return [d for d in list(s.inputs) + list(s.after) if d in self.stages]
+
+    def _toposort(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(name: str, path: tuple) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"stage cycle: {' -> '.join(path + (name,))}")
+            state[name] = "visiting"
+            for dep in self._deps(self.stages[name]):
+                visit(dep, path + (name,))
+            state[name] = "done"
+            order.append(name)
+
+        for s in self.stages.values():
+            for dep in s.after:
+                if dep not in self.stages:
+                    raise ValueError(f"stage {s.name!r} waits for unknown stage {dep!r}")
+            visit(s.name, ())
+        return order
+
+    async def arun(self, context: Optional[Dict[str, Any]] = None,
+                   on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, StageResult]:
+        """Run every stage once; returns {stage name: StageResult}."""
+        context = dict(context or {})
+        missing = {i for s in self.stages.values() for i in s.inputs if i not in self.stages and i not in context}
+        if missing:
+            raise ValueError(f"missing inputs: {sorted(missing)}")
+        loop = asyncio.get_running_loop()
+        sem = asyncio.Semaphore(self.max_concurrency)
+        # one thread per stage: a timed-out stage keeps its thread, and must not starve the rest
+        pool = ThreadPoolExecutor(max_workers=len(self.stages) or 1, thread_name_prefix="stage")
+        tasks: Dict[str, asyncio.Task] = {}
+        t_run = time.perf_counter()
+
+        def emit(event: Dict[str, Any]) -> None:
+            if on_event is None:
+                return
+            try:
+                on_event(event)
+            except Exception as e:  # a broken listener must not break the run
+                log.warning(f"stage event listener failed: {e}")
+
+        async def run_stage(s: Stage) -> StageResult:
+            deps = {d: await tasks[d] for d in self._deps(s)}
+            kwargs = {i: (deps[i].value if i in deps else context[i]) for i in s.inputs}
+            async with sem:
+                started = time.perf_counter()
+                emit({"stage": s.name, "status": "started", "at": round(started - t_run, 3)})
+                try:
+                    if inspect.iscoroutinefunction(s.fn):
+                        coro = s.fn(**kwargs)
+                    else:
+                        ctx = contextvars.copy_context()
+                        coro = loop.run_in_executor(pool, functools.partial(ctx.run, s.fn, **kwargs))
+                    value = await asyncio.wait_for(coro, timeout=s.timeout)
+                    res = StageResult(s.name, "done", value)
+                except asyncio.TimeoutError:
+                    log.warning(f"stage {s.name} timed out after {s.timeout}s")
+                    res = StageResult(s.name, "timeout", s.default, error=f"timed out after {s.timeout}s")
+                except Exception as e:
+                    log.warning(f"stage {s.name} failed: {e}")
+                    res = StageResult(s.name, "failed", s.default, error=str(e))
+            res.started_at = round(started - t_run, 3)
+            res.elapsed = round(time.perf_counter() - started, 3)
+            res.waited_on = list(deps)
+            event = {"stage": s.name, "status": res.status, "elapsed": res.elapsed, "value": res.value}
+            if res.error:
+                event["error"] = res.error
+            emit(event)
+            return res
+
+        try:
+            for name in self.order:  # dependencies get their task first
+                tasks[name] = asyncio.ensure_future(run_stage(self.stages[name]))
+            results = await asyncio.gather(*tasks.values())
+        finally:
+            for t in tasks.values():
+                t.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)  # don't wait on abandoned (timed-out) threads
+        return {r.name: r for r in results}
+
+    def run(self, context: Optional[Dict[str, Any]] = None,
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, StageResult]:
+        """Blocking form of `arun` for callers without a running event loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(context, on_event))
+        raise RuntimeError("StageGraph.run() called from a running event loop; "
+                           "`await graph.arun(...)` there, or call run() from a sync (threadpool) handler")